@@ -20,7 +20,7 @@ interface SessionData {
 
 interface DashboardGridProps {
   sessions: SessionData[];
-  thumbnails: Map<string, string>;
+  thumbnails: Map<string, string>; // session id -> image src
   onSelectSession: (sessionId: string, status: string) => void;
   onNewTask: () => void;
 }
@@ -73,7 +73,7 @@ export function DashboardGrid({
               <SessionCard
                 key={session.id}
                 session={session}
-                liveThumbnail={thumbnails.get(session.id)}
+                liveThumbnailSrc={thumbnails.get(session.id)}
                 onSelect={() =>
                   onSelectSession(session.id, session.status)
                 }
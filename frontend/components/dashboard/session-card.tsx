@@ -23,16 +23,19 @@ interface SessionData {
 
 interface SessionCardProps {
   session: SessionData;
-  liveThumbnail?: string;
+  liveThumbnailSrc?: string; // image src from useDashboardSocket
   onSelect: () => void;
 }
 
 export function SessionCard({
   session,
-  liveThumbnail,
+  liveThumbnailSrc,
   onSelect,
 }: SessionCardProps) {
-  const thumbnail = liveThumbnail || session.latestThumbnail;
+  const thumbnail =
+    liveThumbnailSrc ||
+    (session.latestThumbnail &&
+      `data:image/jpeg;base64,${session.latestThumbnail}`);
   const tag = getStatusTag(session.status);
   const completedTodos = session.todos.filter(
     (t) => t.status === "completed"
@@ -61,7 +64,7 @@ export function SessionCard({
       <div className="relative h-[100px] w-full overflow-hidden bg-zinc-900">
         {thumbnail ? (
           <img
-            src={`data:image/jpeg;base64,${thumbnail}`}
+            src={thumbnail}
             alt=""
             className="h-full w-full object-cover transition-opacity duration-500"
           />
@@ -7,10 +7,23 @@ import type {
   DashboardSessionEvent,
 } from "@/lib/types";
 
+/**
+ * Image src for a live thumbnail. Raw JPEG bytes become an object URL,
+ * so binary thumbnails are never re-encoded to base64 in the browser.
+ */
+function thumbnailSrc(thumbnail: ThumbnailUpdateEvent["thumbnail"]): string {
+  if (typeof thumbnail === "string") return `data:image/jpeg;base64,${thumbnail}`;
+  return URL.createObjectURL(
+    new Blob([thumbnail as ArrayBuffer], { type: "image/jpeg" })
+  );
+}
+
 export function useDashboardSocket() {
+  // Session id -> image src (a data: URL or a blob: object URL)
   const [thumbnails, setThumbnails] = useState<Map<string, string>>(
     new Map()
   );
+  const objectUrls = useRef<Map<string, string>>(new Map());
   const [sessionUpdates, setSessionUpdates] = useState<
     Map<string, DashboardSessionEvent>
   >(new Map());
@@ -41,9 +54,14 @@ export function useDashboardSocket() {
     });
 
     socket.on("thumbnail:update", (data: ThumbnailUpdateEvent) => {
+      const src = thumbnailSrc(data.thumbnail);
+      const previous = objectUrls.current.get(data.sessionId);
+      if (previous) URL.revokeObjectURL(previous);
+      if (src.startsWith("blob:")) objectUrls.current.set(data.sessionId, src);
+      else objectUrls.current.delete(data.sessionId);
       setThumbnails((prev) => {
         const next = new Map(prev);
-        next.set(data.sessionId, data.thumbnail);
+        next.set(data.sessionId, src);
         return next;
       });
     });
@@ -63,6 +81,8 @@ export function useDashboardSocket() {
       socket.emit("dashboard:leave");
       socket.disconnect();
       socketRef.current = null;
+      objectUrls.current.forEach((url) => URL.revokeObjectURL(url));
+      objectUrls.current.clear();
     };
   }, []);
 
@@ -9,10 +9,10 @@ import {
 
 const globalStore = globalThis as unknown as {
   __opticon_sessions?: Map<string, Session>;
-  __opticon_thumbnails?: Map<string, string>;
+  __opticon_thumbnails?: Map<string, string | Buffer>;
 };
 const sessions = (globalStore.__opticon_sessions ??= new Map<string, Session>());
-const thumbnails = (globalStore.__opticon_thumbnails ??= new Map<string, string>());
+const thumbnails = (globalStore.__opticon_thumbnails ??= new Map<string, string | Buffer>());
 
 export function createSession(
   id: string,
@@ -279,22 +279,33 @@ export function restoreSessionFromDb(dbSession: {
   return session;
 }
 
+/**
+ * Normalise a worker thumbnail to base64. Workers that negotiated
+ * binaryThumbnails send raw JPEG bytes; Slack and the HTTP API take base64.
+ */
+export function thumbnailToBase64(
+  thumbnail: string | Buffer | undefined
+): string | undefined {
+  if (thumbnail === undefined || typeof thumbnail === "string") return thumbnail;
+  return Buffer.from(thumbnail).toString("base64");
+}
+
 export function updateAgentThumbnail(
   sessionId: string,
   agentId: string,
-  thumbnail: string
+  thumbnail: string | Buffer
 ): void {
   thumbnails.set(`${sessionId}:${agentId}`, thumbnail);
 }
 
 export function getLatestThumbnail(sessionId: string): string | undefined {
-  let latest: string | undefined;
+  let latest: string | Buffer | undefined;
   for (const [key, value] of thumbnails) {
     if (key.startsWith(`${sessionId}:`)) {
       latest = value;
     }
   }
-  return latest;
+  return thumbnailToBase64(latest);
 }
 
 export function getAllActiveSessions(): Session[] {
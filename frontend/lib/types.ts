@@ -64,10 +64,31 @@ export interface TaskAssignedEvent {
   agentId: string;
 }
 
-export interface TaskCompletedEvent {
+/** Model usage totals reported by a worker (per task or per session). */
+export interface UsageSummary {
+  calls: number;
+  inputTokens: number;
+  outputTokens: number;
+  cachedTokens: number;
+  cacheWriteTokens: number;
+  imageBytes: number;
+  costUsd: number; // estimate
+}
+
+/**
+ * Worker events sent with an acknowledgement (the outbox's priority events).
+ * A send whose ack was lost is retried with the same eventId, so the server
+ * handles each one once.
+ */
+export interface AcknowledgedEvent {
+  eventId?: string;
+}
+
+export interface TaskCompletedEvent extends AcknowledgedEvent {
   todoId: string;
   agentId: string;
   result?: string;
+  usage?: UsageSummary;
 }
 
 export interface AgentThinkingEvent {
@@ -95,6 +116,15 @@ export interface AgentStreamReadyEvent {
 export interface AgentJoinEvent {
   agentId: string;
   sessionId: string;
+  capabilities?: AgentCapabilities;
+}
+
+/** Optional worker protocol features, negotiated on agent:join. */
+export interface AgentCapabilities {
+  /** Thumbnails and checkpoint images sent as raw JPEG bytes instead of base64. */
+  binaryThumbnails?: boolean;
+  /** Lifecycle events (task:completed, replay:complete, agent:paused, ...) are acknowledged. */
+  acks?: boolean;
 }
 
 export interface AgentErrorEvent {
@@ -102,8 +132,16 @@ export interface AgentErrorEvent {
   error: string;
 }
 
-export interface AgentTerminatedEvent {
+export interface AgentTerminatedEvent extends AcknowledgedEvent {
   agentId: string;
+  /** Worker teardown steps that failed or missed the shutdown deadline. */
+  shutdown?: ShutdownReport;
+}
+
+export interface ShutdownReport {
+  missed: string[];
+  failed: string[];
+  elapsedMs: number;
 }
 
 export interface AgentSandboxReadyEvent {
@@ -114,14 +152,46 @@ export interface AgentSandboxReadyEvent {
 export interface AgentHeartbeatEvent {
   agentId: string;
   timestamp: string;
-}
-
-export interface AgentPausedEvent {
+  outboxDepth?: number; // worker events queued for sending
+  outboxDropped?: number;
+  usage?: UsageSummary; // session totals
+  idlePause?: IdlePauseSummary | null;
+  health?: WorkerHealth;
+}
+
+/** Worker process health, sampled at each heartbeat. */
+export interface WorkerHealth {
+  loopLagMs: {
+    p50: number | null;
+    p95: number | null;
+    p99: number | null;
+    max: number | null;
+    stalls: number; // times the loop was blocked past the watchdog threshold
+  };
+  rssBytes: number | null;
+  replayFrames: number;
+  replayBytes: number;
+  phase: string; // "idle", "screenshot", "model call", "tool <name>", "checkpoint"
+  phaseSeconds: number;
+  stepsPerMinute: number;
+  steps: number;
+}
+
+/** Sandbox pauses while the worker waits between tasks. */
+export interface IdlePauseSummary {
+  paused: boolean;
+  pauses: number;
+  pausedSeconds: number; // running time saved
+  medianResumeMs: number | null;
+  maxResumeMs: number | null;
+}
+
+export interface AgentPausedEvent extends AcknowledgedEvent {
   agentId: string;
   sandboxId: string;
 }
 
-export interface AgentSandboxExpiredEvent {
+export interface AgentSandboxExpiredEvent extends AcknowledgedEvent {
   agentId: string;
 }
 
@@ -129,7 +199,10 @@ export interface AgentCheckpointEvent {
   agentId: string;
   step: number;
   totalSteps: number;
-  thumbnail?: string; // base64 JPEG
+  thumbnail?: string | Buffer; // base64 JPEG, or raw bytes with binaryThumbnails
+  reason?: "interval" | "budget";
+  scope?: "task" | "session"; // which budget a "budget" checkpoint is for
+  usage?: UsageSummary; // totals so far for `scope` (the task by default)
 }
 
 export interface SessionCompleteEvent {
@@ -176,6 +249,7 @@ export interface ServerToClientEvents {
   "task:none": () => void;
   "session:stop": (payload: { sessionId: string }) => void;
   "session:checkpoint_resume": (payload: { sessionId: string }) => void;
+  "agent:capabilities": (payload: AgentCapabilities) => void;
 }
 
 export interface ClientToServerEvents {
@@ -189,14 +263,14 @@ export interface ClientToServerEvents {
   "agent:thinking": (payload: AgentThinkingEvent) => void;
   "agent:reasoning": (payload: AgentReasoningEvent) => void;
   "agent:error": (payload: AgentErrorEvent) => void;
-  "task:completed": (payload: TaskCompletedEvent) => void;
-  "agent:terminated": (payload: AgentTerminatedEvent) => void;
+  "task:completed": (payload: TaskCompletedEvent, ack?: () => void) => void;
+  "agent:terminated": (payload: AgentTerminatedEvent, ack?: () => void) => void;
   "agent:sandbox_ready": (payload: AgentSandboxReadyEvent) => void;
   "agent:heartbeat": (payload: AgentHeartbeatEvent) => void;
-  "agent:paused": (payload: AgentPausedEvent) => void;
-  "agent:sandbox_expired": (payload: AgentSandboxExpiredEvent) => void;
+  "agent:paused": (payload: AgentPausedEvent, ack?: () => void) => void;
+  "agent:sandbox_expired": (payload: AgentSandboxExpiredEvent, ack?: () => void) => void;
   "whiteboard:updated": (payload: WhiteboardUpdatedEvent) => void;
-  "replay:complete": (payload: ReplayCompleteEvent) => void;
+  "replay:complete": (payload: ReplayCompleteEvent, ack?: () => void) => void;
   "agent:thumbnail": (payload: AgentThumbnailEvent) => void;
   "agent:checkpoint": (payload: AgentCheckpointEvent) => void;
   "dashboard:join": () => void;
@@ -240,7 +314,7 @@ export interface ReplayManifest {
   frames: ReplayFrame[];
 }
 
-export interface ReplayCompleteEvent {
+export interface ReplayCompleteEvent extends AcknowledgedEvent {
   agentId: string;
   manifestUrl: string;
   frameCount: number;
@@ -256,13 +330,13 @@ export interface ReplayReadyEvent {
 
 export interface AgentThumbnailEvent {
   agentId: string;
-  thumbnail: string;
+  thumbnail: string | Buffer; // base64 JPEG, or raw bytes with binaryThumbnails
 }
 
 export interface ThumbnailUpdateEvent {
   sessionId: string;
   agentId: string;
-  thumbnail: string;
+  thumbnail: string | Buffer | ArrayBuffer; // base64 JPEG, or raw bytes (an ArrayBuffer in the browser)
   timestamp: string;
 }
 
@@ -16,6 +16,7 @@ import {
   updateWhiteboard,
   getWhiteboard,
   updateAgentThumbnail,
+  thumbnailToBase64,
   updateAgentSandboxId,
   restoreSessionFromDb,
 } from "./lib/session-store";
@@ -23,6 +24,7 @@ import { respawnWorker } from "./lib/worker-manager";
 import type {
   ServerToClientEvents,
   ClientToServerEvents,
+  AgentCapabilities,
   AgentJoinEvent,
   AgentStreamReadyEvent,
   AgentThinkingEvent,
@@ -91,6 +93,22 @@ const lastReasoningsByAgent = new Map<string, string[]>();
 /** Buffered tool actions per session, for LLM milestone summaries */
 const actionBuffer = new Map<string, BufferedAction[]>();
 
+/** Recently handled eventIds of acknowledged worker events (insertion-ordered, capped) */
+const handledEventIds = new Set<string>();
+const MAX_HANDLED_EVENT_IDS = 10_000;
+
+/** True if this acknowledged event was already handled (a retry whose ack was lost). */
+function isDuplicateEvent(eventId?: string): boolean {
+  if (!eventId) return false;
+  if (handledEventIds.has(eventId)) return true;
+  handledEventIds.add(eventId);
+  if (handledEventIds.size > MAX_HANDLED_EVENT_IDS) {
+    const oldest = handledEventIds.values().next().value;
+    if (oldest !== undefined) handledEventIds.delete(oldest);
+  }
+  return false;
+}
+
 app.prepare().then(() => {
   const httpServer = createServer(handler);
 
@@ -424,6 +442,15 @@ app.prepare().then(() => {
       socket.join(`session:${sessionId}`);
       console.log(`[socket.io] Worker ${agentId} joined session:${sessionId}`);
 
+      // Accept the protocol features the worker offers: binary thumbnail
+      // attachments, and acknowledgements for its lifecycle events
+      const capabilities: AgentCapabilities = {};
+      if (data.capabilities?.binaryThumbnails) capabilities.binaryThumbnails = true;
+      if (data.capabilities?.acks) capabilities.acks = true;
+      if (Object.keys(capabilities).length > 0) {
+        socket.emit("agent:capabilities", capabilities);
+      }
+
       // Forward to browser clients
       const room = `session:${sessionId}`;
       io.to(room).emit("agent:join", { agentId, sessionId });
@@ -538,11 +565,16 @@ app.prepare().then(() => {
       const sessionId = findSessionId(socket);
       if (!sessionId) return;
 
-      updateAgentThumbnail(sessionId, data.agentId, data.thumbnail);
+      // Relayed as received: raw bytes go to dashboards as a binary
+      // attachment, only Slack and the HTTP API need base64
+      const thumbnail = data.thumbnail;
+      if (!thumbnail) return;
+
+      updateAgentThumbnail(sessionId, data.agentId, thumbnail);
       io.to("dashboard").emit("thumbnail:update", {
         sessionId,
         agentId: data.agentId,
-        thumbnail: data.thumbnail,
+        thumbnail,
         timestamp: new Date().toISOString(),
       });
     });
@@ -562,7 +594,9 @@ app.prepare().then(() => {
       persistAgentHeartbeat(agentId).catch(console.error);
     });
 
-    socket.on("agent:paused", (data: AgentPausedEvent) => {
+    socket.on("agent:paused", (data: AgentPausedEvent, ack?: () => void) => {
+      ack?.();
+      if (isDuplicateEvent(data.eventId)) return;
       const sessionId = findSessionId(socket);
       if (!sessionId) return;
 
@@ -581,7 +615,9 @@ app.prepare().then(() => {
       }
     });
 
-    socket.on("agent:sandbox_expired", (data: AgentSandboxExpiredEvent) => {
+    socket.on("agent:sandbox_expired", (data: AgentSandboxExpiredEvent, ack?: () => void) => {
+      ack?.();
+      if (isDuplicateEvent(data.eventId)) return;
       const sessionId = findSessionId(socket);
       if (!sessionId) return;
 
@@ -612,7 +648,7 @@ app.prepare().then(() => {
         agentName,
         data.step,
         data.totalSteps,
-        data.thumbnail,
+        thumbnailToBase64(data.thumbnail),
         accomplishmentSummary,
       ).catch(console.error);
     });
@@ -633,11 +669,13 @@ app.prepare().then(() => {
       }
     });
 
-    socket.on("task:completed", (data: TaskCompletedEvent) => {
+    socket.on("task:completed", (data: TaskCompletedEvent, ack?: () => void) => {
+      ack?.();
+      if (isDuplicateEvent(data.eventId)) return;
       const sessionId = findSessionId(socket);
       if (!sessionId) return;
 
-      const { todoId, agentId, result } = data;
+      const { todoId, agentId, result, usage } = data;
       completeTask(sessionId, todoId, result);
 
       // Persist todo completion to database
@@ -647,6 +685,7 @@ app.prepare().then(() => {
         todoId,
         agentId,
         result,
+        usage,
       });
 
       // Notify dashboard of progress
@@ -730,7 +769,9 @@ app.prepare().then(() => {
       });
     });
 
-    socket.on("replay:complete", async (data: ReplayCompleteEvent) => {
+    socket.on("replay:complete", async (data: ReplayCompleteEvent, ack?: () => void) => {
+      ack?.();
+      if (isDuplicateEvent(data.eventId)) return;
       const sessionId = findSessionId(socket);
       if (!sessionId) return;
 
@@ -777,11 +818,18 @@ app.prepare().then(() => {
       }
     });
 
-    socket.on("agent:terminated", (data: AgentTerminatedEvent) => {
+    socket.on("agent:terminated", (data: AgentTerminatedEvent, ack?: () => void) => {
+      ack?.();
+      if (isDuplicateEvent(data.eventId)) return;
       const sessionId = findSessionId(socket);
       if (!sessionId) return;
 
       updateAgentStatus(sessionId, data.agentId, "terminated");
+      if (data.shutdown?.missed.length) {
+        console.warn(
+          `[server] Agent ${data.agentId} shutdown missed its deadline: ${data.shutdown.missed.join(", ")}`
+        );
+      }
       io.to(`session:${sessionId}`).emit("agent:terminated", {
         agentId: data.agentId,
       });
@@ -0,0 +1,126 @@
+"""
+Benchmark: local numpy vector index vs. file-based Qdrant (the Mem0 path).
+
+Uses random unit vectors (384-d, same as all-MiniLM-L6-v2) so only the
+index is measured — no embedding model or LLM calls. Reports per-memory
+insert latency and per-query latency (top-5) at each store size, and for
+the local index the latency of a single-memory append followed by a
+search on the full store (the live write path).
+
+Usage: python bench_memory_backends.py [size ...]   (default: 1000 10000 100000)
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from vector_index import EMBEDDING_DIMS, LocalVectorMemory
+
+QUERIES = 50
+INSERT_BATCH = 500
+SINGLE_ADDS = 20
+
+
+class RandomEmbedder:
+    def __init__(self, seed=0):
+        self._rng = np.random.default_rng(seed)
+
+    def embed(self, text, memory_action=None):
+        return self._rng.standard_normal(EMBEDDING_DIMS).astype(np.float32)
+
+
+def unit_vectors(rng, count):
+    vectors = rng.standard_normal((count, EMBEDDING_DIMS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_local(path, vectors, queries):
+    mem = LocalVectorMemory(path, embedder=RandomEmbedder())
+    index = mem._index("bench-user")
+
+    start = time.perf_counter()
+    for i in range(0, len(vectors), INSERT_BATCH):
+        chunk = vectors[i:i + INSERT_BATCH]
+        index.append(chunk, [f"memory {i + j}" for j in range(len(chunk))])
+    insert_us = (time.perf_counter() - start) / len(vectors) * 1e6
+
+    index.search(queries[0], 5)  # map the file once
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, 5)
+        timings.append(time.perf_counter() - start)
+    query_ms = statistics.median(timings) * 1e3
+
+    timings = []
+    for i, q in enumerate(queries[:SINGLE_ADDS]):
+        start = time.perf_counter()
+        index.append(q[None, :], [f"single {i}"])
+        index.search(q, 5)
+        timings.append(time.perf_counter() - start)
+    return insert_us, query_ms, statistics.median(timings) * 1e3
+
+
+def bench_qdrant(path, vectors, queries):
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, FieldCondition, Filter, MatchValue, PointStruct, VectorParams
+
+    client = QdrantClient(path=path)
+    client.create_collection(
+        "bench", vectors_config=VectorParams(size=EMBEDDING_DIMS, distance=Distance.COSINE)
+    )
+
+    start = time.perf_counter()
+    for i in range(0, len(vectors), INSERT_BATCH):
+        client.upsert("bench", points=[
+            PointStruct(
+                id=str(uuid.uuid4()),
+                vector=v.tolist(),
+                payload={"user_id": "bench-user", "data": f"memory {i + j}"},
+            )
+            for j, v in enumerate(vectors[i:i + INSERT_BATCH])
+        ])
+    insert_us = (time.perf_counter() - start) / len(vectors) * 1e6
+
+    # Mem0 filters every search by user_id
+    user_filter = Filter(must=[FieldCondition(key="user_id", match=MatchValue(value="bench-user"))])
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        client.query_points("bench", query=q.tolist(), limit=5, query_filter=user_filter)
+        timings.append(time.perf_counter() - start)
+    client.close()
+    return insert_us, statistics.median(timings) * 1e3
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    rng = np.random.default_rng(42)
+    try:
+        import qdrant_client  # noqa: F401
+        have_qdrant = True
+    except ImportError:
+        have_qdrant = False
+        print("qdrant-client not installed — reporting the local index only")
+
+    print(f"{'size':>8}  {'backend':<8} {'insert/mem':>12} {'query p50':>11} {'add+query p50':>14}")
+    for size in sizes:
+        vectors = unit_vectors(rng, size)
+        queries = unit_vectors(rng, QUERIES)
+        with tempfile.TemporaryDirectory() as tmp:
+            insert_us, query_ms, add_ms = bench_local(os.path.join(tmp, "local"), vectors, queries)
+            print(f"{size:>8}  {'local':<8} {insert_us:>9.1f} us {query_ms:>8.3f} ms {add_ms:>11.3f} ms")
+            if have_qdrant:
+                insert_us, query_ms = bench_qdrant(os.path.join(tmp, "qdrant"), vectors, queries)
+                print(f"{size:>8}  {'qdrant':<8} {insert_us:>9.1f} us {query_ms:>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
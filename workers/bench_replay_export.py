@@ -0,0 +1,79 @@
+"""
+Benchmark: replay timelapse export as GIF vs MP4 vs WebM.
+
+Builds synthetic desktop-like replay frames (320x180 JPEG, same as
+ReplayBuffer.capture_frame) and reports encode time and output size for
+each export path.
+
+Usage: python bench_replay_export.py [frame_count ...]
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import video
+from gif import generate_gif
+from replay import FRAME_HEIGHT, FRAME_WIDTH, JPEG_QUALITY
+from video import generate_video
+
+
+def make_frames(count: int) -> list[dict]:
+    """Windows and text lines drifting over a gradient, roughly like a desktop session."""
+    rng = random.Random(0)
+    frames = []
+    windows = [
+        [rng.randint(0, 200), rng.randint(0, 100), rng.randint(80, 200), rng.randint(60, 120)]
+        for _ in range(3)
+    ]
+    for i in range(count):
+        img = Image.new("RGB", (FRAME_WIDTH, FRAME_HEIGHT))
+        draw = ImageDraw.Draw(img)
+        for y in range(FRAME_HEIGHT):
+            draw.line([(0, y), (FRAME_WIDTH, y)], fill=(30, 60 + y // 3, 120))
+        for w in windows:
+            if rng.random() < 0.1:
+                w[0] = max(0, min(FRAME_WIDTH - w[2], w[0] + rng.randint(-20, 20)))
+            x, y, ww, wh = w
+            draw.rectangle([x, y, x + ww, y + wh], fill=(235, 235, 235), outline=(80, 80, 80))
+            for line in range(y + 12, y + wh - 4, 8):
+                draw.line([(x + 4, line), (x + 4 + rng.randint(10, ww - 8), line)], fill=(40, 40, 40))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=JPEG_QUALITY)
+        frames.append({"jpeg_bytes": buf.getvalue(), "timestamp": "", "action": f"step {i}"})
+    return frames
+
+
+def bench(name, fn, frames, path):
+    start = time.perf_counter()
+    result = fn(frames, path)
+    elapsed = time.perf_counter() - start
+    if result is None or not result.endswith(os.path.splitext(path)[1]):
+        print(f"  {name:<6} unavailable (wrote {result})")
+        return
+    size_kb = os.path.getsize(result) / 1024
+    print(f"  {name:<6} {elapsed * 1000:9.1f} ms  {size_kb:9.1f} KB")
+
+
+def main():
+    counts = [int(a) for a in sys.argv[1:]] or [50, 200, 500, 1000]
+    print(f"Video backend: {video.available_backend() or 'none (GIF fallback only)'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            frames = make_frames(count)
+            print(f"\n{count} frames ({FRAME_WIDTH}x{FRAME_HEIGHT}):")
+            bench("gif", generate_gif, frames, os.path.join(tmp, f"{count}.gif"))
+            bench("mp4", generate_video, frames, os.path.join(tmp, f"{count}.mp4"))
+            bench("webm", generate_video, frames, os.path.join(tmp, f"{count}.webm"))
+
+
+if __name__ == "__main__":
+    main()
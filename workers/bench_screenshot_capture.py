@@ -0,0 +1,109 @@
+"""
+Benchmark: per-step screenshot capture, PNG (SDK) vs in-sandbox JPEG.
+
+With E2B_API_KEY set, boots a desktop sandbox and times real captures
+(bytes transferred and wall-clock latency per step) for both paths.
+Without it, runs an offline comparison on a synthetic 1280x720 desktop:
+transfer size of each format and the worker-side CPU spent turning the
+capture into the model's JPEG.
+
+Usage: python bench_screenshot_capture.py [steps]
+"""
+
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import e2b_tools
+from worker import make_screenshot_message
+
+WIDTH, HEIGHT = 1280, 720
+
+
+def make_desktop() -> Image.Image:
+    """Photo-like (noisy) wallpaper with a few text-filled windows."""
+    rng = random.Random(0)
+    noise = Image.effect_noise((WIDTH, HEIGHT), 40).convert("RGB")
+    img = Image.blend(Image.new("RGB", (WIDTH, HEIGHT), (40, 90, 140)), noise, 0.5)
+    draw = ImageDraw.Draw(img)
+    for _ in range(4):
+        x, y = rng.randint(0, 700), rng.randint(0, 350)
+        w, h = rng.randint(300, 560), rng.randint(200, 360)
+        draw.rectangle([x, y, x + w, y + h], fill=(240, 240, 240), outline=(80, 80, 80))
+        for line in range(y + 30, y + h - 10, 14):
+            draw.text((x + 10, line), "lorem ipsum dolor sit amet " * 3, fill=(30, 30, 30))
+    return img
+
+
+def encode(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def report(name: str, sizes: list[int], times: list[float]) -> None:
+    print(
+        f"  {name:<12} {statistics.mean(sizes) / 1024:9.1f} KB/step"
+        f"  {statistics.median(times) * 1000:8.1f} ms/step (median)"
+    )
+
+
+def bench_offline(steps: int) -> None:
+    desktop = make_desktop()
+    png = encode(desktop, "PNG")
+    jpeg = encode(desktop, "JPEG", quality=e2b_tools.SCREENSHOT_QUALITY)
+    print(f"Offline, synthetic {WIDTH}x{HEIGHT} desktop, {steps} steps")
+    print("  (latency = worker CPU to build the model message; no network)")
+    for name, data in (("png", png), ("jpeg", jpeg)):
+        times = []
+        for _ in range(steps):
+            start = time.perf_counter()
+            make_screenshot_message(data)
+            times.append(time.perf_counter() - start)
+        report(name, [len(data)] * steps, times)
+
+
+def bench_live(steps: int) -> None:
+    from e2b_desktop import Sandbox
+
+    desktop = Sandbox.create(timeout=300)
+    try:
+        e2b_tools.init(desktop)
+        desktop.wait(3000)
+        print(f"Live sandbox {desktop.sandbox_id}, {steps} steps")
+        print("  (latency = capture + transfer + building the model message)")
+        paths = (
+            ("png", lambda: bytes(desktop.screenshot())),
+            ("jpeg", e2b_tools.screenshot_compressed),
+            ("jpeg@0.5", lambda: e2b_tools.screenshot_compressed(scale=0.5)),
+        )
+        for name, capture in paths:
+            sizes, times = [], []
+            for _ in range(steps):
+                start = time.perf_counter()
+                data = capture()
+                make_screenshot_message(data)
+                times.append(time.perf_counter() - start)
+                sizes.append(len(data))
+            report(name, sizes, times)
+    finally:
+        desktop.kill()
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    if os.environ.get("E2B_API_KEY"):
+        bench_live(steps)
+    else:
+        bench_offline(steps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Shared fakes for the agent-loop tests: screenshots, a screen feed and a
+scripted model client (no sandbox, no model API).
+
+Test modules import the classes directly when they need non-default
+settings, or take the `fake_feed` / `changing_feed` fixtures.
+"""
+
+import asyncio
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+
+def png(shade: int = 30, size: tuple[int, int] = (64, 36)) -> bytes:
+    """A solid grey PNG screenshot."""
+    buf = io.BytesIO()
+    Image.new("RGB", size, (shade, shade, shade)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class FakeFeed:
+    """ScreenFeed stand-in. With changing=True every capture shows a new
+    screen, so the agent never looks stuck."""
+
+    latest = None
+
+    def __init__(self, delay: float = 0.0, changing: bool = False):
+        self.delay = delay
+        self.changing = changing
+        self.shade = 30
+        self.captures = 0
+
+    async def capture(self, label=None):
+        self.captures += 1
+        await asyncio.sleep(self.delay)
+        if self.changing:
+            self.shade = (self.shade + 40) % 256
+        return png(self.shade)
+
+
+def tool_response(name: str, arguments: dict, content=None, call_id: str = "call-1", usage=None):
+    """A chat completion whose message makes one tool call."""
+    call = SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+    message = SimpleNamespace(
+        content=content,
+        tool_calls=[call],
+        to_dict=lambda: {"role": "assistant", "content": content},
+    )
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeClient:
+    """Model client stand-in that records every request.
+
+    Each call answers with the next `script` entry, a (tool, args) pair or
+    an exception to raise, and then with `tool` for good. `tool` may also
+    be a function of the call number. A set `error` is raised on every
+    call, and `delay` seconds pass before each answer.
+    """
+
+    def __init__(
+        self,
+        tool=("type_text", {"text": "hello"}),
+        script=(),
+        delay: float = 0.0,
+        error: Exception | None = None,
+        content=None,
+        usage=None,
+    ):
+        self.tool = tool
+        self.script = list(script)
+        self.delay = delay
+        self.error = error
+        self.content = content
+        self.usage = usage
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @property
+    def calls(self) -> int:
+        return len(self.requests)
+
+    @property
+    def models(self) -> list:
+        return [request.get("model") for request in self.requests]
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if self.error:
+            raise self.error
+        await asyncio.sleep(self.delay)
+        if self.script:
+            step = self.script.pop(0)
+            if isinstance(step, Exception):
+                raise step
+        else:
+            step = self.tool(self.calls) if callable(self.tool) else self.tool
+        name, args = step
+        return tool_response(name, args, self.content, f"call-{self.calls}", self.usage)
+
+
+@pytest.fixture
+def fake_feed():
+    return FakeFeed()
+
+
+@pytest.fixture
+def changing_feed():
+    return FakeFeed(changing=True)
@@ -1,8 +1,23 @@
 import base64
+import logging
+import os
 import time
 
+logger = logging.getLogger(__name__)
+
 _sandbox = None
 
+# Screenshot capture: "jpeg" encodes (and optionally downscales) inside the
+# sandbox and transfers only the JPEG; "png" uses the SDK's lossless capture.
+# JPEG capture falls back to PNG for the rest of the session if it fails.
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "jpeg").lower()
+SCREENSHOT_QUALITY = int(os.environ.get("SCREENSHOT_QUALITY", "75"))
+# Fraction of the screen resolution the model sees; tool coordinates are
+# mapped back to screen pixels.
+SCREENSHOT_SCALE = float(os.environ.get("SCREENSHOT_SCALE", "1.0"))
+_SHOT_PATH = "/tmp/opticon-shot.jpg"
+_compressed_capture = SCREENSHOT_FORMAT == "jpeg"
+
 
 def init(sandbox):
     """Set the E2B sandbox instance used by all tool functions."""
@@ -12,9 +27,55 @@ def init(sandbox):
 
 # --- Tool functions (called by the agentic loop) ---
 
+def screenshot_compressed(quality: int | None = None, scale: float | None = None) -> bytes:
+    """Capture a JPEG inside the sandbox and return its bytes.
+
+    One command round-trip: scrot writes the JPEG (plus a scaled copy when
+    scale < 1) and the file comes back base64-encoded on stdout, instead of
+    the SDK's capture + read + remove calls for a multi-MB PNG.
+    """
+    quality = SCREENSHOT_QUALITY if quality is None else quality
+    scale = SCREENSHOT_SCALE if scale is None else scale
+    path = _SHOT_PATH
+    command = f"scrot --pointer --overwrite --quality {quality}"
+    if scale < 1:
+        command += f" --thumb {max(1, round(scale * 100))}"
+        path = _SHOT_PATH.replace(".jpg", "-thumb.jpg")
+    command += f" {_SHOT_PATH} && base64 -w0 {path}; rm -f /tmp/opticon-shot*.jpg"
+    result = _sandbox.commands.run(command)
+    data = base64.b64decode(result.stdout)
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("sandbox capture did not return a JPEG")
+    return data
+
+
 def screenshot_raw_bytes() -> bytes:
-    """Take a screenshot and return raw PNG bytes."""
-    return _sandbox.screenshot()
+    """Take a screenshot and return the image bytes.
+
+    JPEG from in-sandbox compression when available, otherwise the SDK's
+    PNG. Consumers decode either with PIL.
+    """
+    global _compressed_capture
+    if _compressed_capture:
+        try:
+            return screenshot_compressed()
+        except Exception as e:
+            _compressed_capture = False
+            logger.warning("Compressed screenshot capture failed, using PNG: %s", e)
+    return bytes(_sandbox.screenshot())
+
+
+def capture_scale() -> float:
+    """Size of the screenshots the model sees relative to the screen."""
+    return SCREENSHOT_SCALE if _compressed_capture else 1.0
+
+
+def _to_screen(x: int, y: int) -> tuple[int, int]:
+    """Map model (screenshot) coordinates to screen pixels."""
+    scale = capture_scale()
+    if scale == 1.0:
+        return x, y
+    return round(x / scale), round(y / scale)
 
 
 def screenshot_as_base64() -> str:
@@ -25,19 +86,20 @@ def screenshot_as_base64() -> str:
 
 def click(x: int, y: int, button: str = "left", **_kwargs) -> str:
     """Click at screen coordinates (x, y)."""
+    sx, sy = _to_screen(x, y)
     if button == "right":
-        _sandbox.right_click(x, y)
+        _sandbox.right_click(sx, sy)
     elif button == "middle":
-        _sandbox.middle_click(x, y)
+        _sandbox.middle_click(sx, sy)
     else:
-        _sandbox.left_click(x, y)
+        _sandbox.left_click(sx, sy)
     time.sleep(0.1)
     return f"Clicked ({button}) at ({x}, {y})"
 
 
 def double_click(x: int, y: int, **_kwargs) -> str:
     """Double-click at screen coordinates (x, y)."""
-    _sandbox.double_click(x, y)
+    _sandbox.double_click(*_to_screen(x, y))
     return f"Double-clicked at ({x}, {y})"
 
 
@@ -86,13 +148,13 @@ def press_key(key: str, **_kwargs) -> str:
 
 def move_mouse(x: int, y: int) -> str:
     """Move the mouse cursor to screen coordinates (x, y) without clicking."""
-    _sandbox.move_mouse(x, y)
+    _sandbox.move_mouse(*_to_screen(x, y))
     return f"Moved mouse to ({x}, {y})"
 
 
 def scroll(x: int, y: int, direction: str = "down", amount: int = 3) -> str:
     """Scroll at screen coordinates (x, y) in the given direction."""
-    _sandbox.move_mouse(x, y)
+    _sandbox.move_mouse(*_to_screen(x, y))
     _sandbox.scroll(direction=direction, amount=amount)
     return f"Scrolled {direction} by {amount} at ({x}, {y})"
 
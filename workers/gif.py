@@ -10,12 +10,12 @@ import logging
 import os
 from pathlib import Path
 
-import imageio.v3 as iio
-import numpy as np
 from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+MAX_GIF_FRAMES = 500
+
 
 def generate_gif(
     frames: list[dict],
@@ -23,15 +23,15 @@ def generate_gif(
     max_size_mb: float = 20,
 ) -> str | None:
     """
-    Generate an animated GIF from a list of replay frame dicts.
+    Generate an animated GIF from a list of replay frames.
 
-    Each frame dict must have:
+    Each frame (a replay.ReplayFrame or an equivalent dict) must have:
         - jpeg_bytes: bytes (JPEG image data)
-        - timestamp: str (ISO-8601, unused but expected)
+        - timestamp: unused but expected
         - action: str (description, unused but expected)
 
     Args:
-        frames: List of frame dicts from ReplayBuffer._frames.
+        frames: List of frames from ReplayBuffer._frames.
         output_path: File path for the output GIF.
         max_size_mb: Maximum allowed file size in MB. If exceeded,
                      dimensions are halved and encoding retried once.
@@ -50,6 +50,11 @@ def generate_gif(
         return None
 
 
+def _frame_duration_ms(count: int) -> int:
+    """Adaptive frame duration: short sessions play slower than long ones."""
+    return 500 if count < 100 else 200
+
+
 def _encode_gif(
     frames: list[dict],
     output_path: str,
@@ -57,24 +62,24 @@ def _encode_gif(
     scale_factor: float,
 ) -> str | None:
     """Internal helper that encodes frames into a GIF, with optional downscaling."""
+    # imageio/numpy are only needed here; importing them lazily keeps them
+    # out of the worker's startup path (TimelapseBuilder needs only PIL)
+    import imageio.v3 as iio
+    import numpy as np
+
     selected_frames = frames
     total = len(frames)
 
-    # Subsample if more than 500 frames
-    if total > 500:
-        step = total / 500
-        indices = [int(i * step) for i in range(500)]
+    # Subsample if more than MAX_GIF_FRAMES frames
+    if total > MAX_GIF_FRAMES:
+        step = total / MAX_GIF_FRAMES
+        indices = [int(i * step) for i in range(MAX_GIF_FRAMES)]
         selected_frames = [frames[i] for i in indices]
         logger.info(
             "Subsampled %d frames down to %d for GIF", total, len(selected_frames)
         )
 
-    # Adaptive frame duration
-    count = len(selected_frames)
-    if count < 100:
-        duration_ms = 500
-    else:
-        duration_ms = 200
+    duration_ms = _frame_duration_ms(len(selected_frames))
 
     # Decode JPEG bytes into numpy arrays
     images = []
@@ -173,3 +178,159 @@ def generate_gif_from_directory(
         output_path = str(frame_dir / "timelapse.gif")
 
     return generate_gif(frames, output_path)
+
+
+def _split_gif_image_block(gif_bytes: bytes) -> bytes:
+    """
+    Extract the image block (descriptor + colour table + LZW data) from a
+    single-frame GIF, moving the global colour table into a local one so the
+    block can be dropped into any animated GIF stream unchanged.
+    """
+    screen_flags = gif_bytes[10]
+    pos = 13
+    global_table = b""
+    if screen_flags & 0x80:
+        table_len = 3 * (2 ** ((screen_flags & 0x07) + 1))
+        global_table = gif_bytes[pos:pos + table_len]
+        pos += table_len
+
+    while pos < len(gif_bytes):
+        introducer = gif_bytes[pos]
+        if introducer == 0x21:
+            # Extension: skip label, then the data sub-blocks
+            pos += 2
+            while gif_bytes[pos]:
+                pos += gif_bytes[pos] + 1
+            pos += 1
+        elif introducer == 0x2C:
+            descriptor = bytearray(gif_bytes[pos:pos + 10])
+            pos += 10
+            local_table = b""
+            if descriptor[9] & 0x80:
+                table_len = 3 * (2 ** ((descriptor[9] & 0x07) + 1))
+                local_table = gif_bytes[pos:pos + table_len]
+                pos += table_len
+            elif global_table:
+                descriptor[9] |= 0x80 | (screen_flags & 0x07)
+                local_table = global_table
+            data_start = pos
+            pos += 1  # LZW minimum code size
+            while gif_bytes[pos]:
+                pos += gif_bytes[pos] + 1
+            pos += 1
+            return bytes(descriptor) + local_table + gif_bytes[data_start:pos]
+        else:
+            break
+
+    raise ValueError("No image block found in GIF data")
+
+
+class TimelapseBuilder:
+    """
+    Builds the session timelapse GIF incrementally as replay frames arrive.
+
+    Each accepted frame is palette-quantised and LZW-encoded into a
+    self-contained GIF image block at capture time, so finalising the GIF is
+    just concatenating the blocks. The number of blocks is held at
+    ``max_frames`` by dropping every other block and doubling the capture
+    stride whenever the budget overflows, which keeps the retained frames
+    evenly spaced over the whole session.
+    """
+
+    def __init__(self, max_frames: int = MAX_GIF_FRAMES):
+        self.max_frames = max_frames
+        self._blocks: list[bytes] = []
+        self._size: tuple[int, int] | None = None
+        self._stride = 1
+        self._seen = 0
+
+    @property
+    def frame_count(self) -> int:
+        return len(self._blocks)
+
+    def add_frame(self, jpeg_bytes: bytes) -> None:
+        """Encode a captured JPEG frame into the running timelapse."""
+        index = self._seen
+        self._seen += 1
+        if index % self._stride:
+            return
+
+        try:
+            img = Image.open(io.BytesIO(jpeg_bytes)).convert("RGB")
+            if self._size is None:
+                self._size = img.size
+            elif img.size != self._size:
+                img = img.resize(self._size, Image.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, format="GIF")
+            self._blocks.append(_split_gif_image_block(buf.getvalue()))
+        except Exception as e:
+            logger.warning("Failed to add timelapse frame: %s", e)
+            return
+
+        if len(self._blocks) > self.max_frames:
+            self._blocks = self._blocks[::2]
+            self._stride *= 2
+            logger.debug(
+                "Timelapse decimated to %d frames (stride %d)",
+                len(self._blocks),
+                self._stride,
+            )
+
+    def finalize(self, output_path: str, max_size_mb: float = 20) -> str | None:
+        """
+        Write the accumulated frames out as an animated GIF.
+
+        Args:
+            output_path: File path for the output GIF.
+            max_size_mb: Maximum allowed file size in MB. If exceeded, every
+                         other frame is dropped until the GIF fits.
+
+        Returns:
+            The output path on success, None if there are no frames or the
+            write fails.
+        """
+        if not self._blocks or self._size is None:
+            logger.warning("No frames provided for timelapse GIF")
+            return None
+
+        try:
+            blocks = self._blocks
+            max_bytes = max_size_mb * 1024 * 1024
+            while len(blocks) > 1 and sum(map(len, blocks)) > max_bytes:
+                blocks = blocks[::2]
+            if len(blocks) < len(self._blocks):
+                logger.info(
+                    "Timelapse exceeds %.1f MB; decimated %d frames to %d",
+                    max_size_mb,
+                    len(self._blocks),
+                    len(blocks),
+                )
+
+            width, height = self._size
+            delay_cs = _frame_duration_ms(len(blocks)) // 10
+            # Graphic control extension: disposal "do not dispose", frame delay
+            control = b"\x21\xf9\x04\x04" + delay_cs.to_bytes(2, "little") + b"\x00\x00"
+
+            out = bytearray(b"GIF89a")
+            out += width.to_bytes(2, "little") + height.to_bytes(2, "little")
+            out += b"\x00\x00\x00"  # no global colour table
+            # NETSCAPE2.0 application extension: loop forever
+            out += b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"
+            for block in blocks:
+                out += control
+                out += block
+            out += b"\x3b"
+
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(output_path).write_bytes(out)
+            logger.info(
+                "Timelapse GIF written to %s (%d frames, %.2f MB)",
+                output_path,
+                len(blocks),
+                len(out) / (1024 * 1024),
+            )
+            return output_path
+        except Exception as e:
+            logger.error("Timelapse GIF finalisation failed: %s", e)
+            return None
@@ -0,0 +1,159 @@
+"""
+Worker health: event-loop lag, a blocking-code watchdog and step progress.
+
+LoopMonitor measures event-loop lag with a scheduled-vs-actual timer: it
+asks to wake every `interval` seconds and records how late it actually
+woke. Lag means something ran on the loop thread without yielding, such as
+a synchronous sandbox call, PIL work or a slow subscriber.
+
+The monitor also runs a watchdog thread. When the loop has not ticked for
+`threshold` seconds, the watchdog logs the loop thread's current stack
+(the code that is blocking it), once per stall.
+
+StepProgress tracks the agent loop's current phase and its recent step
+rate. The worker's heartbeat carries both, together with RSS, the replay
+buffer size and the outbound queue depth.
+
+LOOP_LAG_THRESHOLD_MS sets the watchdog threshold (500 ms); 0 disables the
+watchdog.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+TICK_INTERVAL = 0.1  # seconds between lag samples
+LAG_WINDOW = 600  # samples kept (about a minute)
+DEFAULT_LAG_THRESHOLD = 0.5  # seconds the loop may stall before its stack is dumped
+STEP_RATE_WINDOW = 60.0  # seconds of steps counted for the step rate
+
+
+def rss_bytes() -> int | None:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        interval: float = TICK_INTERVAL,
+        threshold: float | None = DEFAULT_LAG_THRESHOLD,
+        window: int = LAG_WINDOW,
+        clock=time.monotonic,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self._clock = clock
+        self._lags: deque[float] = deque(maxlen=window)
+        self._last_tick: float | None = None
+        self._loop_thread: int | None = None
+        self._stop_watchdog = threading.Event()
+        self.stats = {"stalls": 0, "maxLag": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "LoopMonitor":
+        threshold_ms = float(os.environ.get("LOOP_LAG_THRESHOLD_MS", DEFAULT_LAG_THRESHOLD * 1000))
+        return cls(threshold=threshold_ms / 1000 if threshold_ms > 0 else None)
+
+    async def run(self) -> None:
+        """Sample lag until cancelled; runs the watchdog thread meanwhile."""
+        self._loop_thread = threading.get_ident()
+        self._last_tick = self._clock()
+        self._stop_watchdog.clear()
+        if self.threshold:
+            threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        try:
+            while True:
+                scheduled = self._clock() + self.interval
+                await asyncio.sleep(self.interval)
+                now = self._clock()
+                lag = max(0.0, now - scheduled)
+                self._lags.append(lag)
+                self.stats["maxLag"] = max(self.stats["maxLag"], lag)
+                self._last_tick = now
+        finally:
+            self._stop_watchdog.set()
+
+    def _watch(self) -> None:
+        reported_tick = None
+        while not self._stop_watchdog.wait(self.threshold / 2):
+            last_tick = self._last_tick
+            blocked_for = self._clock() - last_tick
+            if blocked_for < self.threshold or last_tick == reported_tick:
+                continue
+            reported_tick = last_tick  # one dump per stall
+            self.stats["stalls"] += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(unavailable)\n"
+            logger.warning(
+                "Event loop blocked for %.0f ms, loop thread is at:\n%s", blocked_for * 1000, stack.rstrip()
+            )
+
+    def lag_summary(self) -> dict:
+        """Lag percentiles over the recent window, in milliseconds."""
+        if not self._lags:
+            return {"p50": None, "p95": None, "p99": None, "max": None, "stalls": self.stats["stalls"]}
+        ordered = sorted(self._lags)
+        return {
+            "p50": round(_percentile(ordered, 0.50) * 1000, 1),
+            "p95": round(_percentile(ordered, 0.95) * 1000, 1),
+            "p99": round(_percentile(ordered, 0.99) * 1000, 1),
+            "max": round(ordered[-1] * 1000, 1),
+            "stalls": self.stats["stalls"],
+        }
+
+
+class StepProgress:
+    """What the agent loop is doing right now and how fast it is stepping."""
+
+    def __init__(self, window: float = STEP_RATE_WINDOW, clock=time.monotonic):
+        self.window = window
+        self._clock = clock
+        self.phase = "idle"
+        self._phase_since = clock()
+        self._recent: deque[float] = deque()
+        self.steps = 0
+
+    def set_phase(self, phase: str) -> None:
+        if phase != self.phase:
+            self.phase = phase
+            self._phase_since = self._clock()
+
+    def step_done(self) -> None:
+        self.steps += 1
+        self._recent.append(self._clock())
+
+    def steps_per_minute(self) -> float:
+        cutoff = self._clock() - self.window
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+        return len(self._recent) * 60.0 / self.window
+
+    def snapshot(self) -> dict:
+        return {
+            "phase": self.phase,
+            "phaseSeconds": round(self._clock() - self._phase_since, 1),
+            "stepsPerMinute": round(self.steps_per_minute(), 1),
+            "steps": self.steps,
+        }
@@ -0,0 +1,102 @@
+"""
+Internal chat-history representation for the agent loop.
+
+Screenshots stay in `messages` as ImageRef parts (the JPEG bytes plus the
+detail level) instead of base64 `data:` URL strings, which are a third
+larger and are kept alive for every exchange in the window. to_wire()
+materialises the API's wire format (image_url parts) only when a request
+is built.
+
+Every screenshot in the window is re-sent on every step, so DataUrlCache
+memoizes each encoded data URL on its ImageRef and drops the JPEG bytes:
+a sent screenshot costs its base64 size, never bytes plus base64. Each
+screenshot is encoded once and its URL goes away with the exchange when
+the history is trimmed.
+"""
+
+import base64
+
+IMAGE_PART = "image_ref"
+
+
+class ImageRef:
+    """A screenshot held as bytes in the message history."""
+
+    __slots__ = ("data", "size", "media_type", "detail", "url")
+
+    def __init__(self, data: bytes, media_type: str = "image/jpeg", detail: str = "high"):
+        self.data: bytes | None = data  # None once the data URL is memoized
+        self.size = len(data)
+        self.media_type = media_type
+        self.detail = detail
+        self.url: str | None = None  # memoized data URL, set by DataUrlCache
+
+    def __len__(self) -> int:
+        return self.size
+
+    def data_url(self) -> str:
+        if self.url is not None:
+            return self.url
+        return f"data:{self.media_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def image_part(ref: ImageRef) -> dict:
+    return {"type": IMAGE_PART, "image": ref}
+
+
+class DataUrlCache:
+    """Encodes each ImageRef once, keeping the data URL on the ref in place of its bytes.
+
+    Unlike a size-bounded LRU, which every step's oldest-to-newest pass
+    through the window evicts in order, this never re-encodes a screenshot
+    that is still in the history.
+    """
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, ref: ImageRef) -> str:
+        if ref.url is not None:
+            self.stats["hits"] += 1
+            return ref.url
+        self.stats["misses"] += 1
+        ref.url = ref.data_url()
+        ref.data = None
+        return ref.url
+
+
+def _image_refs(msg: dict):
+    content = msg.get("content")
+    if isinstance(content, list):
+        for p in content:
+            if isinstance(p, dict) and p.get("type") == IMAGE_PART:
+                yield p["image"]
+
+
+def _wire_part(part, cache: DataUrlCache | None):
+    if isinstance(part, dict) and part.get("type") == IMAGE_PART:
+        ref = part["image"]
+        url = cache.get(ref) if cache is not None else ref.data_url()
+        return {"type": "image_url", "image_url": {"url": url, "detail": ref.detail}}
+    return part
+
+
+def to_wire(messages: list[dict], cache: DataUrlCache | None = None) -> list[dict]:
+    """Return `messages` in API wire format (ImageRef parts become data-URL image_url parts).
+
+    Messages without images are passed through as the same objects.
+    """
+    wire = []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, list) and any(
+            isinstance(p, dict) and p.get("type") == IMAGE_PART for p in content
+        ):
+            msg = {**msg, "content": [_wire_part(p, cache) for p in content]}
+        wire.append(msg)
+    return wire
+
+
+def image_bytes(msg: dict) -> int:
+    """Total bytes of the screenshots held in a message."""
+    return sum(len(ref) for ref in _image_refs(msg))
@@ -0,0 +1,216 @@
+"""
+Process-wide pooled HTTP clients.
+
+Model calls (httpx, through the Dedalus SDK) and replay uploads (aiohttp)
+share one pool each for the life of the worker, so TLS connections are
+kept alive and reused across agent steps and frame uploads instead of
+being opened per call.
+
+  - pool size:       HTTP_MAX_CONNECTIONS (50), HTTP_MAX_KEEPALIVE (20)
+  - per-host cap:    HTTP_PER_HOST_LIMIT concurrent requests per host (10)
+  - keep-alive:      HTTP_KEEPALIVE_SECONDS (60)
+  - HTTP/2 for httpx when the optional `h2` package is installed
+
+stats counts requests and new connections per client; everything else
+rides on an existing connection. close() is called at worker shutdown.
+"""
+
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+PER_HOST_LIMIT = int(os.environ.get("HTTP_PER_HOST_LIMIT", "10"))
+KEEPALIVE_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", "60"))
+REQUEST_TIMEOUT = 600.0  # model calls with large contexts can be slow
+CONNECT_TIMEOUT = 10.0
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _empty_stats() -> dict:
+    return {"requests": 0, "newConnections": 0}
+
+
+def _host_limited_transport(httpx, transport, per_host: int):
+    """Wrap an httpx transport to cap in-flight requests per host.
+
+    A slot is held until the response body is closed, so the cap also bounds
+    the connections opened to the host. (Built lazily to keep httpx off the
+    import path.)
+    """
+
+    class ReleasingStream(httpx.AsyncByteStream):
+        def __init__(self, stream, semaphore: asyncio.Semaphore):
+            self._stream = stream
+            self._semaphore = semaphore
+            self._released = False
+
+        async def __aiter__(self):
+            async for chunk in self._stream:
+                yield chunk
+
+        async def aclose(self) -> None:
+            try:
+                await self._stream.aclose()
+            finally:
+                if not self._released:
+                    self._released = True
+                    self._semaphore.release()
+
+    class HostLimitedTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+        async def handle_async_request(self, request):
+            host = request.url.host
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = asyncio.Semaphore(per_host)
+            await semaphore.acquire()
+            try:
+                response = await transport.handle_async_request(request)
+            except BaseException:
+                semaphore.release()
+                raise
+            response.stream = ReleasingStream(response.stream, semaphore)
+            return response
+
+        async def aclose(self) -> None:
+            await transport.aclose()
+
+    return HostLimitedTransport()
+
+
+class HttpClients:
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive: int = MAX_KEEPALIVE,
+        per_host: int = PER_HOST_LIMIT,
+        keepalive_seconds: float = KEEPALIVE_SECONDS,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.per_host = per_host
+        self.keepalive_seconds = keepalive_seconds
+        self._httpx = None
+        self._httpx_loop = None
+        self._aiohttp = None
+        self._aiohttp_loop = None
+        self.stats = {"httpx": _empty_stats(), "aiohttp": _empty_stats()}
+
+    @staticmethod
+    def _loop():
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def httpx_client(self):
+        """Shared httpx.AsyncClient (for the model SDK)."""
+        import httpx
+
+        loop = self._loop()
+        if self._httpx is not None and not self._httpx.is_closed and self._httpx_loop in (loop, None):
+            return self._httpx
+
+        stats = self.stats["httpx"]
+
+        async def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.started":
+                stats["newConnections"] += 1
+
+        async def on_request(request) -> None:
+            stats["requests"] += 1
+            request.extensions["trace"] = trace
+
+        http2 = _http2_available()
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_seconds,
+            ),
+        )
+        self._httpx = httpx.AsyncClient(
+            transport=_host_limited_transport(httpx, transport, self.per_host),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            event_hooks={"request": [on_request]},
+        )
+        self._httpx_loop = loop
+        logger.info(
+            "HTTP client pool: %d connections, %d per host, http2=%s",
+            self.max_connections, self.per_host, http2,
+        )
+        return self._httpx
+
+    def aiohttp_session(self):
+        """Shared aiohttp.ClientSession (for replay uploads). Must be called inside the event loop."""
+        import aiohttp
+
+        loop = self._loop()
+        if self._aiohttp is not None and not self._aiohttp.closed and self._aiohttp_loop is loop:
+            return self._aiohttp
+
+        stats = self.stats["aiohttp"]
+
+        async def on_request_start(session, ctx, params) -> None:
+            stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params) -> None:
+            stats["newConnections"] += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+
+        self._aiohttp = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host,
+                keepalive_timeout=self.keepalive_seconds,
+            ),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            trace_configs=[trace],
+        )
+        self._aiohttp_loop = loop
+        return self._aiohttp
+
+    def summary(self) -> dict:
+        """Requests, new connections and the connection reuse rate per client."""
+        summary = {}
+        for name, counts in self.stats.items():
+            requests = counts["requests"]
+            reused = max(0, requests - counts["newConnections"])
+            summary[name] = {**counts, "reuseRate": round(reused / requests, 3) if requests else 0.0}
+        return summary
+
+    async def close(self) -> None:
+        if self._httpx is not None:
+            await self._httpx.aclose()
+            self._httpx = None
+        if self._aiohttp is not None:
+            await self._aiohttp.close()
+            self._aiohttp = None
+
+
+_clients: HttpClients | None = None
+
+
+def get_clients() -> HttpClients:
+    """The process-wide HttpClients instance."""
+    global _clients
+    if _clients is None:
+        _clients = HttpClients()
+    return _clients
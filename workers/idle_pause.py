@@ -0,0 +1,170 @@
+"""
+Pause the E2B sandbox while the agent has no work.
+
+Between tasks the worker waits in its task loop with the desktop running,
+and billed. IdlePauser pauses the sandbox once no task has arrived for
+`idle_after` seconds and resumes it when the next task comes in:
+
+  - wait_for_task() replaces next_task() in the task loop; when the idle
+    period passes it pauses the sandbox and keeps waiting
+  - prefetch() is called on task:assign and starts the resume right away,
+    so it overlaps memory retrieval; ensure_running() waits for it before
+    the agent touches the sandbox
+  - stats / summary(): pauses, seconds spent paused (running time saved)
+    and resume latencies (what each pause cost the next task)
+
+A full pause keeps memory, so the desktop, its apps, the stream server and
+the screen helper come back as they were. IDLE_PAUSE_SECONDS sets the idle
+period; 0 disables idle pausing.
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import deque
+
+from waiting import next_task, wait_first
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_AFTER = 120.0  # seconds without a task before pausing
+SANDBOX_TIMEOUT = 3600  # seconds, re-applied on resume
+LATENCY_WINDOW = 50  # recent resume latencies kept for the summary
+
+
+class IdlePauser:
+    def __init__(
+        self,
+        sandbox,
+        idle_after: float = DEFAULT_IDLE_AFTER,
+        screen_feed=None,
+        sandbox_timeout: int = SANDBOX_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self._sandbox = sandbox
+        self.idle_after = idle_after
+        self._screen_feed = screen_feed
+        self.sandbox_timeout = sandbox_timeout
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._resume: asyncio.Task | None = None
+        self._paused_at: float | None = None
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.paused = False
+        self.stats = {"pauses": 0, "resumes": 0, "pausedSeconds": 0.0, "failures": 0}
+
+    @classmethod
+    def from_env(cls, sandbox, screen_feed=None) -> "IdlePauser":
+        return cls(
+            sandbox,
+            idle_after=float(os.environ.get("IDLE_PAUSE_SECONDS", DEFAULT_IDLE_AFTER)),
+            screen_feed=screen_feed,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.idle_after > 0
+
+    def _suspend_idle_captures(self, suspended: bool) -> None:
+        if self._screen_feed is not None:
+            self._screen_feed.suspended = suspended
+
+    async def pause(self) -> bool:
+        """Pause the sandbox. Returns False if it was already paused."""
+        async with self._lock:
+            if self.paused:
+                return False
+            self._suspend_idle_captures(True)
+            try:
+                await asyncio.to_thread(self._sandbox.pause)
+            except Exception:
+                self._suspend_idle_captures(False)
+                raise
+            self.paused = True
+            self._paused_at = self._clock()
+            self.stats["pauses"] += 1
+        logger.info("Sandbox paused after %.0fs without a task", self.idle_after)
+        return True
+
+    async def _do_resume(self) -> None:
+        async with self._lock:
+            if not self.paused:
+                return
+            started = self._clock()
+            try:
+                await asyncio.to_thread(self._sandbox.connect, timeout=self.sandbox_timeout)
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+            latency = self._clock() - started
+            paused_for = started - self._paused_at
+            self.paused = False
+            self._paused_at = None
+            self._latencies.append(latency)
+            self.stats["resumes"] += 1
+            self.stats["pausedSeconds"] += paused_for
+            self._suspend_idle_captures(False)
+        logger.info("Sandbox resumed in %.1fs after %.0fs paused", latency, paused_for)
+
+    def prefetch(self) -> None:
+        """Start resuming in the background (a task has been queued)."""
+        if not self.enabled:
+            return
+        if self._resume is not None and not self._resume.done():
+            return
+        if self.paused or self._lock.locked():  # paused, or a pause is under way
+            if self._resume is not None and not self._resume.cancelled():
+                self._resume.exception()  # an earlier failed attempt is superseded
+            self._resume = asyncio.create_task(self._do_resume())
+
+    async def ensure_running(self) -> None:
+        """Wait until the sandbox is running again (resuming it if needed).
+
+        A failed resume is raised as ConnectionError, like a lost sandbox.
+        """
+        self.prefetch()
+        if self._resume is None:
+            return
+        task, self._resume = self._resume, None
+        try:
+            await task
+        except Exception as e:
+            raise ConnectionError(f"sandbox resume failed: {e}") from e
+
+    async def wait_for_task(self, task_queue: asyncio.Queue, terminated: asyncio.Event) -> dict | None:
+        """next_task() that pauses the sandbox after `idle_after` seconds without a task."""
+        if self.enabled and not self.paused and task_queue.empty() and not terminated.is_set():
+            name, task = await wait_first(
+                task=next_task(task_queue, terminated), idle=asyncio.sleep(self.idle_after)
+            )
+            if name == "task":
+                return task
+            try:
+                await self.pause()
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.warning("Idle pause failed, keeping the sandbox running: %s", e)
+        return await next_task(task_queue, terminated)
+
+    async def close(self) -> None:
+        """Let an in-flight resume finish before the sandbox is paused or killed for good."""
+        if self._resume is not None:
+            await asyncio.gather(self._resume, return_exceptions=True)
+            self._resume = None
+
+    def summary(self) -> dict:
+        """Pause count, running time saved and resume latency."""
+        paused_seconds = self.stats["pausedSeconds"]
+        if self.paused:
+            paused_seconds += self._clock() - self._paused_at
+        return {
+            "paused": self.paused,
+            "pauses": self.stats["pauses"],
+            "pausedSeconds": round(paused_seconds, 1),
+            "medianResumeMs": (
+                round(statistics.median(self._latencies) * 1000) if self._latencies else None
+            ),
+            "maxResumeMs": round(max(self._latencies) * 1000) if self._latencies else None,
+        }
@@ -0,0 +1,206 @@
+"""
+Crash-safe per-agent step journal.
+
+When a worker process dies mid-task, the replacement worker reconnects to
+the same sandbox (SANDBOX_ID) but used to start with an empty message
+history and replay buffer, redoing every step of the task. The journal
+records enough to pick up where the old process stopped:
+
+  {journal_dir}/{session_id}/{agent_id}/
+      journal.jsonl      one JSON record per line:
+                           {"type": "task", "taskId", "description", "whiteboard", "memories"}
+                           {"type": "step", "taskId", "step", "tool", "args", "result", "reasoning"}
+                           {"type": "frame", "file", "action", "capturedAt"}
+                           {"type": "task_done", "taskId", "result"}
+      frames/frame-NNNN.jpg  replay frames referenced by "frame" records
+
+load() replays the file into a JournalState: the unfinished task (if
+any) with its completed steps, the finished task ids and the saved replay
+frames. A torn last line from a crash mid-write is cut off, so the next
+record starts on a line of its own. The history summary the model sees on
+resume is rebuilt from the step records (see worker.summarize_steps), so it
+is not stored separately.
+
+Each append is written and flushed to the OS right away, which is all a
+crashed worker process needs. The fsync that also covers a host crash runs
+on a background thread (one fsync covers every append since the last), so
+journaling never blocks the event loop on the disk.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from replay import frame_filename
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_DIR = os.path.join(tempfile.gettempdir(), "opticon-journal")
+MAX_RESULT_CHARS = 2000
+
+
+class JournalState:
+    """What a previous worker process left behind."""
+
+    def __init__(self):
+        self.active_task: dict | None = None
+        self.steps: list[dict] = []
+        self.finished_task_ids: set[str] = set()
+        self.frames: list[dict] = []
+
+    @property
+    def resumable(self) -> bool:
+        return self.active_task is not None
+
+
+class StepJournal:
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.path = self.directory / "journal.jsonl"
+        self.frames_dir = self.directory / "frames"
+        self.current_task_id: str | None = None
+        self._file = None
+        self._frame_count = 0
+        self._dirty = threading.Event()
+        self._closing = False
+        self._syncer: threading.Thread | None = None
+
+    @classmethod
+    def for_agent(cls, session_id: str, agent_id: str, root: str | None = None) -> "StepJournal":
+        root = root or os.environ.get("JOURNAL_DIR", DEFAULT_JOURNAL_DIR)
+        return cls(Path(root) / session_id / agent_id)
+
+    def _append(self, record: dict) -> None:
+        if self._file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("a", encoding="utf-8")
+            self._closing = False
+            self._syncer = threading.Thread(
+                target=self._sync_loop, args=(self._file.fileno(),), name="journal-fsync", daemon=True
+            )
+            self._syncer.start()
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._dirty.set()
+
+    def _sync_loop(self, fd: int) -> None:
+        while True:
+            self._dirty.wait()
+            self._dirty.clear()
+            if self._closing:
+                return
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                logger.warning("Journal fsync failed: %s", e)
+
+    def _truncate_torn_tail(self) -> None:
+        with self.path.open("rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                logger.warning("Truncating torn journal record in %s", self.path)
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def load(self) -> JournalState:
+        """Read the journal left by a previous process (empty state if none)."""
+        state = JournalState()
+        if not self.path.exists():
+            return state
+
+        self._truncate_torn_tail()
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Ignoring torn journal record in %s", self.path)
+                    continue
+                kind = record.get("type")
+                if kind == "task":
+                    state.active_task = record
+                    state.steps = []
+                elif kind == "step" and state.active_task is not None:
+                    if record["taskId"] == state.active_task["taskId"]:
+                        state.steps.append(record)
+                elif kind == "task_done":
+                    state.finished_task_ids.add(record["taskId"])
+                    if state.active_task and state.active_task["taskId"] == record["taskId"]:
+                        state.active_task = None
+                        state.steps = []
+                elif kind == "frame":
+                    if (self.frames_dir / record["file"]).exists():
+                        state.frames.append(record)
+
+        self._frame_count = len(state.frames)
+        if state.active_task is not None:
+            self.current_task_id = state.active_task["taskId"]
+        return state
+
+    def read_frame(self, record: dict) -> bytes:
+        return (self.frames_dir / record["file"]).read_bytes()
+
+    def start_task(self, task_id: str, description: str, whiteboard: str = "", memories: str = "") -> None:
+        self.current_task_id = task_id
+        self._append({
+            "type": "task",
+            "taskId": task_id,
+            "description": description,
+            "whiteboard": whiteboard,
+            "memories": memories,
+        })
+
+    def record_step(self, step: int, tool: str, args: dict, result: str, reasoning: str | None = None) -> None:
+        """Record a completed step (the tool has already run) of the current task."""
+        self._append({
+            "type": "step",
+            "taskId": self.current_task_id,
+            "step": step,
+            "tool": tool,
+            "args": args,
+            "result": (result or "")[:MAX_RESULT_CHARS],
+            "reasoning": reasoning,
+        })
+
+    def record_frame(self, jpeg_bytes: bytes, action: str, captured_at: float | None = None) -> None:
+        """Persist a kept replay frame and reference it from the journal."""
+        self.frames_dir.mkdir(parents=True, exist_ok=True)
+        name = frame_filename(self._frame_count)
+        tmp = self.frames_dir / f"{name}.tmp"
+        tmp.write_bytes(jpeg_bytes)
+        os.replace(tmp, self.frames_dir / name)
+        self._frame_count += 1
+        self._append({
+            "type": "frame",
+            "file": name,
+            "action": action,
+            "capturedAt": captured_at if captured_at is not None else time.time(),
+        })
+
+    def finish_task(self, task_id: str, result: str) -> None:
+        self._append({"type": "task_done", "taskId": task_id, "result": (result or "")[:MAX_RESULT_CHARS]})
+        self.current_task_id = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._closing = True
+            self._dirty.set()
+            self._syncer.join()
+            self._syncer = None
+            try:
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                logger.warning("Journal fsync failed: %s", e)
+            self._file.close()
+            self._file = None
+
+    def reset(self) -> None:
+        """Discard any previous journal and frames (fresh sandbox, nothing to resume)."""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.current_task_id = None
+        self._frame_count = 0
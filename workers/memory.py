@@ -9,17 +9,164 @@ All operations are wrapped in try/except so memory failures never crash
 the agent loop.
 """
 
+import asyncio
+import json
 import logging
 import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from difflib import SequenceMatcher
 
 logger = logging.getLogger(__name__)
 
 
+DEFAULT_SERVICE_SOCKET = os.path.join(tempfile.gettempdir(), "opticon-memory.sock")
+DEFAULT_MAX_PREFETCHED = 50  # prefetched task memories held at once
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class RetrievalCache:
+    """
+    Per-user cache of formatted retrieve_memories results.
+
+    Keys are normalised query text; a lookup also matches a cached query
+    whose similarity ratio is at least similarity_threshold, so reworded
+    repeats of the same task hit. Entries expire after ttl seconds, each
+    user keeps at most max_entries (least recently used evicted first), and
+    invalidate(user_id) drops everything for a user after a store.
+
+    Thread-safe: retrieve and store run in worker threads via to_thread.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_entries: int = 32,
+        similarity_threshold: float = 0.9,
+        clock=time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+        self._entries: dict[str, OrderedDict[str, tuple[float, str]]] = {}
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def generation(self, user_id: str) -> int:
+        """Current invalidation generation for a user (pass back to put())."""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(self, user_id: str, query: str, record_stats: bool = True) -> str | None:
+        key = _normalize(query)
+        now = self._clock()
+        with self._lock:
+            entries = self._entries.get(user_id)
+            if entries:
+                for cached_key in [k for k, (expires, _) in entries.items() if expires <= now]:
+                    del entries[cached_key]
+
+                match = key if key in entries else next(
+                    (
+                        k for k in reversed(entries)
+                        if SequenceMatcher(None, k, key).ratio() >= self.similarity_threshold
+                    ),
+                    None,
+                )
+                if match is not None:
+                    entries.move_to_end(match)
+                    if record_stats:
+                        self.stats["hits"] += 1
+                    return entries[match][1]
+
+            if record_stats:
+                self.stats["misses"] += 1
+            return None
+
+    def put(self, user_id: str, query: str, value: str, generation: int) -> None:
+        """Cache a result unless the user was invalidated since `generation`."""
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            key = _normalize(query)
+            entries = self._entries.setdefault(user_id, OrderedDict())
+            entries[key] = (self._clock() + self.ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self.stats["invalidations"] += 1
+
+
+class _BatchingEmbedder:
+    """
+    Wraps Mem0's embedder so several queries can be embedded in one model
+    call. embed_batch() encodes a list of texts at once and memoises the
+    vectors; Mem0's own per-query embed() calls then hit the memo. Anything
+    else is delegated to the wrapped embedder.
+    """
+
+    def __init__(self, inner, memo_size: int = 256):
+        self._inner = inner
+        self._memo: OrderedDict[str, list[float]] = OrderedDict()
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def embed(self, text, memory_action=None):
+        with self._lock:
+            vector = self._memo.pop(text, None)
+        if vector is not None:
+            return vector
+        return self._inner.embed(text, memory_action)
+
+    def embed_batch(self, texts: list[str]) -> None:
+        model = getattr(self._inner, "model", None)
+        texts = list(dict.fromkeys(texts))
+        if len(texts) < 2 or not hasattr(model, "encode"):
+            return
+        vectors = model.encode(texts, convert_to_numpy=True)
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._memo[text] = vector.tolist()
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+
+
+MEMORY_BACKEND_MEM0 = "mem0"
+MEMORY_BACKEND_LOCAL = "local"
+
+_MEMORIES_DIR = os.path.join(os.path.dirname(__file__), "..", ".memories")
+
+
 class MemoryManager:
-    """Lazy-initialised wrapper around Mem0's Memory class."""
+    """Lazy-initialised wrapper around Mem0's Memory class.
+
+    backend selects the store (default from MEMORY_BACKEND):
+      - "mem0":  Mem0 with LLM fact extraction and file-based Qdrant
+      - "local": vector_index.LocalVectorMemory, a numpy index per user
+    """
 
-    def __init__(self):
+    def __init__(self, cache: RetrievalCache | None = None, backend: str | None = None):
         self._memory = None
+        self.cache = cache or RetrievalCache()
+        self.backend = backend or os.environ.get("MEMORY_BACKEND", MEMORY_BACKEND_MEM0)
 
     def _get_memory(self):
         """Initialise the Memory instance on first use (downloads embedding
@@ -27,6 +174,14 @@ class MemoryManager:
         if self._memory is not None:
             return self._memory
 
+        if self.backend == MEMORY_BACKEND_LOCAL:
+            from vector_index import LocalVectorMemory
+
+            self._memory = LocalVectorMemory(os.path.join(_MEMORIES_DIR, "local"))
+            self._memory.embedding_model = _BatchingEmbedder(self._memory.embedding_model)
+            logger.info("Local vector memory initialised")
+            return self._memory
+
         try:
             from mem0 import Memory
 
@@ -50,15 +205,14 @@ class MemoryManager:
                     "provider": "qdrant",
                     "config": {
                         "collection_name": "opticon_memories",
-                        "path": os.path.join(
-                            os.path.dirname(__file__), "..", ".memories"
-                        ),
+                        "path": _MEMORIES_DIR,
                         "embedding_model_dims": 384,
                     },
                 },
             }
 
             self._memory = Memory.from_config(config)
+            self._memory.embedding_model = _BatchingEmbedder(self._memory.embedding_model)
             logger.info("Mem0 memory layer initialised")
         except Exception as e:
             logger.warning("Failed to initialise Mem0: %s — memory disabled", e)
@@ -68,12 +222,21 @@ class MemoryManager:
 
     def retrieve_memories(self, user_id: str, query: str) -> str:
         """Search for relevant memories and return a formatted string for
-        system-prompt injection.  Returns empty string on failure."""
+        system-prompt injection.  Returns empty string on failure.
+
+        Results are served from the per-user RetrievalCache when a same or
+        similar query was answered since the user's last store."""
+        cached = self.cache.get(user_id, query)
+        if cached is not None:
+            logger.info("Memory cache hit for user %s", user_id)
+            return cached
+
         try:
             mem = self._get_memory()
             if mem is None:
                 return ""
 
+            generation = self.cache.generation(user_id)
             results = mem.search(query=query, user_id=user_id, limit=5)
 
             memories = []
@@ -82,9 +245,6 @@ class MemoryManager:
             elif isinstance(results, list):
                 memories = results
 
-            if not memories:
-                return ""
-
             lines = []
             for m in memories:
                 text = m.get("memory", "") if isinstance(m, dict) else str(m)
@@ -92,6 +252,7 @@ class MemoryManager:
                     lines.append(f"- {text}")
 
             if not lines:
+                self.cache.put(user_id, query, "", generation)
                 return ""
 
             header = (
@@ -100,6 +261,7 @@ class MemoryManager:
                 "with this user:\n"
             )
             formatted = header + "\n".join(lines)
+            self.cache.put(user_id, query, formatted, generation)
             logger.info("Retrieved %d memories for user %s", len(lines), user_id)
             return formatted
 
@@ -107,18 +269,52 @@ class MemoryManager:
             logger.warning("Failed to retrieve memories: %s", e)
             return ""
 
+    def retrieve_memories_batch(self, requests: list[tuple[str, str]]) -> list[str]:
+        """retrieve_memories for several (user_id, query) pairs, embedding
+        all uncached queries in a single model call first."""
+        try:
+            uncached = [
+                q for u, q in requests
+                if self.cache.get(u, q, record_stats=False) is None
+            ]
+            mem = self._get_memory() if uncached else None
+            embedder = getattr(mem, "embedding_model", None)
+            if isinstance(embedder, _BatchingEmbedder):
+                embedder.embed_batch(uncached)
+        except Exception as e:
+            logger.warning("Batched memory embedding failed: %s", e)
+        return [self.retrieve_memories(user_id, query) for user_id, query in requests]
+
     def store_memories(self, user_id: str, task_description: str, result: str) -> None:
         """Extract and persist new memories from the completed task."""
+        self.store_memories_batch(user_id, [(task_description, result)])
+
+    def store_memories_batch(
+        self, user_id: str, items: list[tuple[str, str]]
+    ) -> None:
+        """Extract and persist memories from several completed tasks with a
+        single Mem0 add (one extraction call instead of one per task)."""
         try:
             mem = self._get_memory()
-            if mem is None:
+            if mem is None or not items:
                 return
 
-            conversation_text = (
-                f"User asked: {task_description}\n\nAgent result: {result}"
-            )
+            if self.backend == MEMORY_BACKEND_LOCAL:
+                # No LLM extraction: each task/result pair is one memory
+                payload = [
+                    f"Task: {task_description} — Result: {result}"
+                    for task_description, result in items
+                ]
+            else:
+                payload = "\n\n---\n\n".join(
+                    f"User asked: {task_description}\n\nAgent result: {result}"
+                    for task_description, result in items
+                )
 
-            add_result = mem.add(conversation_text, user_id=user_id)
+            try:
+                add_result = mem.add(payload, user_id=user_id)
+            finally:
+                self.cache.invalidate(user_id)
 
             count = 0
             if isinstance(add_result, dict) and "results" in add_result:
@@ -126,7 +322,305 @@ class MemoryManager:
             elif isinstance(add_result, list):
                 count = len(add_result)
 
-            logger.info("Stored %d memories for user %s", count, user_id)
+            logger.info(
+                "Stored %d memories for user %s from %d task(s)",
+                count, user_id, len(items),
+            )
 
         except Exception as e:
             logger.warning("Failed to store memories: %s", e)
+
+
+class RemoteMemoryManager:
+    """
+    Thin MemoryManager client for the shared memory service
+    (memory_service.py), reached over a Unix socket.
+
+    One service process per host owns the embedding model and the Qdrant
+    store, so workers don't each load sentence-transformers/torch and don't
+    contend on the file-based store. The service is started on first use if
+    it isn't already running. Same interface as MemoryManager; failures are
+    logged and treated as "no memories", never raised.
+
+    A failed connect (re)spawns the service, so one that exited after its
+    idle timeout or crashed comes back on the next call. Concurrent spawns
+    from several workers are harmless: the service's lock file lets only
+    one of them serve.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SERVICE_SOCKET,
+        timeout: float = 120.0,
+        autostart: bool = True,
+    ):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.autostart = autostart
+        self.spawns = 0
+
+    def _spawn_service(self) -> None:
+        service = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_service.py")
+        subprocess.Popen(
+            [sys.executable, service, "--socket", self.socket_path],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.spawns += 1
+        logger.info("Started memory service at %s", self.socket_path)
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + 15.0
+        spawned = False
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                sock.settimeout(self.timeout)
+                return sock
+            except OSError:
+                sock.close()
+                if not self.autostart or time.monotonic() > deadline:
+                    raise
+                if not spawned:
+                    self._spawn_service()
+                    spawned = True
+                time.sleep(0.1)
+
+    def _call(self, op: str, **params):
+        with self._connect() as sock:
+            sock.sendall(json.dumps({"op": op, **params}).encode() + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError("memory service closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def retrieve_memories(self, user_id: str, query: str) -> str:
+        try:
+            return self._call("retrieve", user_id=user_id, query=query)
+        except Exception as e:
+            logger.warning("Failed to retrieve memories from service: %s", e)
+            return ""
+
+    def retrieve_memories_batch(self, requests: list[tuple[str, str]]) -> list[str]:
+        try:
+            return self._call("retrieve_batch", requests=[list(r) for r in requests])
+        except Exception as e:
+            logger.warning("Failed to retrieve memories from service: %s", e)
+            return ["" for _ in requests]
+
+    def store_memories(self, user_id: str, task_description: str, result: str) -> None:
+        self.store_memories_batch(user_id, [(task_description, result)])
+
+    def store_memories_batch(self, user_id: str, items: list[tuple[str, str]]) -> None:
+        try:
+            self._call("store_batch", user_id=user_id, items=[list(i) for i in items])
+        except Exception as e:
+            logger.warning("Failed to store memories via service: %s", e)
+
+
+class MemoryPrefetcher:
+    """
+    Retrieves memories for tasks as soon as they are queued, so a task's
+    memory context is ready by the time the worker starts it.
+
+    Queries arriving within batch_window of each other are retrieved with
+    one retrieve_memories_batch call (one embedding model call). get()
+    returns the prefetched result, or retrieves on the spot if the task was
+    never prefetched. Tasks the worker skips call discard(), and at most
+    max_prefetched results are held; the oldest are dropped beyond that.
+    """
+
+    def __init__(
+        self,
+        manager: "MemoryManager | RemoteMemoryManager",
+        user_id: str,
+        batch_window: float = 0.05,
+        max_prefetched: int = DEFAULT_MAX_PREFETCHED,
+    ):
+        self._manager = manager
+        self._user_id = user_id
+        self.batch_window = batch_window
+        self.max_prefetched = max_prefetched
+        self._results: dict[str, asyncio.Future] = {}
+        self._queued: list[str] = []
+        self._flush_task: asyncio.Task | None = None
+        self.stats = {
+            "prefetched": 0, "ready_at_start": 0, "waited": 0, "unprefetched": 0, "discarded": 0,
+        }
+
+    def prefetch(self, query: str) -> None:
+        """Start retrieving memories for a queued task (non-blocking)."""
+        if query in self._results:
+            return
+        while len(self._results) >= self.max_prefetched:
+            self.discard(next(iter(self._results)))  # oldest first
+        self._results[query] = asyncio.get_running_loop().create_future()
+        self._queued.append(query)
+        self.stats["prefetched"] += 1
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        queries, self._queued = self._queued, []
+        self._flush_task = None
+        if not queries:  # every queued task was discarded
+            return
+        try:
+            results = await asyncio.to_thread(
+                self._manager.retrieve_memories_batch,
+                [(self._user_id, q) for q in queries],
+            )
+        except Exception as e:
+            logger.warning("Memory prefetch failed: %s", e)
+            results = [""] * len(queries)
+        for query, result in zip(queries, results):
+            future = self._results.get(query)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def get(self, query: str) -> str:
+        """Memory context for a task that is about to start."""
+        future = self._results.pop(query, None)
+        if future is None:
+            self.stats["unprefetched"] += 1
+            return await asyncio.to_thread(
+                self._manager.retrieve_memories, self._user_id, query
+            )
+        self.stats["ready_at_start" if future.done() else "waited"] += 1
+        return await future
+
+    def discard(self, query: str) -> None:
+        """Drop the prefetched result of a task that will not be started."""
+        future = self._results.pop(query, None)
+        if future is None:
+            return
+        self.stats["discarded"] += 1
+        if query in self._queued:
+            self._queued.remove(query)
+        if not future.done():
+            future.cancel()
+
+
+class MemoryWriter:
+    """
+    Background write queue for MemoryManager.
+
+    submit() returns immediately so memory extraction (an LLM call plus
+    embedding and vector-store writes) stays off the inter-task critical
+    path. Pending writes are grouped per user and flushed as one
+    store_memories_batch call after flush_interval seconds, or on close().
+    Near-duplicate task/result pairs for the same user are skipped, and the
+    queue holds at most max_pending items — extra submissions are dropped
+    and counted in stats.
+    """
+
+    def __init__(
+        self,
+        manager: "MemoryManager | RemoteMemoryManager",
+        max_pending: int = 50,
+        flush_interval: float = 5.0,
+        dedup_threshold: float = 0.9,
+        dedup_window: int = 20,
+    ):
+        self._manager = manager
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.dedup_threshold = dedup_threshold
+        self.dedup_window = dedup_window
+        self._pending: dict[str, list[tuple[str, str]]] = {}
+        self._recent: dict[str, deque[str]] = {}
+        self._wakeup = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self.stats = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "dropped": 0,
+            "written": 0,
+            "batches": 0,
+        }
+
+    @property
+    def pending_count(self) -> int:
+        return sum(len(items) for items in self._pending.values())
+
+    def start(self) -> None:
+        """Start the background flush task (requires a running event loop)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def _is_duplicate(self, user_id: str, key: str) -> bool:
+        for seen in self._recent.get(user_id, ()):
+            if seen == key or SequenceMatcher(None, seen, key).ratio() >= self.dedup_threshold:
+                return True
+        return False
+
+    def submit(self, user_id: str, task_description: str, result: str) -> bool:
+        """Queue a completed task for memory extraction. Never blocks.
+
+        Returns True if the write was queued, False if it was skipped as a
+        near-duplicate or dropped because the queue is full (or closed).
+        """
+        self.stats["submitted"] += 1
+        key = _normalize(f"{task_description}\n{result}")
+
+        if self._is_duplicate(user_id, key):
+            self.stats["deduplicated"] += 1
+            return False
+        if self._closed or self.pending_count >= self.max_pending:
+            self.stats["dropped"] += 1
+            logger.warning("Memory write queue full — dropping write for user %s", user_id)
+            return False
+
+        self._recent.setdefault(user_id, deque(maxlen=self.dedup_window)).append(key)
+        self._pending.setdefault(user_id, []).append((task_description, result))
+        self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            if not self._closed:
+                # Give follow-up tasks a moment to land in the same batch
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+            if self._closed and not self._pending:
+                return
+
+    async def flush(self) -> None:
+        """Write all pending memories now, one batch per user."""
+        self._wakeup.clear()
+        pending, self._pending = self._pending, {}
+        for user_id, items in pending.items():
+            await asyncio.to_thread(self._manager.store_memories_batch, user_id, items)
+            self.stats["batches"] += 1
+            self.stats["written"] += len(items)
+
+    async def close(self, timeout: float = 30.0) -> None:
+        """Stop accepting writes and flush whatever is still pending."""
+        self._closed = True
+        self._stop.set()
+        self._wakeup.set()
+        try:
+            if self._task is not None:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            else:
+                await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Memory flush timed out after %.0fs — %d write(s) still pending",
+                timeout, self.pending_count,
+            )
+        logger.info("Memory writer closed: %s", self.stats)
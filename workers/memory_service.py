@@ -0,0 +1,199 @@
+"""
+Shared per-host memory service.
+
+One process owns the Mem0 instance (sentence-transformers embedder + the
+file-based Qdrant store) and serves every worker on the host over a Unix
+socket, instead of each worker loading its own ~80 MB model and opening the
+same Qdrant path concurrently. Workers talk to it through
+memory.RemoteMemoryManager, which also starts it on first use.
+
+Protocol: one newline-terminated JSON request per line, one JSON response
+per line ({"result": ...} or {"error": "..."}).
+
+    {"op": "retrieve", "user_id": ..., "query": ...}
+    {"op": "retrieve_batch", "requests": [[user_id, query], ...]}
+    {"op": "store_batch", "user_id": ..., "items": [[task, result], ...]}
+    {"op": "stats"}
+
+Retrieves arriving within batch_window of each other (from any agent) are
+answered together so their query embeddings come from one model call.
+Retrieves and stores each run on their own thread, so a slow store batch
+(embedding plus Qdrant writes) never holds up the retrieve a worker is
+waiting on before it can start a task. The embedder is lock-protected and
+RetrievalCache generations keep a retrieve racing a store from caching a
+stale result.
+"""
+
+import argparse
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+from memory import DEFAULT_SERVICE_SOCKET, MemoryManager
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW_SECONDS = 0.02
+MAX_BATCH = 32
+IDLE_TIMEOUT_SECONDS = 900
+
+
+class MemoryService:
+    def __init__(
+        self,
+        manager: MemoryManager,
+        batch_window: float = BATCH_WINDOW_SECONDS,
+        max_batch: int = MAX_BATCH,
+    ):
+        self._manager = manager
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._retrieve_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mem0-retrieve")
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mem0-store")
+        self._pending: list[tuple[str, str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self.last_activity = asyncio.get_running_loop().time()
+        self.stats = {"requests": 0, "retrieves": 0, "retrieve_batches": 0, "stores": 0}
+
+    async def _run(self, executor: ThreadPoolExecutor, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def _retrieve(self, user_id: str, query: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_id, query, future))
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.batch_window)
+        return future
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self._flush())
+        )
+
+    async def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.stats["retrieve_batches"] += 1
+        self.stats["retrieves"] += len(batch)
+        try:
+            results = await self._run(
+                self._retrieve_executor,
+                self._manager.retrieve_memories_batch, [(u, q) for u, q, _ in batch]
+            )
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def dispatch(self, request: dict):
+        op = request.get("op")
+        if op == "retrieve":
+            return await self._retrieve(request["user_id"], request["query"])
+        if op == "retrieve_batch":
+            return await asyncio.gather(
+                *(self._retrieve(u, q) for u, q in request["requests"])
+            )
+        if op == "store_batch":
+            self.stats["stores"] += 1
+            items = [tuple(i) for i in request["items"]]
+            await self._run(
+                self._store_executor, self._manager.store_memories_batch, request["user_id"], items
+            )
+            return None
+        if op == "stats":
+            return {**self.stats, "cache": dict(self._manager.cache.stats)}
+        raise ValueError(f"Unknown op: {op}")
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                self.stats["requests"] += 1
+                self.last_activity = asyncio.get_running_loop().time()
+                try:
+                    response = {"result": await self.dispatch(json.loads(line))}
+                except Exception as e:
+                    logger.warning("Memory service request failed: %s", e)
+                    response = {"error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def _socket_in_use(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+async def serve(socket_path: str, idle_timeout: float) -> None:
+    service = MemoryService(MemoryManager())
+    server = await asyncio.start_unix_server(service.handle_client, path=socket_path)
+    logger.info("Memory service listening on %s", socket_path)
+
+    async with server:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(60, idle_timeout))
+            if loop.time() - service.last_activity >= idle_timeout:
+                logger.info("Memory service idle for %.0fs — exiting", idle_timeout)
+                break
+
+    os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared Mem0 memory service")
+    parser.add_argument("--socket", default=os.environ.get("MEMORY_SERVICE_SOCKET", DEFAULT_SERVICE_SOCKET))
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=f"{args.socket}.log",
+        level=logging.INFO,
+        format="[%(levelname)s] memory-service: %(message)s",
+    )
+
+    # Several workers may race to start the service: the lock file decides
+    # which one serves, the rest exit quietly.
+    lock_file = open(f"{args.socket}.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return
+
+    if os.path.exists(args.socket):
+        if _socket_in_use(args.socket):
+            return
+        os.unlink(args.socket)  # stale socket from a crashed service
+
+    asyncio.run(serve(args.socket, args.idle_timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Model cascade for the agent loop.
+
+Most agent steps are follow-through on a plan the model has already made
+(press Enter after typing a URL, keep scrolling, click the button that
+just appeared). ModelRouter sends those routine steps to a cheaper, faster
+model and keeps the strong model for the steps that need it:
+
+  strong model when
+    - the task has just started (the first `warmup_steps` steps)
+    - the previous tool call failed (result starts with "ERROR")
+    - the agent looks stuck: the last action left the screen unchanged,
+      or the same action was repeated
+    - the fast model has taken `max_fast_streak` steps in a row
+      (periodic re-grounding by the strong model)
+  fast model otherwise
+
+A fast-model answer is escalated to the strong model within the same step
+when it is unusable or high-stakes: no tool call, unparseable arguments,
+or `done` (the strong model confirms completion). A failed fast-model call
+(an error or timeout) is not retried on the fast model; the step goes
+straight to the strong model.
+
+Routing is opt-in: set MODEL_ROUTER=true to enable it.
+
+Per-model step counts, latencies and the escalation rate are kept in
+stats / summary().
+"""
+
+import io
+import json
+import logging
+import os
+import statistics
+from collections import deque
+
+from replay import SIGNATURE_HEIGHT, SIGNATURE_WIDTH, CapturePolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAST_MODEL = "anthropic/claude-haiku-4-5-20251001"
+WARMUP_STEPS = 2
+MAX_FAST_STREAK = 4
+STALL_CHANGE_THRESHOLD = 0.001  # changed-cell fraction below which the screen "did not change"
+LATENCY_WINDOW = 200  # recent latencies kept per model for the median
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        strong_model: str,
+        fast_model: str | None = DEFAULT_FAST_MODEL,
+        warmup_steps: int = WARMUP_STEPS,
+        max_fast_streak: int = MAX_FAST_STREAK,
+    ):
+        self.strong_model = strong_model
+        self.fast_model = fast_model
+        self.warmup_steps = warmup_steps
+        self.max_fast_streak = max_fast_streak
+        self._signature: bytes | None = None
+        self._screen_changed = True
+        self._last_action: tuple[str, str] | None = None
+        self._repeated_action = False
+        self._last_error = False
+        self._fast_streak = 0
+        self._latencies: dict[str, deque] = {}
+        self.stats = {"steps": {}, "fast_attempts": 0, "escalations": 0, "reasons": {}}
+
+    @classmethod
+    def from_env(cls, strong_model: str) -> "ModelRouter":
+        """MODEL_ROUTER=true enables routing and FAST_MODEL picks the cheap
+        model; by default (or with an empty FAST_MODEL) every step goes to
+        the strong model."""
+        fast = os.environ.get("FAST_MODEL", DEFAULT_FAST_MODEL) or None
+        if os.environ.get("MODEL_ROUTER", "false").lower() != "true":
+            fast = None
+        return cls(strong_model, fast)
+
+    def start_task(self) -> None:
+        """Reset the per-task routing state (stats accumulate across tasks)."""
+        self._signature = None
+        self._screen_changed = True
+        self._last_action = None
+        self._repeated_action = False
+        self._last_error = False
+        self._fast_streak = 0
+
+    def observe_screen(self, raw_png: bytes) -> None:
+        """Feed the screenshot the next step will be decided on."""
+        if self.fast_model is None:
+            return  # every step goes to the strong model anyway
+
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(raw_png))
+        img.draft("RGB", (SIGNATURE_WIDTH, SIGNATURE_HEIGHT))
+        signature = CapturePolicy.signature(img)
+        if self._signature is not None:
+            self._screen_changed = (
+                CapturePolicy.changed_fraction(signature, self._signature) >= STALL_CHANGE_THRESHOLD
+            )
+        self._signature = signature
+
+    def observe_action(self, name: str, args: dict, result: str) -> None:
+        """Feed the tool call the agent just executed and its result."""
+        action = (name, json.dumps(args, sort_keys=True))
+        self._repeated_action = action == self._last_action
+        self._last_action = action
+        self._last_error = str(result).startswith("ERROR")
+
+    def _strong_reason(self, step: int) -> str | None:
+        if self.fast_model is None:
+            return "disabled"
+        if step < self.warmup_steps:
+            return "warmup"
+        if self._last_error:
+            return "error"
+        if not self._screen_changed or self._repeated_action:
+            return "stall"
+        if self._fast_streak >= self.max_fast_streak:
+            return "regrounding"
+        return None
+
+    def choose(self, step: int) -> str:
+        """Pick the model for this step."""
+        reason = self._strong_reason(step)
+        if reason is None:
+            self._fast_streak += 1
+            self.stats["fast_attempts"] += 1
+            return self.fast_model
+        self._fast_streak = 0
+        self.stats["reasons"][reason] = self.stats["reasons"].get(reason, 0) + 1
+        return self.strong_model
+
+    def should_escalate(self, model: str, tool_name: str | None, arguments: str | None) -> str | None:
+        """Return why a fast-model answer must be redone by the strong model, or None."""
+        if model != self.fast_model:
+            return None
+        if not tool_name:
+            return "no_tool_call"
+        if tool_name == "done":
+            return "done"
+        try:
+            json.loads(arguments or "")
+        except json.JSONDecodeError:
+            return "bad_arguments"
+        return None
+
+    def record_escalation(self, reason: str) -> None:
+        self._fast_streak = 0
+        self.stats["escalations"] += 1
+        key = f"escalated:{reason}"
+        self.stats["reasons"][key] = self.stats["reasons"].get(key, 0) + 1
+        logger.info("Escalating step to %s (%s)", self.strong_model, reason)
+
+    def record_call(self, model: str, latency: float) -> None:
+        self.stats["steps"][model] = self.stats["steps"].get(model, 0) + 1
+        self._latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    @property
+    def escalation_rate(self) -> float:
+        attempts = self.stats["fast_attempts"]
+        return self.stats["escalations"] / attempts if attempts else 0.0
+
+    def summary(self) -> dict:
+        """Step counts, median latency per model and the escalation rate."""
+        return {
+            "steps": dict(self.stats["steps"]),
+            "medianLatency": {
+                model: round(statistics.median(values), 3)
+                for model, values in self._latencies.items() if values
+            },
+            "escalationRate": round(self.escalation_rate, 3),
+            "reasons": dict(self.stats["reasons"]),
+        }
@@ -0,0 +1,214 @@
+"""
+Outbound socket.io event pipeline for the worker.
+
+The agent loop, heartbeat, thumbnail and checkpoint tasks all emit through
+an EventOutbox instead of awaiting sio.emit inline, so a slow or
+reconnecting socket never stalls the agent:
+
+  - put() only enqueues; a single sender task drains the queue in order
+  - superseded events (thumbnails, heartbeats) are coalesced: a new one
+    replaces any copy still waiting to be sent
+  - while the socket is down, events are buffered and sent after the
+    reconnect, preceded by the `hello` event (the room join, with
+    hello_data)
+  - the queue is bounded: on overflow the oldest droppable event is
+    discarded. PRIORITY_EVENTS such as task:completed and replay:complete
+    are not dropped for ordinary events, but have their own bound
+    (max_priority, oldest dropped first) so a long outage cannot grow the
+    queue without limit
+  - with `acks` on (negotiated with the server), PRIORITY_EVENTS are sent
+    with an acknowledgement callback and only count as sent once the
+    server has handled them, so flush() means delivered, not just written.
+    Each carries an `eventId`, kept across retries, which the server uses
+    to ignore a retry whose acknowledgement was lost
+  - a send that fails while connected is retried up to MAX_SEND_ATTEMPTS
+    times and then given up on; failures while disconnected wait for the
+    reconnect and are not counted
+  - queue depth and drop counts are kept in stats
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+COALESCED_EVENTS = frozenset({"agent:thumbnail", "agent:heartbeat"})
+PRIORITY_EVENTS = frozenset({
+    "task:completed",
+    "replay:complete",
+    "agent:terminated",
+    "agent:paused",
+    "agent:sandbox_expired",
+})
+
+DEFAULT_MAX_QUEUE = 500
+DEFAULT_MAX_PRIORITY = 100
+ACK_TIMEOUT = 5.0  # seconds; an unacknowledged event is retried
+MAX_SEND_ATTEMPTS = 5  # failed sends on a connected socket before an event is given up
+RETRY_DELAY = 0.5  # seconds between attempts on a connected socket
+
+
+class EventOutbox:
+    def __init__(
+        self,
+        sio,
+        base_payload: dict,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        hello: str | None = None,
+        hello_data: dict | None = None,
+        acks: bool = False,
+        max_priority: int = DEFAULT_MAX_PRIORITY,
+    ):
+        self._sio = sio
+        self._base = base_payload
+        self.max_queue = max_queue
+        self.max_priority = max_priority
+        self.hello = hello
+        self.hello_data = hello_data or {}
+        self.acks = acks
+        self._queue: deque[tuple[str, dict, int]] = deque()  # (event, data, failed attempts)
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._connected = asyncio.Event()
+        if sio.connected:
+            self._connected.set()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self.stats = {
+            "queued": 0,
+            "sent": 0,
+            "acked": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "dropped_priority": 0,
+            "send_errors": 0,
+            "given_up": 0,
+            "max_depth": 0,
+        }
+
+        sio.on("connect", self._on_connect)
+        sio.on("disconnect", self._on_disconnect)
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    async def _on_connect(self):
+        if self._task is not None and self.hello:
+            # Reconnected: rejoin the session room before anything else
+            self._queue.appendleft((self.hello, self.hello_data, 0))
+            self._wake()
+        self._connected.set()
+
+    async def _on_disconnect(self, *args):
+        self._connected.clear()
+        logger.warning("Socket disconnected — buffering %d outbound event(s)", len(self._queue))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def _wake(self) -> None:
+        self._idle.clear()
+        self._ready.set()
+
+    def put(self, event: str, data: dict) -> None:
+        """Queue an event for sending. Never blocks and never raises."""
+        if self._closed:
+            logger.warning("Outbox closed — discarding %s", event)
+            return
+
+        if event in COALESCED_EVENTS:
+            for i, (queued, _, _) in enumerate(self._queue):
+                if queued == event:
+                    del self._queue[i]
+                    self.stats["coalesced"] += 1
+                    break
+
+        if event in PRIORITY_EVENTS:
+            data = {**data, "eventId": uuid.uuid4().hex}
+            priority = [i for i, (queued, _, _) in enumerate(self._queue) if queued in PRIORITY_EVENTS]
+            if len(priority) >= self.max_priority:
+                dropped = self._queue[priority[0]][0]
+                del self._queue[priority[0]]
+                self.stats["dropped_priority"] += 1
+                logger.error("Too many undelivered priority events — dropped %s", dropped)
+        elif len(self._queue) >= self.max_queue:
+            for i, (queued, _, _) in enumerate(self._queue):
+                if queued not in PRIORITY_EVENTS:
+                    del self._queue[i]
+                    self.stats["dropped"] += 1
+                    logger.warning("Outbound queue full — dropped %s", queued)
+                    break
+
+        self._queue.append((event, data, 0))
+        self.stats["queued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self._queue))
+        self._wake()
+
+    async def emit(self, event: str, data: dict) -> None:
+        """Drop-in async replacement for the worker's old inline emit."""
+        self.put(event, data)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue:
+                await self._connected.wait()
+                # Taken off the queue while in flight so put() can't coalesce
+                # or drop it; pushed back to the front if the send fails
+                event, data, attempts = self._queue.popleft()
+                try:
+                    if self.acks and event in PRIORITY_EVENTS:
+                        await self._sio.call(event, {**self._base, **data}, timeout=ACK_TIMEOUT)
+                        self.stats["acked"] += 1
+                    else:
+                        await self._sio.emit(event, {**self._base, **data})
+                except Exception as e:
+                    self.stats["send_errors"] += 1
+                    if not self._sio.connected:
+                        # Sent again after the reconnect; not the event's fault
+                        self._queue.appendleft((event, data, attempts))
+                        self._connected.clear()
+                        logger.warning("Failed to emit %s (will retry after reconnect): %s", event, e)
+                        continue
+                    attempts += 1
+                    if attempts >= MAX_SEND_ATTEMPTS:
+                        self.stats["given_up"] += 1
+                        logger.error("Giving up on %s after %d failed attempts: %s", event, attempts, e)
+                        continue
+                    self._queue.appendleft((event, data, attempts))
+                    logger.warning("Failed to emit %s (will retry): %s", event, e)
+                    await asyncio.sleep(RETRY_DELAY)
+                    continue
+                self.stats["sent"] += 1
+            self._idle.set()
+
+    async def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued event has been sent (acknowledged, for priority
+        events with `acks` on). Returns False on timeout."""
+        if not self._queue and self._idle.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Outbox flush timed out with %d event(s) unsent", len(self._queue))
+            return False
+
+    async def close(self, timeout: float = 5.0) -> bool:
+        """Flush, then stop the sender. Returns False if events were left unsent."""
+        flushed = await self.flush(timeout)
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return flushed
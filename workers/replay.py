@@ -7,14 +7,19 @@ Captures low-res screenshots during the agent loop, then either:
 """
 
 import asyncio
+import gzip
 import io
 import json
 import logging
 import os
+import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from PIL import Image
+if TYPE_CHECKING:
+    from PIL import Image
 
 logger = logging.getLogger(__name__)
 
@@ -26,49 +31,297 @@ THUMBNAIL_WIDTH = 160
 THUMBNAIL_HEIGHT = 90
 THUMBNAIL_QUALITY = 20
 
+# Capture policy modes
+CAPTURE_EVERY_STEP = "every_step"
+CAPTURE_ON_CHANGE = "on_change"
+CAPTURE_INTERVAL = "interval"
+
+SIGNATURE_WIDTH = 64
+SIGNATURE_HEIGHT = 36
+SIGNATURE_PIXEL_DELTA = 12  # grey levels a signature cell must move to count as changed
+MAX_MERGED_ACTIONS = 8  # skipped-frame labels carried onto the next kept frame
+
+
+class CapturePolicy:
+    """
+    Decides which agent-loop screenshots become replay frames.
+
+    Modes:
+      - every_step: capture every screenshot (the default)
+      - on_change:  capture when the fraction of changed cells in a tiny
+                    greyscale signature reaches change_threshold, or when
+                    max_interval seconds have passed since the last frame
+      - interval:   capture at most once every min_interval seconds
+
+    The first screenshot is always captured.
+    """
+
+    def __init__(
+        self,
+        mode: str = CAPTURE_EVERY_STEP,
+        change_threshold: float = 0.001,
+        min_interval: float = 2.0,
+        max_interval: float = 30.0,
+        clock=time.monotonic,
+    ):
+        if mode not in (CAPTURE_EVERY_STEP, CAPTURE_ON_CHANGE, CAPTURE_INTERVAL):
+            raise ValueError(f"Unknown replay capture mode: {mode}")
+        self.mode = mode
+        self.change_threshold = change_threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._clock = clock
+        self._last_signature: bytes | None = None
+        self._last_capture_time: float | None = None
+
+    @classmethod
+    def from_env(cls) -> "CapturePolicy":
+        """Build a policy from REPLAY_CAPTURE_MODE / REPLAY_CHANGE_THRESHOLD /
+        REPLAY_MIN_INTERVAL / REPLAY_MAX_INTERVAL."""
+        return cls(
+            mode=os.environ.get("REPLAY_CAPTURE_MODE", CAPTURE_EVERY_STEP),
+            change_threshold=float(os.environ.get("REPLAY_CHANGE_THRESHOLD", "0.001")),
+            min_interval=float(os.environ.get("REPLAY_MIN_INTERVAL", "2.0")),
+            max_interval=float(os.environ.get("REPLAY_MAX_INTERVAL", "30.0")),
+        )
+
+    @staticmethod
+    def signature(img: "Image.Image") -> bytes:
+        """Tiny greyscale downsample used as a cheap change metric."""
+        from PIL import Image
+
+        small = img.resize((SIGNATURE_WIDTH, SIGNATURE_HEIGHT), Image.BOX)
+        return small.convert("L").tobytes()
+
+    @staticmethod
+    def changed_fraction(a: bytes, b: bytes) -> float:
+        """Fraction of signature cells that moved by more than SIGNATURE_PIXEL_DELTA."""
+        changed = sum(1 for x, y in zip(a, b) if abs(x - y) > SIGNATURE_PIXEL_DELTA)
+        return changed / len(a)
+
+    def should_capture(self, img: "Image.Image") -> bool:
+        """Return True if this screenshot should be stored as a replay frame."""
+        now = self._clock()
+        elapsed = None if self._last_capture_time is None else now - self._last_capture_time
+
+        if self.mode == CAPTURE_EVERY_STEP:
+            capture = True
+        elif self.mode == CAPTURE_INTERVAL:
+            capture = elapsed is None or elapsed >= self.min_interval
+        else:
+            sig = self.signature(img)
+            capture = (
+                self._last_signature is None
+                or elapsed >= self.max_interval
+                or self.changed_fraction(sig, self._last_signature) >= self.change_threshold
+            )
+            if capture:
+                self._last_signature = sig
+
+        if capture:
+            self._last_capture_time = now
+        return capture
+
+
+def merge_actions(labels: list[str]) -> str:
+    """One frame label for several actions: "Tool: scroll (x3) → Tool: click".
+
+    A kept frame shows the result of every action since the previous kept
+    frame, so the labels of skipped frames are carried onto it.
+    """
+    merged: list[list] = []
+    for label in labels:
+        if merged and merged[-1][0] == label:
+            merged[-1][1] += 1
+        else:
+            merged.append([label, 1])
+    parts = [label if count == 1 else f"{label} (x{count})" for label, count in merged]
+    if len(parts) > MAX_MERGED_ACTIONS:
+        parts = ["…"] + parts[-MAX_MERGED_ACTIONS:]
+    return " → ".join(parts)
+
+
+class ReplayFrame:
+    """
+    One buffered replay frame.
+
+    Slotted so the per-frame overhead is little more than the JPEG itself:
+    the timestamp is monotonic seconds since the buffer started (converted
+    to ISO-8601 only when the manifest is written) and the action label is
+    interned, so the handful of distinct "Tool: ..." labels are shared.
+    """
+
+    __slots__ = ("jpeg_bytes", "timestamp", "action")
+
+    def __init__(self, jpeg_bytes: bytes, timestamp: float, action: str):
+        self.jpeg_bytes = jpeg_bytes
+        self.timestamp = timestamp
+        self.action = sys.intern(action)
+
+    def __getitem__(self, key: str):
+        # Mapping-style access so the gif/video encoders take frames and dicts alike
+        return getattr(self, key)
+
+
+def frame_filename(index: int) -> str:
+    return f"frame-{str(index).zfill(4)}.jpg"
+
+
+def serialize_manifest(
+    session_id: str,
+    agent_id: str,
+    frames: list[ReplayFrame],
+    url_prefix: str,
+    started_at: float,
+    compress: bool = False,
+) -> bytes:
+    """
+    Build the replay manifest JSON shared by local saves and R2 uploads.
+
+    Args:
+        frames: Buffered frames, in capture order.
+        url_prefix: Base URL the frame files are served from.
+        started_at: Wall-clock epoch seconds matching frame timestamp 0.
+        compress: Gzip the output (for storage or Content-Encoding: gzip).
+
+    Returns:
+        Compact UTF-8 JSON bytes (gzipped if compress is set).
+    """
+    manifest = {
+        "sessionId": session_id,
+        "agentId": agent_id,
+        "frameCount": len(frames),
+        "frames": [
+            {
+                "index": i,
+                "timestamp": datetime.fromtimestamp(
+                    started_at + frame.timestamp, timezone.utc
+                ).isoformat(),
+                "url": f"{url_prefix}/{frame_filename(i)}",
+                "action": frame.action,
+            }
+            for i, frame in enumerate(frames)
+        ],
+    }
+    data = json.dumps(manifest, separators=(",", ":")).encode()
+    return gzip.compress(data) if compress else data
+
 
 class ReplayBuffer:
     """Accumulates downscaled screenshots during the agent loop."""
 
-    def __init__(self):
-        self._frames: list[dict] = []
+    def __init__(
+        self,
+        incremental_timelapse: bool = True,
+        capture_policy: CapturePolicy | None = None,
+    ):
+        self._frames: list[ReplayFrame] = []
+        self._started_at = time.time()
+        self._started_mono = time.monotonic()
+        self._policy = capture_policy or CapturePolicy()
+        self._skipped = 0
+        self._skipped_actions: list[str] = []  # labels of skipped frames, for the next kept one
+        self._bytes = 0
+        self._timelapse = None
+        if incremental_timelapse:
+            from gif import TimelapseBuilder
+
+            self._timelapse = TimelapseBuilder()
 
     @property
     def frame_count(self) -> int:
         return len(self._frames)
 
+    @property
+    def byte_size(self) -> int:
+        """Total JPEG bytes of the buffered frames."""
+        return self._bytes
+
+    @property
+    def skipped_count(self) -> int:
+        """Screenshots the capture policy decided not to keep."""
+        return self._skipped
+
     @staticmethod
-    def make_thumbnail(
+    def make_thumbnail_bytes(
         raw_png_bytes: bytes,
         width: int = THUMBNAIL_WIDTH,
         height: int = THUMBNAIL_HEIGHT,
         quality: int = THUMBNAIL_QUALITY,
-    ) -> str:
-        """Resize a raw PNG screenshot to a tiny JPEG and return base64-encoded string."""
+    ) -> bytes:
+        """Resize a raw PNG screenshot to a tiny JPEG and return the JPEG bytes."""
+        from PIL import Image
+
         img = Image.open(io.BytesIO(raw_png_bytes))
+        img.draft("RGB", (width, height))  # JPEG captures decode at reduced scale
         img = img.resize((width, height), Image.LANCZOS)
         buf = io.BytesIO()
         img.save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+    @staticmethod
+    def make_thumbnail(
+        raw_png_bytes: bytes,
+        width: int = THUMBNAIL_WIDTH,
+        height: int = THUMBNAIL_HEIGHT,
+        quality: int = THUMBNAIL_QUALITY,
+    ) -> str:
+        """Resize a raw PNG screenshot to a tiny JPEG and return base64-encoded string."""
         import base64
 
-        return base64.b64encode(buf.getvalue()).decode("utf-8")
+        jpeg = ReplayBuffer.make_thumbnail_bytes(raw_png_bytes, width, height, quality)
+        return base64.b64encode(jpeg).decode("utf-8")
+
+    def capture_frame(self, raw_png_bytes: bytes, action_label: str) -> bool:
+        """Downscale a full-res PNG screenshot to a tiny JPEG and buffer it.
+
+        Returns True if the capture policy kept the frame.
+        """
+        from PIL import Image
 
-    def capture_frame(self, raw_png_bytes: bytes, action_label: str) -> None:
-        """Downscale a full-res PNG screenshot to a tiny JPEG and buffer it."""
         try:
             img = Image.open(io.BytesIO(raw_png_bytes))
+            img.draft("RGB", (FRAME_WIDTH, FRAME_HEIGHT))  # JPEG captures decode at reduced scale
+            if not self._policy.should_capture(img):
+                self._skipped += 1
+                self._skipped_actions.append(action_label)
+                return False
             img = img.resize((FRAME_WIDTH, FRAME_HEIGHT), Image.LANCZOS)
             buf = io.BytesIO()
             img.save(buf, format="JPEG", quality=JPEG_QUALITY)
             jpeg_bytes = buf.getvalue()
 
-            self._frames.append({
-                "jpeg_bytes": jpeg_bytes,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "action": action_label,
-            })
+            self._frames.append(ReplayFrame(
+                jpeg_bytes, time.monotonic() - self._started_mono,
+                merge_actions(self._skipped_actions + [action_label]),
+            ))
+            self._skipped_actions = []
+            self._bytes += len(jpeg_bytes)
+            if self._timelapse is not None:
+                self._timelapse.add_frame(jpeg_bytes)
+            return True
         except Exception as e:
             logger.warning("Failed to capture replay frame: %s", e)
+            return False
+
+    @property
+    def last_frame(self) -> ReplayFrame | None:
+        return self._frames[-1] if self._frames else None
+
+    def frame_wall_time(self, frame: ReplayFrame) -> float:
+        """Epoch seconds at which `frame` was captured."""
+        return self._started_at + frame.timestamp
+
+    def restore_frame(self, jpeg_bytes: bytes, action_label: str, captured_at: float) -> None:
+        """Re-add an already encoded frame (e.g. from a step journal after a restart).
+
+        captured_at is the original wall-clock capture time, so the manifest
+        keeps the real timeline across the restart.
+        """
+        self._frames.append(ReplayFrame(jpeg_bytes, captured_at - self._started_at, action_label))
+        self._bytes += len(jpeg_bytes)
+        if self._timelapse is not None:
+            self._timelapse.add_frame(jpeg_bytes)
 
     def to_gif(self, output_path: str, max_size_mb: float = 20) -> str | None:
         """
@@ -85,6 +338,35 @@ class ReplayBuffer:
 
         return generate_gif(self._frames, output_path, max_size_mb)
 
+    def to_video(
+        self,
+        output_path: str,
+        fps: int | None = None,
+        bitrate: str | None = None,
+    ) -> str | None:
+        """
+        Generate an MP4/WebM timelapse from the buffered frames.
+
+        Falls back to a GIF alongside output_path when no video encoder is
+        installed.
+
+        Args:
+            output_path: File path for the output video (.mp4 or .webm).
+            fps: Playback frame rate (defaults to video.DEFAULT_FPS).
+            bitrate: Target bitrate, e.g. "250k" (defaults to video.DEFAULT_BITRATE).
+
+        Returns:
+            The path actually written on success, None on failure.
+        """
+        from video import DEFAULT_BITRATE, DEFAULT_FPS, generate_video
+
+        return generate_video(
+            self._frames,
+            output_path,
+            fps=fps or DEFAULT_FPS,
+            bitrate=bitrate or DEFAULT_BITRATE,
+        )
+
     def save_local(
         self,
         session_id: str,
@@ -111,35 +393,25 @@ class ReplayBuffer:
 
         # Write frames
         for i, frame in enumerate(self._frames):
-            frame_path = out_dir / f"frame-{str(i).zfill(4)}.jpg"
-            frame_path.write_bytes(frame["jpeg_bytes"])
+            (out_dir / frame_filename(i)).write_bytes(frame.jpeg_bytes)
 
-        # Build manifest
         url_prefix = f"{serve_base_url}/{session_id}/{agent_id}"
-        manifest = {
-            "sessionId": session_id,
-            "agentId": agent_id,
-            "frameCount": frame_count,
-            "frames": [
-                {
-                    "index": i,
-                    "timestamp": frame["timestamp"],
-                    "url": f"{url_prefix}/frame-{str(i).zfill(4)}.jpg",
-                    "action": frame["action"],
-                }
-                for i, frame in enumerate(self._frames)
-            ],
-        }
-
         manifest_path = out_dir / "manifest.json"
-        manifest_path.write_text(json.dumps(manifest))
+        manifest_path.write_bytes(serialize_manifest(
+            session_id, agent_id, self._frames, url_prefix, self._started_at
+        ))
 
         manifest_url = f"{url_prefix}/manifest.json"
         logger.info("Replay saved locally: %s", manifest_url)
 
-        # Also generate a timelapse GIF for Slack delivery
+        # Also write the timelapse GIF for Slack delivery. The incremental
+        # builder has already encoded the frames, so this is just a flush.
         gif_path = str(out_dir / "timelapse.gif")
-        gif_result = self.to_gif(gif_path)
+        gif_result = None
+        if self._timelapse is not None:
+            gif_result = self._timelapse.finalize(gif_path)
+        if gif_result is None:
+            gif_result = self.to_gif(gif_path)
         if gif_result:
             logger.info("Timelapse GIF generated: %s", gif_result)
 
@@ -160,78 +432,65 @@ class ReplayBuffer:
             logger.info("No replay frames to upload")
             return None
 
-        import aiohttp
+        from http_clients import get_clients
 
         frame_count = len(self._frames)
         logger.info("Uploading %d replay frames to R2 for agent %s", frame_count, agent_id)
 
-        try:
-            async with aiohttp.ClientSession() as http:
-                resp = await http.post(
-                    f"{api_base_url}/api/replay/upload-urls",
-                    json={
-                        "sessionId": session_id,
-                        "agentId": agent_id,
-                        "frameCount": frame_count,
-                    },
-                )
-                if resp.status != 200:
-                    logger.error("Failed to get upload URLs: %s", await resp.text())
-                    return None
+        # Process-wide pooled session: keep-alive connections are reused across
+        # frames and uploads, and the per-host limit caps concurrent PUTs
+        http = get_clients().aiohttp_session()
 
-                url_data = await resp.json()
-                frame_urls = url_data["frameUrls"]
-                manifest_url = url_data["manifestUrl"]
-
-                tasks = [
-                    http.put(
-                        frame_urls[i],
-                        data=frame["jpeg_bytes"],
-                        headers={"Content-Type": "image/jpeg"},
-                    )
-                    for i, frame in enumerate(self._frames)
-                ]
-
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                failed = sum(
-                    1 for r in results
-                    if isinstance(r, Exception) or (hasattr(r, "status") and r.status >= 400)
-                )
-                if failed:
-                    logger.warning("%d/%d frame uploads failed", failed, frame_count)
-
-                for r in results:
-                    if hasattr(r, "release"):
-                        await r.release()
-
-                prefix = f"replays/{session_id}/{agent_id}"
-                manifest = {
+        async def put(url: str, data: bytes, content_type: str) -> int:
+            async with http.put(url, data=data, headers={"Content-Type": content_type}) as resp:
+                if resp.status >= 400:
+                    logger.debug("PUT %s failed: %s", url, await resp.text())
+                return resp.status
+
+        try:
+            async with http.post(
+                f"{api_base_url}/api/replay/upload-urls",
+                json={
                     "sessionId": session_id,
                     "agentId": agent_id,
                     "frameCount": frame_count,
-                    "frames": [
-                        {
-                            "index": i,
-                            "timestamp": frame["timestamp"],
-                            "url": f"{public_url_prefix}/{prefix}/frame-{str(i).zfill(4)}.jpg",
-                            "action": frame["action"],
-                        }
-                        for i, frame in enumerate(self._frames)
-                    ],
-                }
-
-                manifest_resp = await http.put(
-                    manifest_url,
-                    data=json.dumps(manifest).encode(),
-                    headers={"Content-Type": "application/json"},
-                )
-                if manifest_resp.status >= 400:
-                    logger.error("Failed to upload manifest: %s", await manifest_resp.text())
+                },
+            ) as resp:
+                if resp.status != 200:
+                    logger.error("Failed to get upload URLs: %s", await resp.text())
                     return None
+                url_data = await resp.json()
 
-                manifest_public_url = f"{public_url_prefix}/{prefix}/manifest.json"
-                logger.info("Replay uploaded to R2: %s", manifest_public_url)
-                return manifest_public_url, frame_count
+            frame_urls = url_data["frameUrls"]
+            manifest_url = url_data["manifestUrl"]
+
+            results = await asyncio.gather(
+                *(
+                    put(frame_urls[i], frame.jpeg_bytes, "image/jpeg")
+                    for i, frame in enumerate(self._frames)
+                ),
+                return_exceptions=True,
+            )
+            failed = sum(1 for r in results if isinstance(r, Exception) or r >= 400)
+            if failed:
+                logger.warning("%d/%d frame uploads failed", failed, frame_count)
+
+            prefix = f"replays/{session_id}/{agent_id}"
+            manifest_bytes = serialize_manifest(
+                session_id,
+                agent_id,
+                self._frames,
+                f"{public_url_prefix}/{prefix}",
+                self._started_at,
+            )
+
+            if await put(manifest_url, manifest_bytes, "application/json") >= 400:
+                logger.error("Failed to upload manifest")
+                return None
+
+            manifest_public_url = f"{public_url_prefix}/{prefix}/manifest.json"
+            logger.info("Replay uploaded to R2: %s", manifest_public_url)
+            return manifest_public_url, frame_count
 
         except Exception as e:
             logger.error("R2 replay upload failed: %s", e)
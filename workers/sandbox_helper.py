@@ -0,0 +1,175 @@
+"""
+Worker side of the in-sandbox screen helper (see screen_daemon.py).
+
+SandboxHelper uploads screen_daemon.py into the sandbox, starts it in the
+background and sends it requests through the sandbox command API.
+
+HelperCapture is a drop-in screenshot callable for ScreenFeed. Before each
+screenshot it asks the daemon to wait for the screen to settle and report
+what changed since the frame the worker already has:
+
+  - unchanged: the previous frame is reused, nothing is transferred
+  - region:    only the changed rectangle (a PNG) is transferred and
+               patched into the previous frame
+  - full:      the daemon sends the whole frame in the same answer, as a
+               JPEG scrot wrote at the capture quality and scale, so it is
+               no larger than a regular compressed capture
+
+Any helper failure disables it for the rest of the session and falls back
+to full captures. Enabled with SANDBOX_HELPER=true.
+"""
+
+import base64
+import io
+import json
+import logging
+import shlex
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DAEMON_SOURCE = Path(__file__).with_name("screen_daemon.py")
+REMOTE_PATH = "/tmp/opticon_screen_daemon.py"
+STARTUP_TIMEOUT = 5.0  # seconds
+SETTLE_STABLE_MS = 300
+SETTLE_TIMEOUT_MS = 3000
+PATCH_JPEG_QUALITY = 75
+
+
+class SandboxHelper:
+    def __init__(self, sandbox):
+        self._sandbox = sandbox
+
+    def request(self, payload: dict) -> dict:
+        command = f"python3 {REMOTE_PATH} request {shlex.quote(json.dumps(payload))}"
+        result = self._sandbox.commands.run(command)
+        response = json.loads(result.stdout)
+        if "error" in response:
+            raise RuntimeError(f"screen helper: {response['error']}")
+        return response
+
+    def start(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        """Upload and launch the daemon (or reuse a running one). Returns False if unavailable."""
+        try:
+            self._sandbox.files.write(REMOTE_PATH, DAEMON_SOURCE.read_text())
+            try:
+                self.request({"op": "hash"})
+                return True  # already running, e.g. after a worker restart
+            except Exception:
+                pass
+            self._sandbox.commands.run(f"python3 {REMOTE_PATH} serve", background=True)
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                try:
+                    self.request({"op": "hash"})
+                    logger.info("Screen helper running in sandbox")
+                    return True
+                except Exception:
+                    time.sleep(0.2)
+        except Exception as e:
+            logger.warning("Screen helper failed to start: %s", e)
+            return False
+        logger.warning("Screen helper did not come up within %.0fs", timeout)
+        return False
+
+
+class HelperCapture:
+    """Screenshot callable that transfers only what changed since the last frame."""
+
+    def __init__(
+        self,
+        helper: SandboxHelper,
+        full_capture,
+        stable_ms: int = SETTLE_STABLE_MS,
+        timeout_ms: int = SETTLE_TIMEOUT_MS,
+        scale: float = 1.0,
+        quality: int = PATCH_JPEG_QUALITY,
+    ):
+        self._helper = helper
+        self._full_capture = full_capture
+        self.scale = scale  # size of the frames the model sees relative to the screen
+        self.quality = quality
+        self.stable_ms = stable_ms
+        self.timeout_ms = timeout_ms
+        self.enabled = True
+        self._hash: str | None = None
+        self._frame: bytes | None = None
+        self._image = None  # decoded frame the regions are patched into
+        self.stats = {"unchanged": 0, "region": 0, "full": 0, "regionBytes": 0, "unsettled": 0}
+
+    def _full(self, observation: dict) -> bytes:
+        if "jpeg" in observation:
+            frame = base64.b64decode(observation["jpeg"])
+            self._frame, self._image, self._hash = frame, None, observation["hash"]
+            return frame
+        if "png" not in observation:
+            # Older daemon without full frames: capture separately and drop
+            # the hash, which may not match what the capture shows
+            frame = self._full_capture()
+            self._frame, self._image, self._hash = frame, None, None
+            return frame
+
+        # Daemon from an older worker, still running in a reused sandbox
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(base64.b64decode(observation["png"]))).convert("RGB")
+        if self.scale != 1:
+            size = (max(1, round(image.width * self.scale)), max(1, round(image.height * self.scale)))
+            image = image.resize(size)
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=self.quality)
+        self._frame, self._image, self._hash = buf.getvalue(), image, observation["hash"]
+        return self._frame
+
+    def _patch(self, observation: dict) -> bytes:
+        from PIL import Image
+
+        if self._image is None:
+            self._image = Image.open(io.BytesIO(self._frame)).convert("RGB")
+        region_png = base64.b64decode(observation["png"])
+        region = Image.open(io.BytesIO(region_png))
+        x0, y0, x1, y1 = observation["box"]
+        scale = self._image.width / observation["size"][0]
+        if scale != 1:
+            # Frame was captured downscaled (SCREENSHOT_SCALE)
+            box = [round(v * scale) for v in (x0, y0, x1, y1)]
+            region = region.resize((max(1, box[2] - box[0]), max(1, box[3] - box[1])))
+            x0, y0 = box[0], box[1]
+        self._image.paste(region, (x0, y0))
+        buf = io.BytesIO()
+        self._image.save(buf, format="JPEG", quality=self.quality)
+        self.stats["regionBytes"] += len(region_png)
+        return buf.getvalue()
+
+    def __call__(self) -> bytes:
+        if not self.enabled:
+            return self._full_capture()
+        try:
+            observation = self._helper.request({
+                "op": "observe",
+                "since": self._hash if self._frame is not None else None,
+                "stableMs": self.stable_ms,
+                "timeoutMs": self.timeout_ms,
+                "fullFrame": True,
+                "quality": self.quality,
+                "scale": self.scale,
+            })
+            status = observation["status"]
+            if not observation.get("settled", True):
+                self.stats["unsettled"] += 1
+            if status == "unchanged" and self._frame is not None:
+                self.stats["unchanged"] += 1
+                return self._frame
+            if status == "region" and self._frame is not None:
+                frame = self._patch(observation)
+                self._frame, self._hash = frame, observation["hash"]
+                self.stats["region"] += 1
+                return frame
+        except Exception as e:
+            self.enabled = False
+            logger.warning("Screen helper unavailable, using full captures: %s", e)
+            return self._full_capture()
+
+        self.stats["full"] += 1
+        return self._full(observation)
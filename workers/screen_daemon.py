@@ -0,0 +1,304 @@
+"""
+Screen watcher that runs inside the E2B sandbox (stdlib only).
+
+Uploaded and started by sandbox_helper.SandboxHelper. The daemon captures
+the framebuffer every POLL_SECONDS (scrot to a PPM in /dev/shm), hashes it,
+and remembers when it last changed plus the last few distinct frames. After
+IDLE_AFTER_SECONDS without a request it backs off to IDLE_POLL_SECONDS, and
+a request arriving while it is idle captures a fresh frame first, so an
+idle agent does not keep scrot running ten times a second. The worker asks
+it one question per agent step, over a Unix socket, via a short-lived
+client run through the sandbox command API:
+
+    python3 screen_daemon.py request '{"op": "observe", "since": "<hash>", ...}'
+
+observe waits until the screen has been stable for stableMs (or timeoutMs
+passed), then compares the current frame with the frame the worker already
+has (`since`) and answers with one of:
+
+    {"status": "unchanged", "hash": ...}
+    {"status": "region", "hash": ..., "box": [x0, y0, x1, y1], "png": <base64>}
+    {"status": "full", "hash": ...}      # large change or unknown base frame
+
+plus "size" (screen width, height), "settled" and "waitedMs". With
+"fullFrame": true a "full" answer also carries the whole frame as "jpeg",
+written by scrot at the request's "quality" and "scale" right after the
+frame "hash" was computed from, so no second command round-trip is needed.
+A change in between shows up in the next step's diff against that hash.
+Region patches stay lossless PNGs. {"op": "frame"} returns the current
+frame the same way ("hash", "size", "jpeg"); {"op": "hash"} returns the
+current hash and how long ago the screen last changed. Captures include the
+pointer, so cursor moves count as changes.
+
+Run `python3 screen_daemon.py serve` to start the daemon.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+SOCKET_PATH = "/tmp/opticon-screen.sock"
+FRAME_PATH = "/dev/shm/opticon-frame.ppm"
+JPEG_PATH = "/dev/shm/opticon-frame.jpg"
+JPEG_QUALITY = 75
+POLL_SECONDS = 0.1
+IDLE_AFTER_SECONDS = 10.0  # without a request, the watcher backs off
+IDLE_POLL_SECONDS = 2.0
+MAX_FRAMES = 6  # distinct recent frames kept as diff bases
+DIFF_CHUNK = 16  # pixels compared at a time when locating changed columns
+MAX_REGION_FRACTION = 0.25  # larger changes are answered with "full"
+
+
+def parse_ppm(data: bytes) -> tuple[int, int, bytes]:
+    """Parse a binary (P6, 8-bit) PPM into (width, height, rgb bytes)."""
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    if fields[0] != b"P6" or fields[3] != b"255":
+        raise ValueError("expected an 8-bit binary PPM")
+    width, height = int(fields[1]), int(fields[2])
+    return width, height, data[pos + 1:pos + 1 + width * height * 3]
+
+
+def encode_png(width: int, height: int, rgb: bytes) -> bytes:
+    """Minimal RGB PNG encoder (no filtering, fast zlib level)."""
+    stride = width * 3
+    raw = b"".join(b"\x00" + rgb[y * stride:(y + 1) * stride] for y in range(height))
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def changed_box(width: int, height: int, old: bytes, new: bytes) -> tuple[int, int, int, int] | None:
+    """Bounding box (x0, y0, x1, y1), exclusive end, of the pixels that differ."""
+    stride = width * 3
+    rows = [y for y in range(height) if old[y * stride:(y + 1) * stride] != new[y * stride:(y + 1) * stride]]
+    if not rows:
+        return None
+    step = DIFF_CHUNK * 3
+    x0, x1 = width, 0
+    for y in rows:
+        base = y * stride
+        for start in range(0, stride, step):
+            if old[base + start:base + start + step] != new[base + start:base + start + step]:
+                x0 = min(x0, start // 3)
+                break
+        for start in range(((stride - 1) // step) * step, -1, -step):
+            if old[base + start:base + start + step] != new[base + start:base + start + step]:
+                x1 = max(x1, min(width, (start + step) // 3))
+                break
+    return x0, rows[0], x1, rows[-1] + 1
+
+
+def crop(width: int, rgb: bytes, box: tuple[int, int, int, int]) -> bytes:
+    x0, y0, x1, y1 = box
+    stride = width * 3
+    return b"".join(rgb[y * stride + x0 * 3:y * stride + x1 * 3] for y in range(y0, y1))
+
+
+def scrot_capture() -> tuple[int, int, bytes]:
+    subprocess.run(["scrot", "--pointer", "--overwrite", FRAME_PATH], check=True, capture_output=True)
+    with open(FRAME_PATH, "rb") as f:
+        return parse_ppm(f.read())
+
+
+def scrot_jpeg(quality: int = JPEG_QUALITY, scale: float = 1.0) -> bytes:
+    """Capture the screen as a JPEG, downscaled by scrot when scale < 1."""
+    command = ["scrot", "--pointer", "--overwrite", "--quality", str(quality)]
+    path = JPEG_PATH
+    if scale < 1:
+        command += ["--thumb", str(max(1, round(scale * 100)))]
+        path = JPEG_PATH.replace(".jpg", "-thumb.jpg")
+    subprocess.run(command + [JPEG_PATH], check=True, capture_output=True)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class ScreenWatcher:
+    def __init__(self, capture=scrot_capture, clock=time.monotonic, capture_jpeg=scrot_jpeg):
+        self._capture = capture
+        self._capture_jpeg = capture_jpeg
+        self._clock = clock
+        self._lock = threading.Condition()
+        self._capture_lock = threading.Lock()  # one scrot at a time
+        self._wake = threading.Event()
+        self.width = self.height = 0
+        self.current_hash: str | None = None
+        self.changed_at = clock()
+        self.polled_at: float | None = None
+        self.last_request = clock()
+        self.frames: OrderedDict[str, bytes] = OrderedDict()
+
+    def poll(self) -> None:
+        with self._capture_lock:
+            width, height, rgb = self._capture()
+            polled_at = self._clock()
+        digest = hashlib.blake2b(rgb, digest_size=12).hexdigest()
+        with self._lock:
+            self.polled_at = polled_at
+            self.width, self.height = width, height
+            if digest != self.current_hash:
+                self.current_hash = digest
+                self.changed_at = self._clock()
+                self.frames[digest] = rgb
+                self.frames.move_to_end(digest)
+                while len(self.frames) > MAX_FRAMES:
+                    self.frames.popitem(last=False)
+            self._lock.notify_all()
+
+    @property
+    def idle(self) -> bool:
+        return self._clock() - self.last_request >= IDLE_AFTER_SECONDS
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"capture failed: {e}", file=sys.stderr, flush=True)
+            self._wake.wait(IDLE_POLL_SECONDS if self.idle else POLL_SECONDS)
+            self._wake.clear()
+
+    def _refresh_if_stale(self) -> None:
+        """Capture now if the last frame predates the current polling rate (idle back-off)."""
+        if self.polled_at is None or self._clock() - self.polled_at > 2 * POLL_SECONDS:
+            self.poll()
+
+    def wait_stable(self, stable: float, timeout: float) -> bool:
+        deadline = self._clock() + timeout
+        with self._lock:
+            while True:
+                now = self._clock()
+                if self.current_hash is not None and now - self.changed_at >= stable:
+                    return True
+                if now >= deadline:
+                    return False
+                self._lock.wait(min(POLL_SECONDS, deadline - now))
+
+    def _frame_payload(self, quality: int, scale: float) -> dict:
+        with self._capture_lock:
+            jpeg = self._capture_jpeg(quality, scale)
+        return {"jpeg": base64.b64encode(jpeg).decode()}
+
+    def observe(self, since: str | None, stable_ms: int = 300, timeout_ms: int = 3000,
+                max_region_fraction: float = MAX_REGION_FRACTION, full_frame: bool = False,
+                quality: int = JPEG_QUALITY, scale: float = 1.0) -> dict:
+        started = self._clock()
+        self._refresh_if_stale()
+        settled = self.wait_stable(stable_ms / 1000, timeout_ms / 1000)
+        with self._lock:
+            digest = self.current_hash
+            current = self.frames.get(digest)
+            base = self.frames.get(since) if since else None
+            width, height = self.width, self.height
+        response = {
+            "hash": digest,
+            "size": [width, height],
+            "settled": settled,
+            "waitedMs": round((self._clock() - started) * 1000),
+        }
+        if since == digest:
+            return {**response, "status": "unchanged"}
+        box = None
+        if base is not None and current is not None:
+            box = changed_box(width, height, base, current)
+            if box is None:
+                return {**response, "status": "unchanged"}
+        if box is None or (box[2] - box[0]) * (box[3] - box[1]) > max_region_fraction * width * height:
+            full = {**response, "status": "full"}
+            if full_frame and current is not None:
+                full.update(self._frame_payload(quality, scale))
+            return full
+        x0, y0, x1, y1 = box
+        png = encode_png(x1 - x0, y1 - y0, crop(width, current, box))
+        return {**response, "status": "region", "box": list(box), "png": base64.b64encode(png).decode()}
+
+    def handle(self, request: dict) -> dict:
+        was_idle = self.idle
+        self.last_request = self._clock()
+        if was_idle:
+            self._wake.set()  # back to the fast polling rate
+        op = request.get("op")
+        if op == "observe":
+            return self.observe(
+                request.get("since"),
+                request.get("stableMs", 300),
+                request.get("timeoutMs", 3000),
+                request.get("maxRegionFraction", MAX_REGION_FRACTION),
+                request.get("fullFrame", False),
+                request.get("quality", JPEG_QUALITY),
+                request.get("scale", 1.0),
+            )
+        if op == "frame":
+            self._refresh_if_stale()
+            with self._lock:
+                digest, width, height = self.current_hash, self.width, self.height
+            if digest is None:
+                raise ValueError("no frame captured yet")
+            payload = self._frame_payload(request.get("quality", JPEG_QUALITY), request.get("scale", 1.0))
+            return {"hash": digest, "size": [width, height], **payload}
+        if op == "hash":
+            with self._lock:
+                return {"hash": self.current_hash, "stableMs": round((self._clock() - self.changed_at) * 1000)}
+        raise ValueError(f"unknown op: {op}")
+
+
+def serve(watcher: ScreenWatcher, path: str = SOCKET_PATH) -> None:
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                response = watcher.handle(json.loads(self.rfile.readline()))
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    if os.path.exists(path):
+        os.unlink(path)
+    threading.Thread(target=watcher.run, daemon=True).start()
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.serve_forever()
+
+
+def request(payload: str, path: str = SOCKET_PATH) -> str:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(payload.encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return f.readline().decode()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        serve(ScreenWatcher())
+    elif sys.argv[1:2] == ["request"]:
+        sys.stdout.write(request(sys.argv[2]))
+    else:
+        sys.exit("usage: screen_daemon.py serve | request '<json>'")
@@ -0,0 +1,97 @@
+"""
+Single screenshot source for one agent.
+
+The agent loop, replay capture, Panopticon thumbnails and Slack checkpoints
+all used to take (or hold on to) their own screenshots. A ScreenFeed owns
+the sandbox screenshot call instead:
+
+  - capture(label) takes one screenshot and publishes it to every
+    subscriber (replay buffer, thumbnail emitter, ...); the agent loop
+    uses the returned bytes for the model
+  - `latest` keeps the most recent frame for consumers that only need it
+    occasionally (checkpoints)
+  - run_idle_capture() takes an independent screenshot only when nothing
+    has been captured for idle_interval seconds, so thumbnails stay fresh
+    between tasks without duplicating the agent loop's screenshots; it
+    skips captures while `suspended` is set (the sandbox is paused)
+
+Idle captures are published with label=None so subscribers can tell them
+apart from agent steps.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_INTERVAL = 10.0  # seconds
+IDLE_RETRY_DELAY = 5.0  # seconds to back off after a failed idle capture
+
+Subscriber = Callable[[bytes, str | None], Awaitable[None]]
+
+
+class ScreenFeed:
+    def __init__(
+        self,
+        capture: Callable[[], bytes],
+        idle_interval: float = DEFAULT_IDLE_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self._capture = capture
+        self.idle_interval = idle_interval
+        self._clock = clock
+        self._subscribers: list[Subscriber] = []
+        self._lock = asyncio.Lock()
+        self.latest: bytes | None = None
+        self.captured_at: float | None = None
+        self.suspended = False
+        self.stats = {"captures": 0, "idle_captures": 0, "subscriber_errors": 0}
+
+    def subscribe(self, callback: Subscriber) -> Subscriber:
+        """Register an async callback(raw_png, label) for every captured frame."""
+        self._subscribers.append(callback)
+        return callback
+
+    @property
+    def idle_for(self) -> float:
+        """Seconds since the last capture (infinite before the first one)."""
+        if self.captured_at is None:
+            return float("inf")
+        return self._clock() - self.captured_at
+
+    async def capture(self, label: str | None = None) -> bytes:
+        """Take a screenshot, publish it to all subscribers and return the PNG bytes."""
+        async with self._lock:
+            raw_png = await asyncio.to_thread(self._capture)
+            self.latest = raw_png
+            self.captured_at = self._clock()
+            self.stats["captures"] += 1
+
+        for callback in self._subscribers:
+            try:
+                await callback(raw_png, label)
+            except Exception as e:
+                self.stats["subscriber_errors"] += 1
+                logger.warning("Screen feed subscriber failed: %s", e)
+        return raw_png
+
+    async def run_idle_capture(self, stop: asyncio.Event) -> None:
+        """Capture whenever the feed has been idle for idle_interval, until `stop` is set."""
+        while not stop.is_set():
+            wait = self.idle_interval - self.idle_for
+            if wait <= 0 and self.suspended:
+                wait = self.idle_interval
+            elif wait <= 0:
+                try:
+                    await self.capture(None)
+                    self.stats["idle_captures"] += 1
+                    wait = self.idle_interval
+                except Exception as e:
+                    logger.warning("Idle screenshot failed: %s", e)
+                    wait = IDLE_RETRY_DELAY
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,112 @@
+"""
+Deadline-bounded worker shutdown.
+
+ShutdownCoordinator runs the teardown steps registered with add()
+concurrently. A step starts as soon as the steps named in its `after` have
+finished, whether they succeeded or not, so independent work overlaps:
+pausing the sandbox no longer waits for the replay upload. The whole
+sequence shares one deadline. Steps still running (or still waiting on a
+dependency) when it passes are cancelled and reported as missed.
+
+Blocking work (GIF encoding, sandbox pause/kill) goes through
+in_daemon_thread(): an abandoned daemon thread does not hold up process
+exit the way an asyncio.to_thread() worker would.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE = float(os.environ.get("SHUTDOWN_DEADLINE_SECONDS", "30"))
+
+
+async def in_daemon_thread(fn, *args):
+    """Run blocking `fn(*args)` in a daemon thread and await its result."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, error):
+        if future.done():
+            return  # the awaiting step was cancelled
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run():
+        try:
+            outcome = (fn(*args), None)
+        except BaseException as e:
+            outcome = (None, e)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:
+            pass  # event loop already closed
+
+    threading.Thread(target=run, name=f"shutdown-{getattr(fn, '__name__', 'step')}", daemon=True).start()
+    return await future
+
+
+class ShutdownCoordinator:
+    def __init__(self, deadline: float = DEFAULT_DEADLINE, clock=time.monotonic):
+        self.deadline = deadline
+        self._clock = clock
+        self._steps: dict[str, tuple] = {}
+
+    def add(self, name: str, fn, after: tuple[str, ...] = ()) -> None:
+        """Register async callable `fn` to run once the steps in `after` are done.
+
+        Dependencies must be registered first, which also rules out cycles.
+        """
+        if name in self._steps:
+            raise ValueError(f"Duplicate shutdown step: {name}")
+        unknown = [dep for dep in after if dep not in self._steps]
+        if unknown:
+            raise ValueError(f"Shutdown step {name} depends on unknown steps: {unknown}")
+        self._steps[name] = (fn, tuple(after))
+
+    async def run(self) -> dict:
+        """Run every step; returns which completed, failed or missed the deadline."""
+        started = self._clock()
+        tasks: dict[str, asyncio.Task] = {}
+        step_ms: dict[str, int] = {}
+
+        async def run_step(name, fn, after):
+            if after:
+                await asyncio.wait([tasks[dep] for dep in after])
+            step_started = self._clock()
+            try:
+                await fn()
+            finally:
+                step_ms[name] = round((self._clock() - step_started) * 1000)
+
+        for name, (fn, after) in self._steps.items():
+            tasks[name] = asyncio.create_task(run_step(name, fn, after), name=f"shutdown:{name}")
+
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks.values(), timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        report = {"completed": [], "failed": {}, "missed": [], "stepMs": step_ms}
+        for name, task in tasks.items():
+            if task in pending:
+                report["missed"].append(name)
+            elif task.exception() is not None:
+                report["failed"][name] = str(task.exception())
+                logger.error("Shutdown step %s failed: %s", name, task.exception())
+            else:
+                report["completed"].append(name)
+        report["elapsedMs"] = round((self._clock() - started) * 1000)
+
+        if report["missed"]:
+            logger.warning(
+                "Shutdown deadline of %.0fs missed by: %s", self.deadline, ", ".join(report["missed"])
+            )
+        return report
@@ -0,0 +1,65 @@
+"""
+Import-time profile for the worker process.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+reports the slowest imports by cumulative time, so regressions in worker
+cold-start (a worker is spawned per agent) are easy to spot.
+
+Usage: python startup_profile.py [module] [--top N]   (default: worker, 15)
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+WORKERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_imports(module: str = "worker") -> list[tuple[str, int, int]]:
+    """
+    Import `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        (module_name, self_us, cumulative_us) tuples in import order.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=WORKERS_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_time_seconds(module: str = "worker") -> float:
+    """Cumulative import time of `module` itself, in seconds."""
+    for name, _, cumulative_us in profile_imports(module):
+        if name == module:
+            return cumulative_us / 1e6
+    raise RuntimeError(f"{module} not found in import profile")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("module", nargs="?", default="worker")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    total = next(c for name, _, c in rows if name == args.module)
+    print(f"import {args.module}: {total / 1000:.1f} ms cumulative, {len(rows)} modules\n")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>9.1f} ms {self_us / 1000:>7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Stop-to-terminated latency of an in-flight agent step, and per-phase
+timeouts (fake model client, screen feed and tools; no sandbox).
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import e2b_tools
+import worker
+from conftest import FakeClient, FakeFeed
+from journal import StepJournal
+
+# The old loop only noticed a stop after the step finished (up to minutes)
+MAX_STOP_LATENCY = 0.1
+
+
+@pytest.fixture
+def blocking_tool(monkeypatch):
+    """execute_tool blocks its thread for a while, like a long type_text."""
+    started = threading.Event()
+
+    def execute_tool(name, args):
+        started.set()
+        time.sleep(0.5)  # keeps running after the step is abandoned
+        return f"{name} finished"
+
+    monkeypatch.setattr(e2b_tools, "execute_tool", execute_tool)
+    return started
+
+
+async def _stop_latency(client, feed, wait_until, journal=None):
+    """Start the loop, set `terminated` once `wait_until()` holds, return (result, stop-to-return seconds)."""
+    terminated = asyncio.Event()
+    loop_task = asyncio.create_task(
+        worker.run_agent_loop(client, "type hello", feed, terminated=terminated, journal=journal)
+    )
+    while not wait_until():
+        await asyncio.sleep(0.005)
+    fired = time.perf_counter()
+    terminated.set()
+    result = await loop_task
+    return result, time.perf_counter() - fired
+
+
+class TestStopLatency:
+    def test_stop_during_model_call(self):
+        client = FakeClient(delay=30)
+        result, latency = asyncio.run(_stop_latency(client, FakeFeed(), lambda: client.calls))
+
+        assert result == "(terminated by user during model call)"
+        assert latency < MAX_STOP_LATENCY
+
+    def test_stop_during_retry_backoff(self):
+        client = FakeClient(error=RuntimeError("overloaded"))
+        result, latency = asyncio.run(_stop_latency(client, FakeFeed(), lambda: client.calls))
+
+        assert result == "(terminated by user during model call)"
+        assert latency < MAX_STOP_LATENCY
+        assert client.calls == 1  # no retry after the stop
+
+    def test_stop_during_screenshot(self):
+        feed = FakeFeed(delay=30)
+        result, latency = asyncio.run(_stop_latency(FakeClient(), feed, lambda: feed.captures))
+
+        assert result == "(terminated by user during screenshot)"
+        assert latency < MAX_STOP_LATENCY
+
+    def test_stop_during_tool_records_partial_step(self, tmp_path, blocking_tool):
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "type hello")
+        result, latency = asyncio.run(
+            _stop_latency(FakeClient(), FakeFeed(), blocking_tool.is_set, journal=journal)
+        )
+        journal.close()
+
+        assert result == "(terminated by user during tool type_text)"
+        assert latency < MAX_STOP_LATENCY
+        (step,) = StepJournal(tmp_path).load().steps
+        assert step["tool"] == "type_text"
+        assert step["result"] == "(cancelled: session stopped)"
+
+
+class TestPhaseTimeouts:
+    def test_hung_tool_is_reported_as_an_error(self, monkeypatch, blocking_tool, tmp_path):
+        monkeypatch.setattr(worker, "TOOL_TIMEOUT", 0.05)
+        monkeypatch.setattr(worker, "MAX_STEPS", 1)
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "type hello")
+
+        asyncio.run(worker.run_agent_loop(FakeClient(), "type hello", FakeFeed(), journal=journal))
+        journal.close()
+
+        (step,) = StepJournal(tmp_path).load().steps
+        assert step["result"].startswith("ERROR: type_text did not finish within")
+
+    def test_next_step_waits_for_an_abandoned_tool(self, monkeypatch):
+        finished = []
+
+        def execute_tool(name, args):
+            time.sleep(0.3)
+            finished.append(time.perf_counter())
+            return f"{name} finished"
+
+        class TimedFeed(FakeFeed):
+            def __init__(self):
+                super().__init__()
+                self.captured_at = []
+
+            async def capture(self, label=None):
+                self.captured_at.append(time.perf_counter())
+                return await super().capture(label)
+
+        monkeypatch.setattr(e2b_tools, "execute_tool", execute_tool)
+        monkeypatch.setattr(worker, "TOOL_TIMEOUT", 0.05)
+        monkeypatch.setattr(worker, "MAX_STEPS", 2)
+        feed = TimedFeed()
+
+        asyncio.run(worker.run_agent_loop(FakeClient(), "type hello", feed))
+
+        # The second screenshot is taken only after the first (timed-out) action finished
+        assert len(feed.captured_at) == 2
+        assert feed.captured_at[1] >= finished[0]
+
+    def test_hung_model_call_is_retried(self, monkeypatch):
+        monkeypatch.setattr(worker, "MODEL_TIMEOUT", 0.05)
+        monkeypatch.setattr(worker, "RETRY_BASE_DELAY", 0)
+        client = FakeClient(delay=30)
+
+        with pytest.raises(RuntimeError, match="timed out"):
+            asyncio.run(worker.call_with_retry(client))
+        assert client.calls == worker.MAX_RETRIES
+
+    def test_hung_screenshot_raises(self, monkeypatch):
+        monkeypatch.setattr(worker, "CAPTURE_TIMEOUT", 0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(worker.run_agent_loop(FakeClient(), "type hello", FakeFeed(delay=30)))
@@ -0,0 +1,92 @@
+"""
+Tests for screenshot capture in e2b_tools (fake sandbox, no E2B).
+"""
+
+import base64
+import io
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import e2b_tools
+import worker
+
+
+def _image(fmt: str) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (128, 72), (20, 90, 160)).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class FakeSandbox:
+    def __init__(self, stdout=None, fail=False):
+        self.commands_run = []
+        self.png_captures = 0
+        self.clicks = []
+        self.fail = fail
+        self.stdout = stdout if stdout is not None else base64.b64encode(_image("JPEG")).decode()
+        self.commands = SimpleNamespace(run=self._run)
+
+    def _run(self, command):
+        self.commands_run.append(command)
+        if self.fail:
+            raise RuntimeError("scrot: command not found")
+        return SimpleNamespace(stdout=self.stdout)
+
+    def screenshot(self):
+        self.png_captures += 1
+        return bytearray(_image("PNG"))
+
+    def left_click(self, x, y):
+        self.clicks.append((x, y))
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    def install(**kwargs):
+        fake = FakeSandbox(**kwargs)
+        monkeypatch.setattr(e2b_tools, "_sandbox", fake)
+        monkeypatch.setattr(e2b_tools, "_compressed_capture", True)
+        monkeypatch.setattr(e2b_tools, "SCREENSHOT_SCALE", 1.0)
+        return fake
+
+    return install
+
+
+class TestScreenshotCapture:
+    def test_jpeg_captured_in_one_command(self, sandbox):
+        fake = sandbox()
+        data = e2b_tools.screenshot_raw_bytes()
+        assert data[:2] == b"\xff\xd8"
+        assert len(fake.commands_run) == 1
+        assert "--quality 75" in fake.commands_run[0]
+        assert fake.png_captures == 0
+
+    def test_falls_back_to_png_and_stays_there(self, sandbox):
+        fake = sandbox(fail=True)
+        assert e2b_tools.screenshot_raw_bytes()[:4] == b"\x89PNG"
+        assert e2b_tools.screenshot_raw_bytes()[:4] == b"\x89PNG"
+        assert len(fake.commands_run) == 1
+        assert fake.png_captures == 2
+
+    def test_non_jpeg_output_falls_back(self, sandbox):
+        fake = sandbox(stdout=base64.b64encode(b"scrot: error").decode())
+        assert e2b_tools.screenshot_raw_bytes()[:4] == b"\x89PNG"
+        assert fake.png_captures == 1
+
+    def test_downscaled_capture_maps_coordinates_back(self, sandbox, monkeypatch):
+        fake = sandbox()
+        monkeypatch.setattr(e2b_tools, "SCREENSHOT_SCALE", 0.5)
+        e2b_tools.screenshot_raw_bytes()
+        assert "--thumb 50" in fake.commands_run[0]
+        assert "opticon-shot-thumb.jpg" in fake.commands_run[0]
+        e2b_tools.click(100, 50)
+        assert fake.clicks == [(200, 100)]
+
+    def test_model_message_passes_jpeg_through(self):
+        jpeg = _image("JPEG")
+        msg = worker.make_screenshot_message(jpeg)
+        assert msg["content"][1]["image"].data is jpeg
+        png_msg = worker.make_screenshot_message(_image("PNG"))
+        assert png_msg["content"][1]["image"].data[:2] == b"\xff\xd8"
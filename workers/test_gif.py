@@ -9,7 +9,7 @@ import tempfile
 import pytest
 from PIL import Image
 
-from gif import generate_gif, generate_gif_from_directory
+from gif import TimelapseBuilder, generate_gif, generate_gif_from_directory
 
 
 def _make_frame(color: tuple[int, int, int]) -> dict:
@@ -122,3 +122,72 @@ class TestGenerateGifFromDirectory:
 
         assert result == custom_path
         assert os.path.exists(custom_path)
+
+
+class TestTimelapseBuilder:
+    def test_finalize_writes_animated_gif(self, tmp_path):
+        """Frames added incrementally should come out as an animated GIF."""
+        builder = TimelapseBuilder()
+        for frame in _build_frames(6):
+            builder.add_frame(frame["jpeg_bytes"])
+
+        output_path = str(tmp_path / "timelapse.gif")
+        result = builder.finalize(output_path)
+
+        assert result == output_path
+        img = Image.open(output_path)
+        assert img.format == "GIF"
+        assert img.size == (320, 180)
+        assert img.n_frames == 6
+        assert img.info.get("loop") == 0
+
+    def test_frames_keep_their_colours(self, tmp_path):
+        """Each frame should decode back to (roughly) the colour it was built from."""
+        builder = TimelapseBuilder()
+        frames = _build_frames(3)
+        for frame in frames:
+            builder.add_frame(frame["jpeg_bytes"])
+
+        output_path = str(tmp_path / "colours.gif")
+        builder.finalize(output_path)
+
+        img = Image.open(output_path)
+        expected = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+        for i, colour in enumerate(expected):
+            img.seek(i)
+            pixel = img.convert("RGB").getpixel((160, 90))
+            assert all(abs(a - b) < 40 for a, b in zip(pixel, colour))
+
+    def test_finalize_decimates_to_size_limit(self, tmp_path):
+        """An oversized timelapse should drop frames until it fits, like generate_gif."""
+        builder = TimelapseBuilder()
+        for frame in _build_frames(16):
+            builder.add_frame(frame["jpeg_bytes"])
+        frame_bytes = sum(map(len, builder._blocks)) / builder.frame_count
+
+        output_path = str(tmp_path / "capped.gif")
+        max_size_mb = 5 * frame_bytes / (1024 * 1024)
+        assert builder.finalize(output_path, max_size_mb=max_size_mb) == output_path
+
+        img = Image.open(output_path)
+        assert img.n_frames == 4
+        assert os.path.getsize(output_path) <= max_size_mb * 1024 * 1024 + 100  # header slack
+        assert builder.frame_count == 16  # the builder keeps its frames
+
+    def test_decimation_holds_frame_budget(self, tmp_path):
+        """Exceeding the budget should halve the retained frames, evenly spaced."""
+        builder = TimelapseBuilder(max_frames=8)
+        for frame in _build_frames(30):
+            builder.add_frame(frame["jpeg_bytes"])
+
+        assert 4 <= builder.frame_count <= 8
+
+        output_path = str(tmp_path / "decimated.gif")
+        builder.finalize(output_path)
+        assert Image.open(output_path).n_frames == builder.frame_count
+
+    def test_finalize_without_frames_returns_none(self, tmp_path):
+        """An empty builder should not write anything."""
+        output_path = str(tmp_path / "empty.gif")
+        assert TimelapseBuilder().finalize(output_path) is None
+        assert not os.path.exists(output_path)
@@ -0,0 +1,83 @@
+"""
+Tests for event-loop lag sampling, the blocking-code watchdog and step progress.
+"""
+
+import asyncio
+import logging
+import time
+
+from health import LoopMonitor, StepProgress, rss_bytes
+
+
+def parse_spreadsheet_synchronously():
+    """Stands in for a sync sandbox call or PIL work on the loop thread."""
+    time.sleep(0.3)
+
+
+class TestLoopMonitor:
+    def test_blocking_call_shows_up_as_lag_and_stack_dump(self, caplog):
+        monitor = LoopMonitor(interval=0.01, threshold=0.1)
+
+        async def scenario():
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.05)
+            parse_spreadsheet_synchronously()
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        with caplog.at_level(logging.WARNING, logger="health"):
+            asyncio.run(scenario())
+
+        summary = monitor.lag_summary()
+        assert summary["max"] >= 250
+        assert summary["p50"] < 50
+        assert summary["stalls"] == 1  # one dump per stall, not one per watchdog check
+        dumps = [r.getMessage() for r in caplog.records if "Event loop blocked" in r.getMessage()]
+        assert len(dumps) == 1
+        assert "parse_spreadsheet_synchronously" in dumps[0]
+
+    def test_no_dump_when_loop_is_responsive(self, caplog):
+        monitor = LoopMonitor(interval=0.01, threshold=0.1)
+
+        async def scenario():
+            task = asyncio.create_task(monitor.run())
+            for _ in range(20):
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        with caplog.at_level(logging.WARNING, logger="health"):
+            asyncio.run(scenario())
+
+        assert monitor.stats["stalls"] == 0
+        assert not [r for r in caplog.records if "Event loop blocked" in r.getMessage()]
+
+    def test_empty_summary(self):
+        assert LoopMonitor().lag_summary()["p99"] is None
+
+
+class TestStepProgress:
+    def test_phase_and_step_rate(self):
+        now = [0.0]
+        progress = StepProgress(window=60.0, clock=lambda: now[0])
+        for _ in range(10):
+            progress.set_phase("model call")
+            now[0] += 3.0
+            progress.step_done()
+        progress.set_phase("tool click")
+        now[0] += 2.0
+
+        snapshot = progress.snapshot()
+        assert snapshot["phase"] == "tool click"
+        assert snapshot["phaseSeconds"] == 2.0
+        assert snapshot["steps"] == 10
+        assert snapshot["stepsPerMinute"] == 10.0
+
+        now[0] += 120.0  # idle: old steps leave the window
+        assert progress.snapshot()["stepsPerMinute"] == 0.0
+
+
+def test_rss_bytes():
+    rss = rss_bytes()
+    assert rss is None or rss > 1024 * 1024
@@ -0,0 +1,69 @@
+"""
+Tests for the bytes-based message history and its wire-format conversion.
+"""
+
+import base64
+
+from history import DataUrlCache, ImageRef, image_bytes, image_part, to_wire
+
+
+def _screenshot_msg(data: bytes) -> dict:
+    return {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "Here is the current screenshot of the desktop:"},
+            image_part(ImageRef(data)),
+        ],
+    }
+
+
+class TestToWire:
+    def test_image_refs_become_data_url_parts(self):
+        jpeg = b"\xff\xd8fake-jpeg"
+        messages = [{"role": "system", "content": "sys"}, _screenshot_msg(jpeg)]
+        wire = to_wire(messages)
+
+        assert wire[0] is messages[0]
+        part = wire[1]["content"][1]
+        assert part["type"] == "image_url"
+        assert part["image_url"]["detail"] == "high"
+        prefix, b64 = part["image_url"]["url"].split(",", 1)
+        assert prefix == "data:image/jpeg;base64"
+        assert base64.b64decode(b64) == jpeg
+        # The history itself still holds bytes
+        assert messages[1]["content"][1]["image"].data == jpeg
+
+    def test_image_bytes(self):
+        assert image_bytes(_screenshot_msg(b"x" * 100)) == 100
+        assert image_bytes({"role": "user", "content": "text"}) == 0
+
+
+class TestDataUrlCache:
+    def test_reuses_encodings_across_requests(self):
+        cache = DataUrlCache()
+        messages = [_screenshot_msg(bytes([i]) * 1000) for i in range(3)]
+        first = to_wire(messages, cache)
+        second = to_wire(messages, cache)
+        assert cache.stats == {"hits": 3, "misses": 3}
+        assert first[0]["content"][1]["image_url"]["url"] is second[0]["content"][1]["image_url"]["url"]
+
+    def test_sliding_window_encodes_each_screenshot_once(self):
+        cache = DataUrlCache()
+        window, steps = 10, 50
+        messages = []
+        for step in range(steps):
+            messages.append(_screenshot_msg(bytes([step]) * 1000))
+            if len(messages) > window:
+                del messages[:-window]
+            to_wire(messages, cache)
+
+        assert cache.stats["misses"] == steps
+        assert cache.stats["hits"] == sum(min(step, window - 1) for step in range(steps))
+
+    def test_memoized_ref_keeps_only_its_url(self):
+        msg = _screenshot_msg(b"x" * 300)
+        ref = msg["content"][1]["image"]
+        url = DataUrlCache().get(ref)
+        assert ref.data is None and ref.url == url
+        assert image_bytes(msg) == 300
+        assert to_wire([msg])[0]["content"][1]["image_url"]["url"] == url
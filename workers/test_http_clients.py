@@ -0,0 +1,174 @@
+"""
+Tests for the pooled HTTP clients against a local stand-in server
+(presigned-URL endpoint + PUT storage + a model-API-like POST).
+"""
+
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+from http_clients import HttpClients
+from replay import ReplayBuffer
+
+JPEG = b"\xff\xd8\xff\xe0fake-jpeg"
+
+
+class StandIn:
+    """Local server: counts requests and distinct client connections."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.objects: dict[str, bytes] = {}
+        self.requests = 0
+        self.peers: set = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _track(self, request):
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+    async def upload_urls(self, request):
+        await self._track(request)
+        body = await request.json()
+        base = f"http://{request.host}/objects/{body['sessionId']}/{body['agentId']}"
+        return web.json_response({
+            "frameUrls": [f"{base}/frame-{i}.jpg" for i in range(body["frameCount"])],
+            "manifestUrl": f"{base}/manifest.json",
+        })
+
+    async def put_object(self, request):
+        await self._track(request)
+        self.objects[request.match_info["key"]] = await request.read()
+        return web.Response(status=200)
+
+    async def completion(self, request):
+        await self._track(request)
+        return web.json_response({"ok": True})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/replay/upload-urls", self.upload_urls)
+        app.router.add_put("/objects/{key:.+}", self.put_object)
+        app.router.add_post("/v1/chat/completions", self.completion)
+        return app
+
+
+async def serve(stand_in: StandIn):
+    runner = web.AppRunner(stand_in.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def replay_with_frames(count: int) -> ReplayBuffer:
+    buffer = ReplayBuffer(incremental_timelapse=False)
+    for i in range(count):
+        buffer.restore_frame(JPEG + bytes([i]), f"step {i}", time.time())
+    return buffer
+
+
+class TestReplayUpload:
+    def test_upload_reuses_pooled_connections(self, monkeypatch):
+        import http_clients
+
+        stand_in = StandIn()
+
+        async def scenario():
+            runner, base = await serve(stand_in)
+            clients = HttpClients(per_host=4)
+            monkeypatch.setattr(http_clients, "_clients", clients)
+            try:
+                first = await replay_with_frames(12).upload_r2("s1", "a1", base, "https://cdn")
+                second = await replay_with_frames(12).upload_r2("s1", "a2", base, "https://cdn")
+                return first, second, clients.summary()
+            finally:
+                await clients.close()
+                await runner.cleanup()
+
+        first, second, summary = asyncio.run(scenario())
+
+        assert first == ("https://cdn/replays/s1/a1/manifest.json", 12)
+        assert second[1] == 12
+        # 2 x (upload-urls + 12 frames + manifest)
+        assert stand_in.requests == 28
+        assert len(stand_in.objects) == 26
+        assert json.loads(stand_in.objects["s1/a1/manifest.json"])["frameCount"] == 12
+        # Never more connections than the per-host cap, reused across both uploads
+        assert summary["aiohttp"]["requests"] == 28
+        assert summary["aiohttp"]["newConnections"] <= 4
+        assert len(stand_in.peers) <= 4
+        assert summary["aiohttp"]["reuseRate"] > 0.8
+
+    def test_per_host_limit_caps_concurrent_uploads(self, monkeypatch):
+        import http_clients
+
+        stand_in = StandIn(delay=0.02)
+
+        async def scenario():
+            runner, base = await serve(stand_in)
+            clients = HttpClients(per_host=3)
+            monkeypatch.setattr(http_clients, "_clients", clients)
+            try:
+                return await replay_with_frames(10).upload_r2("s1", "a1", base, "https://cdn")
+            finally:
+                await clients.close()
+                await runner.cleanup()
+
+        assert asyncio.run(scenario())[1] == 10
+        assert stand_in.max_in_flight <= 3
+
+
+class TestModelClient:
+    def test_sequential_calls_share_one_connection(self):
+        stand_in = StandIn()
+
+        async def scenario():
+            runner, base = await serve(stand_in)
+            clients = HttpClients()
+            try:
+                client = clients.httpx_client()
+                assert clients.httpx_client() is client
+                for _ in range(5):
+                    response = await client.post(f"{base}/v1/chat/completions", json={})
+                    assert response.json() == {"ok": True}
+                return clients.summary()
+            finally:
+                await clients.close()
+                await runner.cleanup()
+
+        summary = asyncio.run(scenario())
+
+        assert summary["httpx"] == {"requests": 5, "newConnections": 1, "reuseRate": 0.8}
+        assert len(stand_in.peers) == 1
+
+    def test_per_host_limit_caps_concurrent_calls(self):
+        stand_in = StandIn(delay=0.02)
+
+        async def scenario():
+            runner, base = await serve(stand_in)
+            clients = HttpClients(per_host=2)
+            try:
+                client = clients.httpx_client()
+                await asyncio.gather(
+                    *(client.post(f"{base}/v1/chat/completions", json={}) for _ in range(8))
+                )
+            finally:
+                await clients.close()
+                await runner.cleanup()
+
+        asyncio.run(scenario())
+
+        assert stand_in.requests == 8
+        assert stand_in.max_in_flight <= 2
+        assert len(stand_in.peers) <= 2
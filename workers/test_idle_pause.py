@@ -0,0 +1,130 @@
+"""
+Tests for idle sandbox pausing between tasks (fake sandbox, no E2B).
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from idle_pause import IdlePauser
+
+
+class FakeSandbox:
+    def __init__(self, resume_delay=0.0, fail_resume=False):
+        self.resume_delay = resume_delay
+        self.fail_resume = fail_resume
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def pause(self):
+        with self.lock:
+            self.calls.append("pause")
+        return True
+
+    def connect(self, timeout=None):
+        time.sleep(self.resume_delay)
+        if self.fail_resume:
+            raise RuntimeError("sandbox not found")
+        with self.lock:
+            self.calls.append("resume")
+        return self
+
+
+class FakeFeed:
+    suspended = False
+
+
+class TestIdlePauser:
+    def test_busy_queue_never_pauses(self):
+        sandbox = FakeSandbox()
+
+        async def scenario():
+            pauser = IdlePauser(sandbox, idle_after=0.05)
+            queue, terminated = asyncio.Queue(), asyncio.Event()
+            queue.put_nowait({"taskId": "t1"})
+            return await pauser.wait_for_task(queue, terminated)
+
+        assert asyncio.run(scenario()) == {"taskId": "t1"}
+        assert sandbox.calls == []
+
+    def test_pauses_when_idle_and_resumes_for_next_task(self):
+        sandbox = FakeSandbox()
+        feed = FakeFeed()
+
+        async def scenario():
+            pauser = IdlePauser(sandbox, idle_after=0.05, screen_feed=feed)
+            queue, terminated = asyncio.Queue(), asyncio.Event()
+            waiter = asyncio.create_task(pauser.wait_for_task(queue, terminated))
+            await asyncio.sleep(0.2)
+            assert pauser.paused and feed.suspended
+
+            queue.put_nowait({"taskId": "t1"})
+            pauser.prefetch()  # task:assign
+            task = await waiter
+            await pauser.ensure_running()
+            return task, pauser
+
+        task, pauser = asyncio.run(scenario())
+        assert task == {"taskId": "t1"}
+        assert sandbox.calls == ["pause", "resume"]
+        assert not pauser.paused and not feed.suspended
+        summary = pauser.summary()
+        assert summary["pauses"] == 1
+        assert summary["pausedSeconds"] >= 0.1
+        assert summary["medianResumeMs"] is not None
+
+    def test_prefetch_overlaps_other_work(self):
+        sandbox = FakeSandbox(resume_delay=0.2)
+
+        async def scenario():
+            pauser = IdlePauser(sandbox, idle_after=0.01)
+            await pauser.pause()
+            pauser.prefetch()
+            await asyncio.sleep(0.2)  # e.g. memory retrieval
+            started = time.perf_counter()
+            await pauser.ensure_running()
+            return time.perf_counter() - started
+
+        assert asyncio.run(scenario()) < 0.1
+        assert sandbox.calls == ["pause", "resume"]
+
+    def test_task_during_pause_waits_for_pause_then_resumes(self):
+        sandbox = FakeSandbox()
+
+        async def scenario():
+            pauser = IdlePauser(sandbox, idle_after=0.01)
+            pausing = asyncio.create_task(pauser.pause())
+            await asyncio.sleep(0)  # pause under way
+            await pauser.ensure_running()
+            await pausing
+            return pauser.paused
+
+        assert asyncio.run(scenario()) is False
+        assert sandbox.calls == ["pause", "resume"]
+
+    def test_failed_resume_looks_like_a_lost_sandbox(self):
+        sandbox = FakeSandbox(fail_resume=True)
+
+        async def scenario():
+            pauser = IdlePauser(sandbox, idle_after=0.01)
+            await pauser.pause()
+            await pauser.ensure_running()
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(scenario())
+
+    def test_disabled(self):
+        sandbox = FakeSandbox()
+
+        async def scenario():
+            pauser = IdlePauser(sandbox, idle_after=0)
+            queue, terminated = asyncio.Queue(), asyncio.Event()
+            waiter = asyncio.create_task(pauser.wait_for_task(queue, terminated))
+            await asyncio.sleep(0.05)
+            terminated.set()
+            return await waiter
+
+        assert asyncio.run(scenario()) is None
+        assert sandbox.calls == []
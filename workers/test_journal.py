@@ -0,0 +1,128 @@
+"""
+Tests for the crash-safe step journal and mid-task resume.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import worker
+from conftest import FakeClient
+from journal import StepJournal
+
+
+class TestStepJournal:
+    def test_unfinished_task_is_resumable(self, tmp_path):
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "Open firefox", memories="likes dark mode")
+        journal.record_step(1, "double_click", {"x": 10, "y": 20}, "Double-clicked at (10, 20)")
+        journal.record_frame(b"\xff\xd8jpeg", "Tool: double_click", captured_at=123.0)
+        journal.record_step(2, "type_text", {"text": "hi"}, "Typed: hi")
+        journal.close()
+
+        state = StepJournal(tmp_path).load()
+        assert state.resumable
+        assert state.active_task["description"] == "Open firefox"
+        assert state.active_task["memories"] == "likes dark mode"
+        assert [s["step"] for s in state.steps] == [1, 2]
+        assert state.frames[0]["capturedAt"] == 123.0
+        assert StepJournal(tmp_path).read_frame(state.frames[0]) == b"\xff\xd8jpeg"
+
+    def test_finished_task_is_not_resumed(self, tmp_path):
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "Open firefox")
+        journal.record_step(1, "click", {"x": 1, "y": 1}, "ok")
+        journal.finish_task("t1", "done")
+        journal.close()
+
+        state = StepJournal(tmp_path).load()
+        assert not state.resumable
+        assert state.finished_task_ids == {"t1"}
+
+    def test_torn_last_record_is_ignored(self, tmp_path):
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "Open firefox")
+        journal.record_step(1, "click", {"x": 1, "y": 1}, "ok")
+        journal.close()
+        with journal.path.open("a") as f:
+            f.write('{"type": "step", "taskId": "t1", "st')
+
+        state = StepJournal(tmp_path).load()
+        assert len(state.steps) == 1
+
+    def test_append_after_torn_record_starts_a_new_line(self, tmp_path):
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "Open firefox")
+        journal.close()
+        with journal.path.open("a") as f:
+            f.write('{"type": "step", "taskId": "t1", "st')
+
+        resumed = StepJournal(tmp_path)
+        resumed.load()
+        resumed.record_step(1, "click", {"x": 1, "y": 1}, "ok")
+        resumed.close()
+
+        state = StepJournal(tmp_path).load()
+        assert [s["step"] for s in state.steps] == [1]
+
+    def test_fsync_runs_off_the_calling_thread(self, tmp_path, monkeypatch):
+        import journal as journal_module
+
+        synced_on = []
+        real_fsync = os.fsync
+        monkeypatch.setattr(journal_module.os, "fsync", lambda fd: (
+            synced_on.append(threading.current_thread().name), real_fsync(fd)
+        ))
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "Open firefox")
+        for step in range(20):
+            journal.record_step(step + 1, "click", {"x": step, "y": 1}, "ok")
+        time.sleep(0.05)
+        appending_thread = threading.current_thread().name
+        background = [name for name in synced_on if name != appending_thread]
+        journal.close()  # final fsync
+
+        assert background and set(background) == {"journal-fsync"}
+        assert len(StepJournal(tmp_path).load().steps) == 20
+
+    def test_reset_discards_everything(self, tmp_path):
+        journal = StepJournal(tmp_path / "agent")
+        journal.start_task("t1", "Open firefox")
+        journal.record_frame(b"jpeg", "Starting task")
+        journal.reset()
+        assert not journal.path.exists()
+        assert not StepJournal(tmp_path / "agent").load().resumable
+
+
+class TestResume:
+    def test_agent_loop_continues_after_last_journaled_step(self, tmp_path, fake_feed):
+        journal = StepJournal(tmp_path)
+        journal.start_task("t1", "Open firefox")
+        for step in range(1, 6):
+            journal.record_step(step, "click", {"x": step, "y": step}, f"Clicked {step}")
+        journal.close()
+        state = StepJournal(tmp_path).load()
+
+        resumed = StepJournal(tmp_path)
+        resumed.load()
+        client = FakeClient(tool=("done", {"summary": "all done"}), content="finishing")
+        steps_seen = []
+
+        async def on_step(step, name, args, reasoning=None):
+            steps_seen.append(step)
+
+        result = asyncio.run(worker.run_agent_loop(
+            client, "Open firefox", fake_feed,
+            on_step=on_step, journal=resumed, resume_steps=state.steps,
+        ))
+        resumed.close()
+
+        assert result == "all done"
+        # One model call: the crash cost no replayed steps
+        assert len(client.requests) == 1
+        assert steps_seen == [6]
+        summary = client.requests[0]["messages"][2]["content"]
+        assert "already performed 5 actions" in summary
+        assert "click" in summary and "Clicked 5" in summary
+        assert StepJournal(tmp_path).load().steps[-1]["step"] == 6
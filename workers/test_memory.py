@@ -0,0 +1,356 @@
+"""
+Tests for the memory write queue (no Mem0 needed — uses a fake manager).
+"""
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+from memory import MemoryManager, MemoryPrefetcher, MemoryWriter, RetrievalCache
+
+
+class FakeManager:
+    def __init__(self):
+        self.batches = []
+
+    def store_memories_batch(self, user_id, items):
+        self.batches.append((user_id, list(items)))
+
+
+class FakeMem0:
+    def __init__(self):
+        self.searches = 0
+        self.facts = ["Prefers aisle seats"]
+
+    def search(self, query, user_id, limit):
+        self.searches += 1
+        return {"results": [{"memory": f} for f in self.facts]}
+
+    def add(self, text, user_id):
+        self.facts.append(text)
+        return {"results": [{"memory": text}]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _manager_with_fake_mem0(cache=None):
+    manager = MemoryManager(cache=cache)
+    manager._memory = FakeMem0()
+    return manager
+
+
+class TestRetrievalCache:
+    def test_repeated_and_similar_queries_hit(self):
+        manager = _manager_with_fake_mem0()
+        first = manager.retrieve_memories("u1", "Book a flight to Boston")
+        assert manager.retrieve_memories("u1", "book a flight to  Boston") == first
+        assert manager.retrieve_memories("u1", "Book a flight to Boston.") == first
+        assert manager._memory.searches == 1
+        assert manager.cache.stats["hits"] == 2
+        assert manager.cache.stats["misses"] == 1
+
+    def test_cache_is_per_user(self):
+        manager = _manager_with_fake_mem0()
+        manager.retrieve_memories("u1", "Book a flight")
+        manager.retrieve_memories("u2", "Book a flight")
+        assert manager._memory.searches == 2
+
+    def test_store_invalidates_user(self):
+        manager = _manager_with_fake_mem0()
+        manager.retrieve_memories("u1", "Book a flight")
+        manager.store_memories("u1", "Book a flight", "Booked a window seat")
+        result = manager.retrieve_memories("u1", "Book a flight")
+        assert "Booked a window seat" in result
+        assert manager._memory.searches == 2
+        assert manager.cache.stats["invalidations"] == 1
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        manager = _manager_with_fake_mem0(RetrievalCache(ttl=10, clock=clock))
+        manager.retrieve_memories("u1", "Book a flight")
+        clock.now = 11
+        manager.retrieve_memories("u1", "Book a flight")
+        assert manager._memory.searches == 2
+
+    def test_lru_eviction(self):
+        cache = RetrievalCache(max_entries=2)
+        for query in ("alpha task", "beta job", "gamma errand"):
+            cache.put("u1", query, query, cache.generation("u1"))
+        assert cache.get("u1", "alpha task") is None
+        assert cache.get("u1", "gamma errand") == "gamma errand"
+
+    def test_put_after_invalidation_is_ignored(self):
+        cache = RetrievalCache()
+        generation = cache.generation("u1")
+        cache.invalidate("u1")
+        cache.put("u1", "stale query", "stale", generation)
+        assert cache.get("u1", "stale query") is None
+
+
+class FakeEmbedder:
+    class Model:
+        def __init__(self):
+            self.calls = []
+
+        def encode(self, texts, convert_to_numpy=True):
+            import numpy as np
+
+            self.calls.append(list(texts))
+            return np.array([[float(len(t))] for t in texts])
+
+    def __init__(self):
+        self.model = self.Model()
+        self.single_calls = 0
+
+    def embed(self, text, memory_action=None):
+        self.single_calls += 1
+        return [float(len(text))]
+
+
+class TestBatchingEmbedder:
+    def test_batch_then_single_lookups_hit_memo(self):
+        from memory import _BatchingEmbedder
+
+        inner = FakeEmbedder()
+        embedder = _BatchingEmbedder(inner)
+        embedder.embed_batch(["book a flight", "order pizza"])
+        assert embedder.embed("book a flight", "search") == [13.0]
+        assert embedder.embed("order pizza", "search") == [11.0]
+        assert inner.model.calls == [["book a flight", "order pizza"]]
+        assert inner.single_calls == 0
+        # Unknown text falls through to the wrapped embedder
+        embedder.embed("something else", "add")
+        assert inner.single_calls == 1
+
+
+class TestMemoryWriter:
+    def test_submit_returns_immediately_and_flushes_on_close(self):
+        manager = FakeManager()
+
+        async def scenario():
+            writer = MemoryWriter(manager, flush_interval=60)
+            writer.start()
+            assert writer.submit("u1", "Book a flight", "Booked UA 123")
+            assert manager.batches == []
+            await writer.close(timeout=5)
+            return writer
+
+        writer = asyncio.run(scenario())
+        assert manager.batches == [("u1", [("Book a flight", "Booked UA 123")])]
+        assert writer.stats["written"] == 1
+
+    def test_batches_per_user(self):
+        manager = FakeManager()
+
+        async def scenario():
+            writer = MemoryWriter(manager, flush_interval=0.01)
+            writer.start()
+            writer.submit("u1", "Order pizza", "Ordered a margherita")
+            writer.submit("u2", "Check weather", "Sunny, 21C")
+            writer.submit("u1", "Email Bob", "Sent the report to Bob")
+            await asyncio.sleep(0.1)
+            await writer.close(timeout=5)
+            return writer
+
+        writer = asyncio.run(scenario())
+        batches = dict(manager.batches)
+        assert len(batches["u1"]) == 2
+        assert len(batches["u2"]) == 1
+        assert writer.stats["batches"] == 2
+
+    def test_skips_near_duplicates(self):
+        manager = FakeManager()
+
+        async def scenario():
+            writer = MemoryWriter(manager)
+            assert writer.submit("u1", "Open google.com", "Opened Google")
+            assert not writer.submit("u1", "open  Google.com", "Opened Google.")
+            # Same text for a different user is not a duplicate
+            assert writer.submit("u2", "Open google.com", "Opened Google")
+            await writer.close(timeout=5)
+            return writer
+
+        writer = asyncio.run(scenario())
+        assert writer.stats["deduplicated"] == 1
+        assert writer.stats["written"] == 2
+
+    def test_bounded_queue_drops_and_counts(self):
+        manager = FakeManager()
+
+        async def scenario():
+            writer = MemoryWriter(manager, max_pending=2)
+            results = [writer.submit("u1", f"Task number {i} " * i, f"done {i}") for i in range(1, 5)]
+            await writer.close(timeout=5)
+            return writer, results
+
+        writer, results = asyncio.run(scenario())
+        assert results == [True, True, False, False]
+        assert writer.stats["dropped"] == 2
+        assert writer.stats["written"] == 2
+
+
+class FakeBatchManager:
+    def __init__(self):
+        self.cache = RetrievalCache()
+        self.retrieve_batches = []
+        self.stored = []
+
+    def retrieve_memories_batch(self, requests):
+        self.retrieve_batches.append(list(requests))
+        return [f"memories for {u}: {q}" for u, q in requests]
+
+    def store_memories_batch(self, user_id, items):
+        self.stored.append((user_id, items))
+
+
+class TestMemoryService:
+    def test_remote_client_round_trip_and_cross_agent_batching(self, tmp_path):
+        from memory import RemoteMemoryManager
+        from memory_service import MemoryService
+
+        socket_path = str(tmp_path / "mem.sock")
+        manager = FakeBatchManager()
+
+        async def scenario():
+            service = MemoryService(manager, batch_window=0.05)
+            server = await asyncio.start_unix_server(service.handle_client, path=socket_path)
+            async with server:
+                clients = [RemoteMemoryManager(socket_path, autostart=False) for _ in range(3)]
+                results = await asyncio.gather(*(
+                    asyncio.to_thread(c.retrieve_memories, f"u{i}", "Book a flight")
+                    for i, c in enumerate(clients)
+                ))
+                await asyncio.to_thread(
+                    clients[0].store_memories, "u0", "Book a flight", "Booked"
+                )
+                return results
+
+        results = asyncio.run(scenario())
+        assert results == [f"memories for u{i}: Book a flight" for i in range(3)]
+        # All three agents' retrieves were answered by a single batch
+        assert len(manager.retrieve_batches) == 1
+        assert manager.stored == [("u0", [("Book a flight", "Booked")])]
+
+    def test_remote_client_degrades_when_service_missing(self, tmp_path):
+        from memory import RemoteMemoryManager
+
+        client = RemoteMemoryManager(str(tmp_path / "missing.sock"), autostart=False)
+        assert client.retrieve_memories("u1", "anything") == ""
+        client.store_memories("u1", "task", "result")  # must not raise
+
+
+    def test_retrieve_does_not_queue_behind_a_slow_store(self, tmp_path):
+        from memory import RemoteMemoryManager
+        from memory_service import MemoryService
+
+        socket_path = str(tmp_path / "mem.sock")
+
+        class SlowStoreManager(FakeBatchManager):
+            def store_memories_batch(self, user_id, items):
+                time.sleep(0.5)
+                super().store_memories_batch(user_id, items)
+
+        async def scenario():
+            service = MemoryService(SlowStoreManager(), batch_window=0.01)
+            server = await asyncio.start_unix_server(service.handle_client, path=socket_path)
+            async with server:
+                client = RemoteMemoryManager(socket_path, autostart=False)
+                store = asyncio.create_task(
+                    asyncio.to_thread(client.store_memories, "u0", "Book a flight", "Booked")
+                )
+                await asyncio.sleep(0.05)  # store batch under way
+                started = time.perf_counter()
+                result = await asyncio.to_thread(client.retrieve_memories, "u1", "Order pizza")
+                elapsed = time.perf_counter() - started
+                await store
+                return result, elapsed
+
+        result, elapsed = asyncio.run(scenario())
+        assert result == "memories for u1: Order pizza"
+        assert elapsed < 0.3
+
+    def test_client_respawns_a_service_that_exited(self, tmp_path):
+        from memory import RemoteMemoryManager
+
+        socket_path = str(tmp_path / "mem.sock")
+
+        class OneShotServiceClient(RemoteMemoryManager):
+            """Each spawn serves one request, then exits like an idle-timed-out service."""
+
+            def _spawn_service(self):
+                self.spawns += 1
+                listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                listener.bind(self.socket_path)
+                listener.listen()
+
+                def serve():
+                    conn, _ = listener.accept()
+                    with conn, conn.makefile("rb") as reader:
+                        reader.readline()
+                        conn.sendall(json.dumps({"result": f"spawn {self.spawns}"}).encode() + b"\n")
+                    listener.close()
+                    os.unlink(self.socket_path)
+
+                threading.Thread(target=serve, daemon=True).start()
+
+        client = OneShotServiceClient(socket_path)
+        assert client.retrieve_memories("u1", "first") == "spawn 1"
+        assert client.retrieve_memories("u1", "second") == "spawn 2"
+        assert client.spawns == 2
+
+class TestMemoryPrefetcher:
+    def test_queued_tasks_are_batched_and_ready_at_start(self):
+        manager = FakeBatchManager()
+
+        async def scenario():
+            prefetcher = MemoryPrefetcher(manager, "u1", batch_window=0.01)
+            prefetcher.prefetch("Task A")
+            prefetcher.prefetch("Task B")
+            await asyncio.sleep(0.1)  # "current task" running
+            a = await prefetcher.get("Task A")
+            b = await prefetcher.get("Task B")
+            return prefetcher, a, b
+
+        prefetcher, a, b = asyncio.run(scenario())
+        assert a == "memories for u1: Task A"
+        assert b == "memories for u1: Task B"
+        assert manager.retrieve_batches == [[("u1", "Task A"), ("u1", "Task B")]]
+        assert prefetcher.stats["ready_at_start"] == 2
+
+    def test_get_without_prefetch_retrieves_directly(self):
+        manager = _manager_with_fake_mem0()
+
+        async def scenario():
+            prefetcher = MemoryPrefetcher(manager, "u1")
+            return prefetcher, await prefetcher.get("Book a flight")
+
+        prefetcher, result = asyncio.run(scenario())
+        assert "Prefers aisle seats" in result
+        assert prefetcher.stats["unprefetched"] == 1
+
+    def test_discarded_and_overflowing_prefetches_are_dropped(self):
+        manager = FakeBatchManager()
+
+        async def scenario():
+            prefetcher = MemoryPrefetcher(manager, "u1", batch_window=0.01, max_prefetched=2)
+            prefetcher.prefetch("Task A")
+            prefetcher.discard("Task A")  # duplicate task id, skipped by the worker
+            await asyncio.sleep(0.05)
+            for query in ("Task B", "Task C", "Task D"):
+                prefetcher.prefetch(query)
+            await asyncio.sleep(0.05)
+            return prefetcher
+
+        prefetcher = asyncio.run(scenario())
+        assert manager.retrieve_batches == [[("u1", "Task C"), ("u1", "Task D")]]
+        assert list(prefetcher._results) == ["Task C", "Task D"]
+        assert prefetcher.stats["discarded"] == 2
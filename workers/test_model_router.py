@@ -0,0 +1,104 @@
+"""
+Tests for the model cascade (routing decisions and escalation in the agent loop).
+"""
+
+import asyncio
+
+import e2b_tools
+import worker
+from conftest import FakeClient, png
+from model_router import ModelRouter
+
+STRONG = "strong-model"
+FAST = "fast-model"
+
+
+class TestRouting:
+    def test_disabled_router_always_uses_strong_model(self):
+        router = ModelRouter(STRONG, fast_model=None)
+        assert [router.choose(step) for step in range(5)] == [STRONG] * 5
+
+    def test_routine_steps_go_to_fast_model(self):
+        router = ModelRouter(STRONG, FAST, warmup_steps=1, max_fast_streak=10)
+        router.observe_screen(png(0))
+        assert router.choose(0) == STRONG
+        for step, shade in enumerate((40, 80, 120), start=1):
+            router.observe_action("click", {"x": step, "y": 1}, "Clicked")
+            router.observe_screen(png(shade))
+            assert router.choose(step) == FAST
+
+    def test_errors_and_stalls_escalate(self):
+        router = ModelRouter(STRONG, FAST, warmup_steps=0)
+        router.observe_screen(png(0))
+        router.observe_action("click", {"x": 1, "y": 1}, "ERROR: click failed")
+        assert router.choose(1) == STRONG
+        router.observe_action("click", {"x": 2, "y": 2}, "Clicked")
+        router.observe_screen(png(0))  # screen did not change
+        assert router.choose(2) == STRONG
+        assert router.stats["reasons"] == {"error": 1, "stall": 1}
+
+    def test_fast_streak_is_capped(self):
+        router = ModelRouter(STRONG, FAST, warmup_steps=0, max_fast_streak=2)
+        models = []
+        for step in range(6):
+            router.observe_action("scroll", {"amount": step}, "Scrolled")
+            router.observe_screen(png(step * 40))
+            models.append(router.choose(step))
+        assert models == [FAST, FAST, STRONG, FAST, FAST, STRONG]
+
+    def test_unusable_fast_answers_escalate(self):
+        router = ModelRouter(STRONG, FAST)
+        assert router.should_escalate(FAST, None, None) == "no_tool_call"
+        assert router.should_escalate(FAST, "done", '{"summary": "ok"}') == "done"
+        assert router.should_escalate(FAST, "click", "{not json") == "bad_arguments"
+        assert router.should_escalate(FAST, "click", '{"x": 1, "y": 2}') is None
+        assert router.should_escalate(STRONG, "done", "{}") is None
+
+    def test_routing_is_opt_in(self, monkeypatch):
+        monkeypatch.delenv("MODEL_ROUTER", raising=False)
+        assert ModelRouter.from_env(STRONG).fast_model is None
+        monkeypatch.setenv("MODEL_ROUTER", "true")
+        assert ModelRouter.from_env(STRONG).fast_model is not None
+
+
+class TestAgentLoopCascade:
+    def test_loop_routes_and_strong_model_confirms_done(self, monkeypatch, changing_feed):
+        monkeypatch.setattr(e2b_tools, "execute_tool", lambda name, args: (
+            args.get("summary", "ok") if name == "done" else f"{name} ok"
+        ))
+        client = FakeClient(script=[
+            ("click", {"x": 1, "y": 1}),      # step 0: warmup, strong
+            ("type_text", {"text": "url"}),   # step 1: warmup, strong
+            ("press_key", {"key": "Enter"}),  # step 2: routine, fast
+            ("done", {"summary": "fast"}),    # step 3: fast says done...
+            ("done", {"summary": "strong"}),  # ...strong model confirms
+        ])
+        router = ModelRouter(STRONG, FAST, warmup_steps=2)
+
+        result = asyncio.run(worker.run_agent_loop(client, "Open a page", changing_feed, router=router))
+
+        assert result == "strong"
+        assert client.models == [STRONG, STRONG, FAST, FAST, STRONG]
+        summary = router.summary()
+        assert summary["steps"] == {STRONG: 3, FAST: 2}
+        assert summary["escalationRate"] == 0.5
+        assert set(summary["medianLatency"]) == {STRONG, FAST}
+
+    def test_failed_fast_call_falls_back_to_strong_model(self, monkeypatch, changing_feed):
+        monkeypatch.setattr(e2b_tools, "execute_tool", lambda name, args: (
+            args.get("summary", "ok") if name == "done" else f"{name} ok"
+        ))
+        client = FakeClient(script=[
+            ("click", {"x": 1, "y": 1}),      # step 0: warmup, strong
+            RuntimeError("fast model overloaded"),  # step 1: fast fails once...
+            ("done", {"summary": "strong"}),  # ...and the strong model takes the step
+        ])
+        router = ModelRouter(STRONG, FAST, warmup_steps=1)
+        monkeypatch.setattr(worker, "MIN_STEPS_BEFORE_DONE", 0)
+
+        result = asyncio.run(worker.run_agent_loop(client, "Open a page", changing_feed, router=router))
+
+        assert result == "strong"
+        assert client.models == [STRONG, FAST, STRONG]  # no retries on the fast model
+        assert router.stats["reasons"]["escalated:fast_error"] == 1
+        assert router.summary()["steps"] == {STRONG: 2}
@@ -0,0 +1,235 @@
+"""
+Tests for the outbound socket.io event queue (fake socket, no server).
+"""
+
+import asyncio
+
+import outbox as outbox_module
+from outbox import MAX_SEND_ATTEMPTS, EventOutbox
+
+
+class FakeSio:
+    def __init__(self, connected=True, delay=0.0):
+        self.connected = connected
+        self.delay = delay
+        self.sent = []
+        self.handlers = {}
+        self.fail_next = 0
+        self.unacked = 0  # number of call()s that time out before one is acknowledged
+        self.called = []
+        self.attempts = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def emit(self, event, data):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if not self.connected or self.fail_next:
+            self.fail_next = max(0, self.fail_next - 1)
+            raise ConnectionError("socket down")
+        self.sent.append((event, data))
+
+    async def call(self, event, data, timeout=None):
+        self.attempts.append((event, data))
+        if self.unacked:
+            self.unacked -= 1
+            raise TimeoutError("no ack")
+        self.called.append((event, data))
+
+    async def drop(self):
+        self.connected = False
+        await self.handlers["disconnect"]()
+
+    async def reconnect(self):
+        self.connected = True
+        await self.handlers["connect"]()
+
+
+def _outbox(sio, **kwargs):
+    return EventOutbox(sio, {"agentId": "a1"}, **kwargs)
+
+
+class TestEventOutbox:
+    def test_emit_does_not_wait_for_slow_socket(self):
+        sio = FakeSio(delay=0.2)
+
+        async def scenario():
+            outbox = _outbox(sio)
+            outbox.start()
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            for i in range(5):
+                await outbox.emit("agent:thinking", {"step": i})
+            elapsed = loop.time() - start
+            await outbox.close(timeout=5)
+            return elapsed
+
+        elapsed = asyncio.run(scenario())
+        assert elapsed < 0.05
+        assert [d["step"] for _, d in sio.sent] == [0, 1, 2, 3, 4]
+        assert all(d["agentId"] == "a1" for _, d in sio.sent)
+
+    def test_thumbnails_are_coalesced(self):
+        sio = FakeSio(connected=False)
+
+        async def scenario():
+            outbox = _outbox(sio)
+            outbox.start()
+            for i in range(3):
+                outbox.put("agent:thumbnail", {"thumbnail": f"t{i}"})
+            outbox.put("agent:thinking", {"step": 1})
+            await sio.reconnect()
+            await outbox.close(timeout=5)
+            return outbox
+
+        outbox = asyncio.run(scenario())
+        assert sio.sent == [
+            ("agent:thumbnail", {"agentId": "a1", "thumbnail": "t2"}),
+            ("agent:thinking", {"agentId": "a1", "step": 1}),
+        ]
+        assert outbox.stats["coalesced"] == 2
+
+    def test_buffers_across_reconnect_and_rejoins_first(self):
+        sio = FakeSio()
+
+        async def scenario():
+            outbox = _outbox(
+                sio, hello="agent:join", hello_data={"capabilities": {"binaryThumbnails": True}}
+            )
+            outbox.start()
+            outbox.put("agent:thinking", {"step": 1})
+            await outbox.flush()
+            await sio.drop()
+            outbox.put("task:completed", {"todoId": "t1"})
+            await asyncio.sleep(0.05)
+            assert len(sio.sent) == 1
+            await sio.reconnect()
+            await outbox.close(timeout=5)
+
+        asyncio.run(scenario())
+        assert [e for e, _ in sio.sent] == ["agent:thinking", "agent:join", "task:completed"]
+        assert sio.sent[1][1]["capabilities"] == {"binaryThumbnails": True}
+
+    def test_overflow_drops_oldest_but_keeps_priority_events(self):
+        sio = FakeSio(connected=False)
+
+        async def scenario():
+            outbox = _outbox(sio, max_queue=3)
+            outbox.start()
+            outbox.put("task:completed", {"todoId": "t1"})
+            for i in range(4):
+                outbox.put("agent:thinking", {"step": i})
+            outbox.put("replay:complete", {"frameCount": 3})
+            await sio.reconnect()
+            await outbox.close(timeout=5)
+            return outbox
+
+        outbox = asyncio.run(scenario())
+        events = [(e, d.get("step")) for e, d in sio.sent]
+        assert events == [
+            ("task:completed", None),
+            ("agent:thinking", 2),
+            ("agent:thinking", 3),
+            ("replay:complete", None),
+        ]
+        assert outbox.stats["dropped"] == 2
+
+    def test_failed_send_is_retried(self):
+        sio = FakeSio()
+        sio.fail_next = 1
+
+        async def scenario():
+            outbox = _outbox(sio)
+            outbox.start()
+            outbox.put("task:completed", {"todoId": "t1"})
+            await outbox.close(timeout=5)
+            return outbox
+
+        outbox = asyncio.run(scenario())
+        assert [e for e, _ in sio.sent] == ["task:completed"]
+        assert outbox.stats["send_errors"] == 1
+
+    def test_close_reports_unsent_events(self):
+        sio = FakeSio(connected=False)
+
+        async def scenario():
+            outbox = _outbox(sio)
+            outbox.start()
+            outbox.put("agent:terminated", {})
+            return await outbox.close(timeout=0.1)
+
+        assert asyncio.run(scenario()) is False
+
+    def test_priority_events_wait_for_acknowledgement(self):
+        sio = FakeSio()
+        sio.unacked = 1
+
+        async def scenario():
+            outbox = _outbox(sio, acks=True)
+            outbox.start()
+            await outbox.emit("agent:thinking", {"step": 1})
+            await outbox.emit("agent:terminated", {})
+            flushed = await outbox.close(timeout=5)
+            return flushed, outbox.stats
+
+        flushed, stats = asyncio.run(scenario())
+        assert flushed
+        assert [e for e, _ in sio.sent] == ["agent:thinking"]
+        assert [e for e, _ in sio.called] == ["agent:terminated"]
+        assert stats["acked"] == 1
+        assert stats["send_errors"] == 1  # the unacknowledged first attempt
+        # The retry carried the same idempotency key as the lost attempt
+        assert sio.attempts[0][1]["eventId"] == sio.attempts[1][1]["eventId"]
+
+    def test_each_priority_event_gets_its_own_event_id(self):
+        sio = FakeSio()
+
+        async def scenario():
+            outbox = _outbox(sio)
+            outbox.start()
+            outbox.put("task:completed", {"todoId": "t1"})
+            outbox.put("task:completed", {"todoId": "t2"})
+            outbox.put("agent:thinking", {"step": 1})
+            await outbox.close(timeout=5)
+
+        asyncio.run(scenario())
+        first, second, thinking = (d for _, d in sio.sent)
+        assert first["eventId"] != second["eventId"]
+        assert "eventId" not in thinking
+
+    def test_gives_up_after_repeated_failures_while_connected(self, monkeypatch):
+        monkeypatch.setattr(outbox_module, "RETRY_DELAY", 0)
+        sio = FakeSio()
+        sio.unacked = MAX_SEND_ATTEMPTS + 10
+
+        async def scenario():
+            outbox = _outbox(sio, acks=True)
+            outbox.start()
+            outbox.put("agent:terminated", {})
+            outbox.put("agent:thinking", {"step": 1})
+            flushed = await outbox.close(timeout=5)
+            return flushed, outbox.stats
+
+        flushed, stats = asyncio.run(scenario())
+        assert flushed
+        assert len(sio.attempts) == MAX_SEND_ATTEMPTS
+        assert stats["given_up"] == 1
+        assert [e for e, _ in sio.sent] == ["agent:thinking"]  # the queue moved on
+
+    def test_priority_lane_is_bounded(self):
+        sio = FakeSio(connected=False)
+
+        async def scenario():
+            outbox = _outbox(sio, max_priority=2)
+            outbox.start()
+            for i in range(4):
+                outbox.put("task:completed", {"todoId": f"t{i}"})
+            await sio.reconnect()
+            await outbox.close(timeout=5)
+            return outbox.stats
+
+        stats = asyncio.run(scenario())
+        assert [d["todoId"] for _, d in sio.sent] == ["t2", "t3"]
+        assert stats["dropped_priority"] == 2
+
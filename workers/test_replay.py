@@ -0,0 +1,200 @@
+"""
+Tests for the replay capture module.
+"""
+
+import base64
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+from PIL import Image, ImageDraw
+
+from replay import (
+    CAPTURE_EVERY_STEP,
+    CAPTURE_INTERVAL,
+    CAPTURE_ON_CHANGE,
+    MAX_MERGED_ACTIONS,
+    CapturePolicy,
+    ReplayBuffer,
+    ReplayFrame,
+    merge_actions,
+    serialize_manifest,
+)
+
+
+def _make_png(color=(40, 40, 40), text_box=None) -> bytes:
+    """Create a synthetic 1280x720 screenshot, optionally with a small white box."""
+    img = Image.new("RGB", (1280, 720), color=color)
+    if text_box:
+        ImageDraw.Draw(img).rectangle(text_box, fill=(255, 255, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCapturePolicy:
+    def test_every_step_keeps_all_frames(self):
+        buffer = ReplayBuffer(
+            incremental_timelapse=False,
+            capture_policy=CapturePolicy(CAPTURE_EVERY_STEP),
+        )
+        png = _make_png()
+        for _ in range(3):
+            assert buffer.capture_frame(png, "Tool: click")
+        assert buffer.frame_count == 3
+        assert buffer.skipped_count == 0
+        assert buffer.byte_size == sum(len(f.jpeg_bytes) for f in buffer._frames)
+
+    def test_on_change_skips_identical_screens(self):
+        buffer = ReplayBuffer(
+            incremental_timelapse=False,
+            capture_policy=CapturePolicy(CAPTURE_ON_CHANGE, clock=FakeClock()),
+        )
+        png = _make_png()
+        assert buffer.capture_frame(png, "Starting task")
+        assert not buffer.capture_frame(png, "Tool: move_mouse")
+        assert buffer.frame_count == 1
+        assert buffer.skipped_count == 1
+
+    def test_skipped_actions_are_carried_onto_the_next_kept_frame(self):
+        buffer = ReplayBuffer(
+            incremental_timelapse=False,
+            capture_policy=CapturePolicy(CAPTURE_ON_CHANGE, clock=FakeClock()),
+        )
+        png = _make_png()
+        buffer.capture_frame(png, "Starting task")
+        buffer.capture_frame(png, "Tool: move_mouse")
+        buffer.capture_frame(png, "Tool: scroll")
+        buffer.capture_frame(png, "Tool: scroll")
+        assert buffer.capture_frame(_make_png((0, 0, 0)), "Tool: click")
+        assert buffer.capture_frame(_make_png((255, 255, 255)), "Tool: type_text")
+
+        assert [f.action for f in buffer._frames] == [
+            "Starting task",
+            "Tool: move_mouse → Tool: scroll (x2) → Tool: click",
+            "Tool: type_text",
+        ]
+
+    def test_merged_labels_are_capped(self):
+        labels = [f"Tool: step{i}" for i in range(20)]
+        merged = merge_actions(labels)
+        assert merged.startswith("… → ")
+        assert merged.endswith("Tool: step19")
+        assert merged.count("→") == MAX_MERGED_ACTIONS
+
+    def test_on_change_captures_small_visible_change(self):
+        """A word-sized change on a 1280x720 screen should count as meaningful."""
+        buffer = ReplayBuffer(
+            incremental_timelapse=False,
+            capture_policy=CapturePolicy(CAPTURE_ON_CHANGE, clock=FakeClock()),
+        )
+        buffer.capture_frame(_make_png(), "Starting task")
+        assert buffer.capture_frame(_make_png(text_box=(600, 300, 680, 316)), "Tool: type_text")
+        assert buffer.frame_count == 2
+
+    def test_on_change_forces_keyframe_after_max_interval(self):
+        clock = FakeClock()
+        policy = CapturePolicy(CAPTURE_ON_CHANGE, max_interval=30.0, clock=clock)
+        buffer = ReplayBuffer(incremental_timelapse=False, capture_policy=policy)
+        png = _make_png()
+        buffer.capture_frame(png, "Starting task")
+        clock.now = 29.0
+        assert not buffer.capture_frame(png, "Tool: scroll")
+        clock.now = 30.0
+        assert buffer.capture_frame(png, "Tool: scroll")
+
+    def test_interval_mode_rate_limits(self):
+        clock = FakeClock()
+        policy = CapturePolicy(CAPTURE_INTERVAL, min_interval=2.0, clock=clock)
+        buffer = ReplayBuffer(incremental_timelapse=False, capture_policy=policy)
+        assert buffer.capture_frame(_make_png((0, 0, 0)), "a")
+        clock.now = 1.0
+        assert not buffer.capture_frame(_make_png((255, 255, 255)), "b")
+        clock.now = 2.5
+        assert buffer.capture_frame(_make_png((0, 0, 0)), "c")
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            CapturePolicy("sometimes")
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("REPLAY_CAPTURE_MODE", CAPTURE_INTERVAL)
+        monkeypatch.setenv("REPLAY_MIN_INTERVAL", "5")
+        policy = CapturePolicy.from_env()
+        assert policy.mode == CAPTURE_INTERVAL
+        assert policy.min_interval == 5.0
+
+    def test_from_env_defaults_to_every_step(self, monkeypatch):
+        monkeypatch.delenv("REPLAY_CAPTURE_MODE", raising=False)
+        assert CapturePolicy.from_env().mode == CAPTURE_EVERY_STEP
+
+
+class TestThumbnails:
+    def test_thumbnail_bytes_are_a_small_jpeg(self):
+        jpeg = ReplayBuffer.make_thumbnail_bytes(_make_png())
+        assert jpeg[:2] == b"\xff\xd8"
+        assert Image.open(io.BytesIO(jpeg)).size == (160, 90)
+
+    def test_base64_thumbnail_matches_bytes(self):
+        png = _make_png(text_box=(100, 100, 400, 300))
+        jpeg = ReplayBuffer.make_thumbnail_bytes(png)
+        assert base64.b64decode(ReplayBuffer.make_thumbnail(png)) == jpeg
+        assert len(jpeg) < len(ReplayBuffer.make_thumbnail(png))
+
+
+class TestManifest:
+    def _buffer_with_frames(self, count):
+        buffer = ReplayBuffer(incremental_timelapse=False)
+        for i in range(count):
+            buffer.capture_frame(_make_png((i * 20, 0, 0)), "Tool: click")
+        return buffer
+
+    def test_frames_are_compact_records(self):
+        buffer = self._buffer_with_frames(2)
+        first, second = buffer._frames
+        assert isinstance(first, ReplayFrame)
+        assert not hasattr(first, "__dict__")
+        assert isinstance(first.timestamp, float)
+        assert first.timestamp <= second.timestamp
+        assert first.action is second.action
+
+    def test_serialize_manifest(self):
+        buffer = self._buffer_with_frames(3)
+        data = serialize_manifest(
+            "sess", "agent", buffer._frames, "http://host/replays", buffer._started_at
+        )
+        manifest = json.loads(data)
+        assert manifest["sessionId"] == "sess"
+        assert manifest["frameCount"] == 3
+        assert manifest["frames"][2]["url"] == "http://host/replays/frame-0002.jpg"
+        assert manifest["frames"][0]["action"] == "Tool: click"
+        # ISO-8601 with UTC offset, as the frontend expects
+        assert datetime.fromisoformat(manifest["frames"][0]["timestamp"]).tzinfo is not None
+
+    def test_serialize_manifest_gzip(self):
+        buffer = self._buffer_with_frames(2)
+        args = ("sess", "agent", buffer._frames, "http://host", buffer._started_at)
+        plain = serialize_manifest(*args)
+        assert gzip.decompress(serialize_manifest(*args, compress=True)) == plain
+
+    def test_save_local_writes_frames_and_manifest(self, tmp_path):
+        buffer = self._buffer_with_frames(2)
+        manifest_url, frame_count = buffer.save_local("sess", "agent", str(tmp_path), "http://host/serve")
+
+        out_dir = tmp_path / "sess" / "agent"
+        assert manifest_url == "http://host/serve/sess/agent/manifest.json"
+        assert frame_count == 2
+        assert (out_dir / "frame-0001.jpg").exists()
+        assert (out_dir / "timelapse.gif").exists()
+        manifest = json.loads((out_dir / "manifest.json").read_text())
+        assert [f["index"] for f in manifest["frames"]] == [0, 1]
@@ -0,0 +1,251 @@
+"""
+Tests for the in-sandbox screen daemon and the worker-side HelperCapture
+(the daemon runs locally on synthetic frames; no sandbox).
+"""
+
+import base64
+import io
+import json
+import threading
+import time
+
+from PIL import Image
+
+import screen_daemon
+from sandbox_helper import HelperCapture
+from screen_daemon import ScreenWatcher, changed_box, encode_png, parse_ppm
+
+W, H = 64, 36
+
+
+def _rgb(color=(20, 40, 60), box=None, box_color=(255, 255, 255)) -> bytes:
+    img = Image.new("RGB", (W, H), color)
+    if box:
+        img.paste(box_color, box)
+    return img.tobytes()
+
+
+class FakeScreen:
+    """Capture function for ScreenWatcher backed by a settable frame."""
+
+    def __init__(self):
+        self.rgb = _rgb()
+
+    def __call__(self):
+        return W, H, self.rgb
+
+    def jpeg(self, quality, scale):
+        """Stands in for scrot_jpeg: the current screen as a (scaled) JPEG."""
+        img = Image.frombytes("RGB", (W, H), self.rgb)
+        if scale < 1:
+            img = img.resize((round(W * scale), round(H * scale)))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LocalHelper:
+    """SandboxHelper stand-in that calls the watcher directly (JSON round-trip kept)."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self.requests = 0
+
+    def request(self, payload):
+        self.requests += 1
+        return json.loads(json.dumps(self.watcher.handle(payload)))
+
+
+def _jpeg(rgb: bytes) -> bytes:
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (W, H), rgb).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+class TestDaemonHelpers:
+    def test_parse_ppm(self):
+        data = b"P6\n# scrot\n2 1\n255\n" + bytes([1, 2, 3, 4, 5, 6])
+        assert parse_ppm(data) == (2, 1, bytes([1, 2, 3, 4, 5, 6]))
+
+    def test_png_round_trip(self):
+        rgb = _rgb(box=(3, 4, 10, 9))
+        img = Image.open(io.BytesIO(encode_png(W, H, rgb)))
+        assert img.size == (W, H) and img.tobytes() == rgb
+
+    def test_changed_box(self):
+        old, new = _rgb(), _rgb(box=(20, 5, 30, 12))
+        x0, y0, x1, y1 = changed_box(W, H, old, new)
+        assert (y0, y1) == (5, 12)
+        assert x0 <= 20 and x1 >= 30  # chunk-aligned
+        assert changed_box(W, H, old, old) is None
+
+
+class TestScreenWatcher:
+    def test_observe_reports_unchanged_region_and_full(self):
+        screen, clock = FakeScreen(), FakeClock()
+        watcher = ScreenWatcher(screen, clock)
+        watcher.poll()
+        clock.now = 1.0
+        first = watcher.observe(None, stable_ms=300)
+        assert first["status"] == "full" and first["settled"]
+
+        assert watcher.observe(first["hash"])["status"] == "unchanged"
+
+        screen.rgb = _rgb(box=(20, 5, 30, 12))
+        watcher.poll()
+        clock.now = 2.0
+        region = watcher.observe(first["hash"])
+        assert region["status"] == "region"
+        patch = Image.open(io.BytesIO(base64.b64decode(region["png"])))
+        x0, y0, x1, y1 = region["box"]
+        assert patch.size == (x1 - x0, y1 - y0)
+
+        screen.rgb = _rgb(color=(200, 0, 0))
+        watcher.poll()
+        clock.now = 3.0
+        assert watcher.observe(region["hash"])["status"] == "full"
+
+    def test_observe_waits_for_the_screen_to_settle(self):
+        screen = FakeScreen()
+        watcher = ScreenWatcher(screen)
+        watcher.poll()
+
+        def animate():
+            for shade in range(0, 200, 40):
+                screen.rgb = _rgb(color=(shade, shade, shade))
+                watcher.poll()
+                time.sleep(0.02)
+
+        thread = threading.Thread(target=animate)
+        thread.start()
+        started = time.monotonic()
+        result = watcher.observe(None, stable_ms=80, timeout_ms=2000)
+        thread.join()
+        assert result["settled"]
+        assert time.monotonic() - started >= 0.08
+        assert result["hash"] == watcher.current_hash
+
+    def test_frame_op_returns_a_jpeg_at_the_requested_scale(self):
+        screen = FakeScreen()
+        watcher = ScreenWatcher(screen, capture_jpeg=screen.jpeg)
+        watcher.poll()
+        response = watcher.handle({"op": "frame", "quality": 60, "scale": 0.5})
+        frame = Image.open(io.BytesIO(base64.b64decode(response["jpeg"])))
+        assert response["hash"] == watcher.current_hash
+        assert frame.format == "JPEG" and frame.size == (W // 2, H // 2)
+
+    def test_full_frames_are_jpeg_and_only_sent_for_full_answers(self):
+        screen, clock = FakeScreen(), FakeClock()
+        grabs = []
+
+        def capture_jpeg(quality, scale):
+            grabs.append((quality, scale))
+            return screen.jpeg(quality, scale)
+
+        watcher = ScreenWatcher(screen, clock, capture_jpeg=capture_jpeg)
+        watcher.poll()
+        clock.now = 1.0
+        first = watcher.observe(None, stable_ms=0, full_frame=True, quality=60)
+        assert "png" not in first
+        assert base64.b64decode(first["jpeg"])[:2] == b"\xff\xd8"
+
+        screen.rgb = _rgb(box=(20, 5, 30, 12))
+        watcher.poll()
+        region = watcher.observe(first["hash"], stable_ms=0, full_frame=True)
+        assert region["status"] == "region" and "jpeg" not in region
+        assert grabs == [(60, 1.0)]
+
+    def test_idle_watcher_backs_off_and_refreshes_on_request(self):
+        screen, clock = FakeScreen(), FakeClock()
+        watcher = ScreenWatcher(screen, clock)
+        watcher.poll()
+        clock.now = screen_daemon.IDLE_AFTER_SECONDS + 1
+        assert watcher.idle
+
+        screen.rgb = _rgb(box=(20, 5, 30, 12))  # changed while nobody polled
+        result = watcher.handle({"op": "observe", "since": None, "stableMs": 0})
+
+        assert not watcher.idle
+        assert watcher._wake.is_set()  # the poll loop returns to the fast rate
+        assert result["hash"] == watcher.current_hash
+        assert watcher.frames[result["hash"]] == screen.rgb
+
+    def test_serve_and_request_over_unix_socket(self, tmp_path):
+        watcher = ScreenWatcher(FakeScreen())
+        path = str(tmp_path / "screen.sock")
+        threading.Thread(target=screen_daemon.serve, args=(watcher, path), daemon=True).start()
+        for _ in range(50):
+            try:
+                response = json.loads(screen_daemon.request(json.dumps({"op": "hash"}), path))
+                break
+            except OSError:
+                time.sleep(0.02)
+        assert response["hash"]
+        bad = json.loads(screen_daemon.request(json.dumps({"op": "nope"}), path))
+        assert "error" in bad
+
+
+class TestHelperCapture:
+    def test_transfers_only_what_changed(self):
+        screen, clock = FakeScreen(), FakeClock()
+        watcher = ScreenWatcher(screen, clock, capture_jpeg=screen.jpeg)
+        full_captures = []
+
+        def full_capture():
+            full_captures.append(1)
+            return _jpeg(screen.rgb)
+
+        capture = HelperCapture(LocalHelper(watcher), full_capture, stable_ms=0)
+        watcher.poll()
+        first = capture()
+        assert capture() is first  # unchanged: reused without any transfer
+
+        screen.rgb = _rgb(box=(20, 5, 30, 12))
+        watcher.poll()
+        patched = Image.open(io.BytesIO(capture())).convert("RGB")
+        assert patched.getpixel((25, 8))[0] > 200  # the new white box was patched in
+        assert full_captures == []  # the daemon sent the full frame itself
+        assert capture.stats == {
+            "unchanged": 1, "region": 1, "full": 1,
+            "regionBytes": capture.stats["regionBytes"], "unsettled": 0,
+        }
+
+    def test_full_frame_comes_with_its_own_hash(self):
+        screen, clock = FakeScreen(), FakeClock()
+        watcher = ScreenWatcher(screen, clock, capture_jpeg=screen.jpeg)
+        helper = LocalHelper(watcher)
+
+        def full_capture():
+            raise AssertionError("no separate capture expected")
+
+        capture = HelperCapture(helper, full_capture, stable_ms=0, scale=0.5)
+        watcher.poll()
+        first = Image.open(io.BytesIO(capture()))
+        # The screen changes right after the observe: the frame and its hash
+        # still describe the same moment, so the next step sees the change
+        screen.rgb = _rgb(box=(20, 5, 30, 12))
+        watcher.poll()
+        patched = Image.open(io.BytesIO(capture())).convert("RGB")
+
+        assert first.size == (W // 2, H // 2)
+        assert patched.getpixel((12, 4))[0] > 200
+        assert helper.requests == 2
+        assert capture.stats["full"] == 1 and capture.stats["region"] == 1
+
+    def test_helper_failure_falls_back_to_full_captures(self):
+        class BrokenHelper:
+            def request(self, payload):
+                raise RuntimeError("daemon gone")
+
+        capture = HelperCapture(BrokenHelper(), lambda: b"full")
+        assert capture() == b"full"
+        assert not capture.enabled
+        assert capture() == b"full"
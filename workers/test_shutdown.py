@@ -0,0 +1,95 @@
+"""
+Tests for the deadline-bounded shutdown coordinator.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from shutdown import ShutdownCoordinator, in_daemon_thread
+
+
+def _step(log, name, delay=0.0, error=None):
+    async def run():
+        log.append(f"{name}:start")
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        log.append(f"{name}:end")
+    return run
+
+
+class TestShutdownCoordinator:
+    def test_independent_steps_run_concurrently(self):
+        log = []
+        shutdown = ShutdownCoordinator(deadline=5)
+        shutdown.add("replay", _step(log, "replay", 0.2))
+        shutdown.add("sandbox", _step(log, "sandbox", 0.2))
+
+        start = time.perf_counter()
+        report = asyncio.run(shutdown.run())
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.35  # not 0.4 in sequence
+        assert sorted(report["completed"]) == ["replay", "sandbox"]
+        assert report["missed"] == [] and report["failed"] == {}
+
+    def test_dependencies_run_first_even_if_they_fail(self):
+        log = []
+        shutdown = ShutdownCoordinator(deadline=5)
+        shutdown.add("replay", _step(log, "replay", 0.05, error=RuntimeError("upload failed")))
+        shutdown.add("journal", _step(log, "journal"), after=("replay",))
+
+        report = asyncio.run(shutdown.run())
+
+        assert log == ["replay:start", "journal:start", "journal:end"]
+        assert report["failed"] == {"replay": "upload failed"}
+        assert report["completed"] == ["journal"]
+
+    def test_deadline_reports_missed_steps(self):
+        log = []
+        shutdown = ShutdownCoordinator(deadline=0.1)
+        shutdown.add("sandbox", _step(log, "sandbox"))
+        shutdown.add("replay", _step(log, "replay", 10))
+        shutdown.add("journal", _step(log, "journal"), after=("replay",))
+
+        start = time.perf_counter()
+        report = asyncio.run(shutdown.run())
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.3
+        assert report["completed"] == ["sandbox"]
+        assert report["missed"] == ["replay", "journal"]
+        assert "journal:start" not in log
+
+    def test_unknown_dependency_is_rejected(self):
+        shutdown = ShutdownCoordinator()
+        with pytest.raises(ValueError):
+            shutdown.add("journal", _step([], "journal"), after=("replay",))
+
+
+class TestDaemonThread:
+    def test_returns_result_and_raises_errors(self):
+        async def scenario():
+            assert await in_daemon_thread(sum, [1, 2, 3]) == 6
+            with pytest.raises(ZeroDivisionError):
+                await in_daemon_thread(lambda: 1 / 0)
+
+        asyncio.run(scenario())
+
+    def test_abandoned_thread_does_not_delay_exit(self):
+        async def scenario():
+            shutdown = ShutdownCoordinator(deadline=0.05)
+
+            async def encode_gif():
+                await in_daemon_thread(time.sleep, 5)
+
+            shutdown.add("replay", encode_gif)
+            return await shutdown.run()
+
+        start = time.perf_counter()
+        report = asyncio.run(scenario())
+
+        assert report["missed"] == ["replay"]
+        assert time.perf_counter() - start < 1
@@ -0,0 +1,41 @@
+"""
+Cold-start regression tests for worker.py.
+
+A worker process is spawned per agent, so importing worker must stay cheap:
+heavy SDKs are loaded lazily / in a background thread by main().
+"""
+
+import subprocess
+import sys
+
+from startup_profile import WORKERS_DIR, import_time_seconds
+
+# Generous for CI noise; the lazy-import worker measures ~0.1 s locally
+# versus ~1.2 s when the SDKs were imported at module load.
+IMPORT_BUDGET_SECONDS = 0.4
+
+HEAVY_MODULES = ["socketio", "e2b_desktop", "dedalus_labs", "imageio", "numpy", "mem0", "PIL"]
+
+
+def test_worker_import_skips_heavy_modules():
+    check = (
+        "import sys, worker; "
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=WORKERS_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+    assert out == "[]", f"heavy modules imported at worker import time: {out}"
+
+
+def test_worker_import_within_budget():
+    # Best of three to ride out a cold disk cache
+    elapsed = min(import_time_seconds("worker") for _ in range(3))
+    assert elapsed < IMPORT_BUDGET_SECONDS, (
+        f"worker import took {elapsed:.3f}s (budget {IMPORT_BUDGET_SECONDS}s); "
+        "run `python startup_profile.py` to see what got slower"
+    )
@@ -0,0 +1,110 @@
+"""
+Tests for token/cost accounting and budgets.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import e2b_tools
+import worker
+from conftest import FakeClient, FakeFeed
+from usage import SESSION_SCOPE, TASK_SCOPE, UsageMeter, estimate_cost, parse_usage
+
+SONNET = "anthropic/claude-sonnet-4-5-20250929"
+
+
+def clicking_client() -> FakeClient:
+    """Always clicks somewhere new; every call reports 100k input and 1k output tokens."""
+    return FakeClient(
+        tool=lambda call: ("click", {"x": call, "y": 1}),
+        usage=SimpleNamespace(prompt_tokens=100_000, completion_tokens=1_000, prompt_tokens_details=None),
+    )
+
+
+class TestParseUsage:
+    def test_openai_format_splits_out_cached_tokens(self):
+        usage = {"prompt_tokens": 1200, "completion_tokens": 80, "prompt_tokens_details": {"cached_tokens": 1000}}
+        assert parse_usage(usage) == {"input": 200, "output": 80, "cacheRead": 1000, "cacheWrite": 0}
+
+    def test_anthropic_format(self):
+        usage = SimpleNamespace(
+            input_tokens=300, output_tokens=50, cache_read_input_tokens=900, cache_creation_input_tokens=40
+        )
+        assert parse_usage(usage) == {"input": 300, "output": 50, "cacheRead": 900, "cacheWrite": 40}
+
+    def test_missing_usage_counts_nothing(self):
+        assert parse_usage(None)["input"] == 0
+
+    def test_cost_estimate(self):
+        tokens = {"input": 1_000_000, "output": 100_000, "cacheRead": 0, "cacheWrite": 0}
+        assert estimate_cost(SONNET, tokens) == pytest.approx(3.0 + 1.5)
+
+
+class TestBudgets:
+    def test_totals_and_budget_scopes(self):
+        meter = UsageMeter(task_budget=0.5, session_budget=1.0)
+        meter.start_task()
+        step = meter.record(SONNET, {"input_tokens": 100_000, "output_tokens": 1_000}, image_bytes=5000)
+        assert step["costUsd"] == pytest.approx(0.315)
+        assert meter.exceeded() is None
+        meter.record(SONNET, {"input_tokens": 100_000, "output_tokens": 1_000})
+        assert meter.exceeded() == TASK_SCOPE
+        meter.extend(TASK_SCOPE)
+        assert meter.exceeded() is None
+
+        meter.start_task()
+        assert meter.task["calls"] == 0
+        assert meter.session_summary()["imageBytes"] == 5000
+        meter.record(SONNET, {"input_tokens": 200_000, "output_tokens": 2_000})
+        assert meter.exceeded() == SESSION_SCOPE
+
+    def test_unknown_action_rejected(self):
+        with pytest.raises(ValueError):
+            UsageMeter(budget_action="panic")
+
+
+class TestAgentLoopBudget:
+    def test_loop_stops_when_task_budget_is_spent(self, monkeypatch, changing_feed):
+        monkeypatch.setattr(e2b_tools, "execute_tool", lambda name, args: "Clicked")
+        client = clicking_client()
+        meter = UsageMeter(task_budget=1.0)  # ~$0.315 per step
+
+        result = asyncio.run(worker.run_agent_loop(client, "Click around", changing_feed, usage=meter))
+
+        assert result.startswith("(stopped: task budget")
+        assert client.calls == 4
+        assert meter.task_summary()["calls"] == 4
+        assert meter.task["imageBytes"] > 0
+
+    def test_image_bytes_count_every_screenshot_in_the_request(self, monkeypatch):
+        monkeypatch.setattr(e2b_tools, "execute_tool", lambda name, args: "Clicked")
+        jpeg = b"\xff\xd8" + b"x" * 1000
+
+        class JpegFeed(FakeFeed):
+            async def capture(self, label=None):
+                return jpeg
+
+        meter = UsageMeter(task_budget=1.0)  # stops after 4 calls
+        asyncio.run(worker.run_agent_loop(clicking_client(), "Click around", JpegFeed(), usage=meter))
+
+        # Call k re-sends the k screenshots taken so far
+        assert meter.task["imageBytes"] == len(jpeg) * (1 + 2 + 3 + 4)
+
+    def test_loop_checkpoints_and_continues_with_more_budget(self, monkeypatch, changing_feed):
+        monkeypatch.setattr(e2b_tools, "execute_tool", lambda name, args: "Clicked")
+        client = clicking_client()
+        meter = UsageMeter(task_budget=1.0)
+        checkpoints = []
+
+        async def on_checkpoint(step, raw_png, reason="interval", scope="task"):
+            checkpoints.append((step, reason))
+            return "continue" if len(checkpoints) == 1 else "terminated"
+
+        result = asyncio.run(worker.run_agent_loop(
+            client, "Click around", changing_feed, usage=meter, on_checkpoint=on_checkpoint,
+        ))
+
+        assert checkpoints == [(4, "budget"), (7, "budget")]
+        assert result == "(terminated by user at budget checkpoint)"
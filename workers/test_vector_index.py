@@ -0,0 +1,114 @@
+"""
+Tests for the local vector index memory backend (fake embedder, no model download).
+"""
+
+import hashlib
+
+import numpy as np
+
+from memory import MEMORY_BACKEND_LOCAL, MemoryManager
+from vector_index import LocalVectorMemory
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words embedder: texts sharing words score higher."""
+
+    def embed(self, text, memory_action=None):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+        return vector.tolist()
+
+
+def _memory(tmp_path):
+    return LocalVectorMemory(str(tmp_path), embedder=HashEmbedder(), dims=64)
+
+
+class TestLocalVectorMemory:
+    def test_add_and_search_ranks_by_similarity(self, tmp_path):
+        mem = _memory(tmp_path)
+        mem.add(["prefers aisle seats on flights", "uses vim keybindings", "lives in boston"], user_id="u1")
+
+        results = mem.search("book flights with aisle seats", user_id="u1", limit=2)["results"]
+
+        assert len(results) == 2
+        assert results[0]["memory"] == "prefers aisle seats on flights"
+        assert results[0]["score"] >= results[1]["score"]
+
+    def test_users_are_isolated(self, tmp_path):
+        mem = _memory(tmp_path)
+        mem.add("likes dark mode", user_id="u1")
+        assert mem.search("dark mode", user_id="u2")["results"] == []
+
+    def test_duplicate_adds_are_skipped(self, tmp_path):
+        mem = _memory(tmp_path)
+        assert len(mem.add("likes dark mode", user_id="u1")["results"]) == 1
+        assert mem.add("likes dark mode", user_id="u1")["results"] == []
+
+    def test_persists_across_instances(self, tmp_path):
+        _memory(tmp_path).add("works at acme corp", user_id="u1")
+        results = _memory(tmp_path).search("acme", user_id="u1")["results"]
+        assert [r["memory"] for r in results] == ["works at acme corp"]
+
+    def test_partial_append_is_ignored(self, tmp_path):
+        mem = _memory(tmp_path)
+        mem.add("first memory here", user_id="u1")
+        index = mem._index("u1")
+        # Simulate a crash after the vector write but before the log write
+        with index.vectors_path.open("ab") as f:
+            f.write(np.ones(64, dtype=np.float32).tobytes())
+        assert len(index) == 1
+
+    def test_append_after_torn_write_realigns_rows(self, tmp_path):
+        mem = _memory(tmp_path)
+        mem.add("prefers aisle seats on flights", user_id="u1")
+        index = mem._index("u1")
+        # Torn write: half a vector row, plus a text line with no vector
+        with index.vectors_path.open("ab") as f:
+            f.write(np.ones(32, dtype=np.float32).tobytes())
+        with index.log_path.open("a") as f:
+            f.write('{"id": "x", "memory": "orphan text", "created_at": 0}\n{"id": "y", "mem')
+
+        mem.add(["uses vim keybindings", "lives in boston"], user_id="u1")
+
+        index = _memory(tmp_path)._index("u1")
+        assert index.vectors_path.stat().st_size == 3 * 64 * 4
+        assert len(index) == 3
+        for query, expected in [
+            ("vim keybindings", "uses vim keybindings"),
+            ("boston", "lives in boston"),
+            ("aisle seats", "prefers aisle seats on flights"),
+        ]:
+            results = _memory(tmp_path).search(query, user_id="u1", limit=3)["results"]
+            assert results[0]["memory"] == expected
+            assert all(r["score"] <= 1.0 + 1e-5 for r in results)
+            assert "orphan text" not in [r["memory"] for r in results]
+
+
+    def test_reload_parses_only_new_log_lines(self, tmp_path):
+        writer, reader = _memory(tmp_path), _memory(tmp_path)
+        writer.add(["prefers aisle seats on flights", "uses vim keybindings"], user_id="u1")
+        index = reader._index("u1")
+        assert len(index) == 2
+
+        starts = []
+        read_log = index._read_log
+        index._read_log = lambda start: starts.append(start) or read_log(start)
+        loaded_log = index.log_path.stat().st_size
+        writer.add("lives in boston", user_id="u1")  # another process appends
+
+        assert reader.search("boston", user_id="u1", limit=1)["results"][0]["memory"] == "lives in boston"
+        assert starts == [loaded_log]
+        assert len(index) == 3
+
+class TestMemoryManagerLocalBackend:
+    def test_store_then_retrieve(self, tmp_path):
+        manager = MemoryManager(backend=MEMORY_BACKEND_LOCAL)
+        manager._memory = _memory(tmp_path)
+
+        manager.store_memories("u1", "Order pizza from Joe's", "Ordered a large margherita")
+        result = manager.retrieve_memories("u1", "order pizza")
+
+        assert "Order pizza from Joe's" in result
+        assert result.startswith("## User Memory")
+
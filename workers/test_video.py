@@ -0,0 +1,87 @@
+"""
+Tests for the video encoding module.
+"""
+
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+import video
+from test_gif import _build_frames
+from video import generate_video, generate_video_from_directory
+
+requires_backend = pytest.mark.skipif(
+    video.available_backend() is None, reason="no imageio video backend installed"
+)
+requires_pyav = pytest.mark.skipif(importlib.util.find_spec("av") is None, reason="PyAV not installed")
+
+
+class TestGenerateVideo:
+    @requires_backend
+    @pytest.mark.parametrize("ext", [".mp4", ".webm"])
+    def test_basic_generation(self, tmp_path, ext):
+        """Encode 10 synthetic frames into each supported container."""
+        output_path = str(tmp_path / f"test{ext}")
+
+        result = generate_video(_build_frames(10), output_path, fps=4, bitrate="100k")
+
+        assert result == output_path
+        assert os.path.getsize(output_path) > 0
+
+    def test_empty_frames_returns_none(self, tmp_path):
+        """Passing an empty frame list should return None."""
+        assert generate_video([], str(tmp_path / "empty.mp4")) is None
+
+    def test_unsupported_extension_returns_none(self, tmp_path):
+        """Only .mp4 and .webm outputs are accepted."""
+        assert generate_video(_build_frames(3), str(tmp_path / "out.avi")) is None
+
+    @requires_pyav
+    def test_pyav_backend_honours_bitrate(self, tmp_path):
+        """A higher target bitrate should give a larger file on noisy frames."""
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (180, 320, 3), dtype=np.uint8) for _ in range(20)]
+        sizes = []
+        for bitrate in ("50k", "2M"):
+            output_path = str(tmp_path / f"noise-{bitrate}.mp4")
+            video._write_pyav(images, output_path, "libx264", 5, bitrate)
+            sizes.append(os.path.getsize(output_path))
+        assert sizes[1] > 2 * sizes[0]
+
+    def test_parse_bitrate(self):
+        assert video._parse_bitrate("250k") == 250_000
+        assert video._parse_bitrate("1.5M") == 1_500_000
+        assert video._parse_bitrate("800000") == 800_000
+
+    def test_falls_back_to_gif_without_backend(self, tmp_path, monkeypatch):
+        """With no usable encoder the frames should be written as a GIF instead."""
+        monkeypatch.setattr(video, "_BACKENDS", [])
+
+        result = generate_video(_build_frames(5), str(tmp_path / "out.mp4"))
+
+        expected = str(tmp_path / "out.gif")
+        assert result == expected
+        assert os.path.exists(expected)
+
+
+class TestGenerateVideoFromDirectory:
+    def test_missing_directory_returns_none(self, tmp_path):
+        """A nonexistent directory should return None."""
+        result = generate_video_from_directory(str(tmp_path), "no-session", "no-agent")
+        assert result is None
+
+    @requires_backend
+    def test_from_directory(self, tmp_path):
+        """Write frames to disk, then generate a video from the directory."""
+        frame_dir = tmp_path / "sess-001" / "agent-001"
+        frame_dir.mkdir(parents=True)
+        for i, frame in enumerate(_build_frames(5)):
+            (frame_dir / f"frame-{str(i).zfill(4)}.jpg").write_bytes(frame["jpeg_bytes"])
+
+        result = generate_video_from_directory(str(tmp_path), "sess-001", "agent-001")
+
+        expected = str(frame_dir / "timelapse.mp4")
+        assert result == expected
+        assert os.path.exists(expected)
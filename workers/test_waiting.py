@@ -0,0 +1,148 @@
+"""
+Latency tests for the worker's event-driven waits.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from waiting import StepCancelled, ThreadCall, next_task, run_phase, wait_first, wait_for_resume
+
+# Generous bound for a loaded CI box; the old polling loops took 1-2 s
+MAX_WAKE_LATENCY = 0.05
+
+
+async def _latency(waiter, trigger, delay=0.05):
+    """Run `waiter`, fire `trigger` after `delay`, return (result, trigger-to-return seconds)."""
+    task = asyncio.create_task(waiter)
+    await asyncio.sleep(delay)
+    fired = time.perf_counter()
+    trigger()
+    result = await task
+    return result, time.perf_counter() - fired
+
+
+class TestWaitFirst:
+    def test_returns_first_and_cancels_the_rest(self):
+        async def scenario():
+            slow = asyncio.Event()
+            name, value = await wait_first(slow=slow.wait(), fast=asyncio.sleep(0, "hi"))
+            return name, value
+
+        assert asyncio.run(scenario()) == ("fast", "hi")
+
+    def test_cancelled_queue_get_does_not_lose_items(self):
+        async def scenario():
+            queue, terminated = asyncio.Queue(), asyncio.Event()
+            terminated.set()
+            assert await next_task(queue, terminated) is None
+            terminated.clear()
+            waiter = asyncio.create_task(next_task(queue, terminated))
+            await asyncio.sleep(0.01)
+            terminated.set()
+            assert await waiter is None
+            await queue.put({"taskId": "t1"})
+            terminated.clear()
+            return await next_task(queue, terminated)
+
+        assert asyncio.run(scenario()) == {"taskId": "t1"}
+
+
+class TestLatency:
+    def test_stop_to_exit(self):
+        async def scenario():
+            queue, terminated = asyncio.Queue(), asyncio.Event()
+            return await _latency(next_task(queue, terminated), terminated.set)
+
+        result, latency = asyncio.run(scenario())
+        assert result is None
+        assert latency < MAX_WAKE_LATENCY
+
+    def test_task_pickup(self):
+        async def scenario():
+            queue, terminated = asyncio.Queue(), asyncio.Event()
+            return await _latency(
+                next_task(queue, terminated), lambda: queue.put_nowait({"taskId": "t1"})
+            )
+
+        result, latency = asyncio.run(scenario())
+        assert result == {"taskId": "t1"}
+        assert latency < MAX_WAKE_LATENCY
+
+    def test_resume_to_next_step(self):
+        async def scenario():
+            resume, terminated = asyncio.Event(), asyncio.Event()
+            return await _latency(wait_for_resume(resume, terminated), resume.set)
+
+        result, latency = asyncio.run(scenario())
+        assert result == "continue"
+        assert latency < MAX_WAKE_LATENCY
+
+    def test_stop_during_checkpoint(self):
+        async def scenario():
+            resume, terminated = asyncio.Event(), asyncio.Event()
+            return await _latency(wait_for_resume(resume, terminated), terminated.set)
+
+        result, latency = asyncio.run(scenario())
+        assert result == "terminated"
+        assert latency < MAX_WAKE_LATENCY
+
+
+class TestRunPhase:
+    def test_returns_the_result(self):
+        async def scenario():
+            return await run_phase(asyncio.sleep(0, "ok"), asyncio.Event(), timeout=1)
+
+        assert asyncio.run(scenario()) == "ok"
+
+    def test_stop_cancels_the_work(self):
+        async def scenario():
+            terminated = asyncio.Event()
+            work = asyncio.ensure_future(asyncio.sleep(10))
+            with pytest.raises(StepCancelled):
+                await _latency(run_phase(work, terminated), terminated.set)
+            await asyncio.sleep(0)
+            return work.cancelled()
+
+        assert asyncio.run(scenario())
+
+    def test_already_terminated(self):
+        async def scenario():
+            terminated = asyncio.Event()
+            terminated.set()
+            await run_phase(asyncio.sleep(10), terminated)
+
+        with pytest.raises(StepCancelled):
+            asyncio.run(scenario())
+
+    def test_timeout(self):
+        async def scenario():
+            await run_phase(asyncio.sleep(10), asyncio.Event(), timeout=0.01)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(scenario())
+
+
+class TestThreadCall:
+    def test_abandoned_call_is_tracked_until_it_finishes(self):
+        async def scenario():
+            calls = ThreadCall("tool")
+            with pytest.raises(asyncio.TimeoutError):
+                await run_phase(calls.start(time.sleep, 0.2), asyncio.Event(), timeout=0.01)
+            still_running = calls.busy
+            gave_up = await calls.settle(timeout=0.01)
+            finished = await calls.settle(timeout=1)
+            return still_running, gave_up, finished, calls.busy
+
+        assert asyncio.run(scenario()) == (True, False, True, False)
+
+    def test_result_and_errors(self):
+        async def scenario():
+            calls = ThreadCall()
+            assert await calls.start(sum, [1, 2]) == 3
+            with pytest.raises(ZeroDivisionError):
+                await calls.start(lambda: 1 / 0)
+            assert await calls.settle(timeout=0)
+
+        asyncio.run(scenario())
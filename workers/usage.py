@@ -0,0 +1,166 @@
+"""
+Token and cost accounting for the agent loop.
+
+UsageMeter reads `response.usage` from every model call and keeps running
+totals (input, output and cached tokens, screenshot bytes sent, estimated
+USD cost, model calls) for the current task and for the whole session.
+Totals are reported in task:completed and the heartbeat.
+
+Budgets are optional (TASK_BUDGET_USD / SESSION_BUDGET_USD). When one is
+exceeded, the agent loop either checkpoints (Slack sessions: the user
+decides whether to continue, which grants one more budget's worth) or
+stops gracefully, as chosen by BUDGET_ACTION.
+
+Costs are estimates from MODEL_PRICES; unknown models are priced at
+DEFAULT_PRICES.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens: (input, output, cache read, cache write)
+MODEL_PRICES = {
+    "anthropic/claude-sonnet-4-5-20250929": (3.00, 15.00, 0.30, 3.75),
+    "anthropic/claude-haiku-4-5-20251001": (1.00, 5.00, 0.10, 1.25),
+}
+DEFAULT_PRICES = (3.00, 15.00, 0.30, 3.75)
+
+BUDGET_CHECKPOINT = "checkpoint"
+BUDGET_STOP = "stop"
+
+TASK_SCOPE = "task"
+SESSION_SCOPE = "session"
+
+
+def _get(obj, name: str, default=0):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def parse_usage(usage) -> dict:
+    """
+    Normalise an OpenAI- or Anthropic-style usage object to
+    {"input", "output", "cacheRead", "cacheWrite"} token counts.
+
+    "input" counts uncached input tokens only.
+    """
+    if usage is None:
+        return {"input": 0, "output": 0, "cacheRead": 0, "cacheWrite": 0}
+
+    if _get(usage, "prompt_tokens", None) is not None:
+        # OpenAI format: prompt_tokens includes the cached ones
+        cache_read = _get(_get(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+        return {
+            "input": (_get(usage, "prompt_tokens") or 0) - cache_read,
+            "output": _get(usage, "completion_tokens") or 0,
+            "cacheRead": cache_read,
+            "cacheWrite": _get(usage, "cache_creation_input_tokens") or 0,
+        }
+
+    return {
+        "input": _get(usage, "input_tokens") or 0,
+        "output": _get(usage, "output_tokens") or 0,
+        "cacheRead": _get(usage, "cache_read_input_tokens") or 0,
+        "cacheWrite": _get(usage, "cache_creation_input_tokens") or 0,
+    }
+
+
+def estimate_cost(model: str, tokens: dict) -> float:
+    input_price, output_price, read_price, write_price = MODEL_PRICES.get(model, DEFAULT_PRICES)
+    return (
+        tokens["input"] * input_price
+        + tokens["output"] * output_price
+        + tokens["cacheRead"] * read_price
+        + tokens["cacheWrite"] * write_price
+    ) / 1_000_000
+
+
+def _empty_totals() -> dict:
+    return {
+        "calls": 0,
+        "inputTokens": 0,
+        "outputTokens": 0,
+        "cachedTokens": 0,
+        "cacheWriteTokens": 0,
+        "imageBytes": 0,
+        "costUsd": 0.0,
+    }
+
+
+class UsageMeter:
+    def __init__(
+        self,
+        task_budget: float | None = None,
+        session_budget: float | None = None,
+        budget_action: str = BUDGET_CHECKPOINT,
+    ):
+        if budget_action not in (BUDGET_CHECKPOINT, BUDGET_STOP):
+            raise ValueError(f"Unknown budget action: {budget_action}")
+        self.budget_action = budget_action
+        self._base_budgets = {TASK_SCOPE: task_budget, SESSION_SCOPE: session_budget}
+        self._budgets = dict(self._base_budgets)
+        self.task = _empty_totals()
+        self.session = _empty_totals()
+
+    @classmethod
+    def from_env(cls) -> "UsageMeter":
+        """Budgets from TASK_BUDGET_USD / SESSION_BUDGET_USD (unset = unlimited),
+        action from BUDGET_ACTION ("checkpoint" or "stop")."""
+        def budget(name):
+            value = os.environ.get(name)
+            return float(value) if value else None
+
+        return cls(
+            task_budget=budget("TASK_BUDGET_USD"),
+            session_budget=budget("SESSION_BUDGET_USD"),
+            budget_action=os.environ.get("BUDGET_ACTION", BUDGET_CHECKPOINT),
+        )
+
+    def start_task(self) -> None:
+        self.task = _empty_totals()
+        self._budgets[TASK_SCOPE] = self._base_budgets[TASK_SCOPE]
+
+    def record(self, model: str, usage, image_bytes: int = 0) -> dict:
+        """Account one model call; returns that call's token counts and cost."""
+        tokens = parse_usage(usage)
+        cost = estimate_cost(model, tokens)
+        for totals in (self.task, self.session):
+            totals["calls"] += 1
+            totals["inputTokens"] += tokens["input"]
+            totals["outputTokens"] += tokens["output"]
+            totals["cachedTokens"] += tokens["cacheRead"]
+            totals["cacheWriteTokens"] += tokens["cacheWrite"]
+            totals["imageBytes"] += image_bytes
+            totals["costUsd"] += cost
+        return {**tokens, "imageBytes": image_bytes, "costUsd": cost}
+
+    def exceeded(self) -> str | None:
+        """Return the scope ("session" or "task") whose budget is used up, if any."""
+        for scope, totals in ((SESSION_SCOPE, self.session), (TASK_SCOPE, self.task)):
+            budget = self._budgets[scope]
+            if budget is not None and totals["costUsd"] >= budget:
+                return scope
+        return None
+
+    def extend(self, scope: str) -> None:
+        """Grant `scope` another budget's worth (user chose to continue at a checkpoint)."""
+        self._budgets[scope] += self._base_budgets[scope]
+        logger.info("%s budget extended to $%.2f", scope.capitalize(), self._budgets[scope])
+
+    def budget(self, scope: str) -> float | None:
+        return self._budgets[scope]
+
+    @staticmethod
+    def _rounded(totals: dict) -> dict:
+        return {**totals, "costUsd": round(totals["costUsd"], 4)}
+
+    def task_summary(self) -> dict:
+        return self._rounded(self.task)
+
+    def session_summary(self) -> dict:
+        return self._rounded(self.session)
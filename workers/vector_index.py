@@ -0,0 +1,220 @@
+"""
+Lightweight local vector index for per-user memories.
+
+An alternative to Mem0 + file-based Qdrant for MemoryManager
+(MEMORY_BACKEND=local). Each user gets a directory holding:
+
+  - vectors.f32: float32 embedding rows, appended on write and
+                 memory-mapped for search
+  - log.jsonl:   append-only log of the memory texts, one line per row
+
+Search is a vectorised dot-product over the (unit-normalised) rows with an
+argpartition top-k — for a few thousand short memories per user this is
+sub-millisecond and needs nothing beyond numpy. There is no LLM fact
+extraction: each stored task/result pair becomes one memory.
+
+LocalVectorMemory mimics the parts of Mem0's Memory interface that
+MemoryManager uses (search/add/embedding_model), so retrieve_memories and
+store_memories work unchanged on either backend.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIMS = 384
+DUPLICATE_SIMILARITY = 0.97  # skip adds that are this close to an existing memory
+MAX_MEMORY_CHARS = 500
+
+
+class SentenceTransformerEmbedder:
+    """Lazy sentence-transformers embedder with Mem0's embed() signature."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def embed(self, text, memory_action=None) -> list[float]:
+        return self.model.encode(text, convert_to_numpy=True).tolist()
+
+
+class _UserIndex:
+    """Vectors + texts for one user, extended whenever the files grow.
+
+    Only rows present in both files are loaded. Loads parse just the log
+    lines past the last loaded row, so writes and reloads cost the size of
+    the new rows rather than the whole store.
+    """
+
+    def __init__(self, directory: Path, dims: int):
+        self.directory = directory
+        self.dims = dims
+        self.vectors_path = directory / "vectors.f32"
+        self.log_path = directory / "log.jsonl"
+        self._vectors: np.ndarray | None = None
+        self._texts: list[str] = []
+        self._log_end = 0  # byte offset just past the last loaded row's log line
+        self._loaded_size: tuple[int, int] | int = -1
+
+    def _read_log(self, start: int) -> list[tuple[str, int]]:
+        """(text, end offset) for each complete line of the text log after `start`."""
+        entries = []
+        if not self.log_path.exists():
+            return entries
+        offset = start
+        with self.log_path.open("rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final line
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entries.append((json.loads(line)["memory"], offset))
+                except (ValueError, KeyError):
+                    break
+        return entries
+
+    def _sizes(self) -> tuple[int, int]:
+        vectors = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        log = self.log_path.stat().st_size if self.log_path.exists() else 0
+        return vectors, log
+
+    def _load(self) -> None:
+        sizes = self._sizes()
+        if sizes == self._loaded_size:
+            return
+        row_bytes = 4 * self.dims
+        if sizes[0] < len(self._texts) * row_bytes or sizes[1] < self._log_end:
+            self._texts, self._log_end, self._vectors = [], 0, None  # files replaced or cut: start over
+        # A crash between the two appends can leave one file a row ahead;
+        # the next append() truncates it, meanwhile readers ignore the excess
+        new = self._read_log(self._log_end)[: sizes[0] // row_bytes - len(self._texts)]
+        if new:
+            self._texts.extend(text for text, _ in new)
+            self._log_end = new[-1][1]
+        rows = len(self._texts)
+        if self._vectors is None or len(self._vectors) != rows:
+            self._vectors = (
+                np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dims))
+                if rows else np.empty((0, self.dims), dtype=np.float32)
+            )
+        self._loaded_size = sizes
+
+    def _realign(self) -> None:
+        """Truncate both files to the rows they have in common (caller holds the lock).
+
+        Appending after a torn write would otherwise pair new vectors with
+        old texts, or read vectors from a byte offset inside a row.
+        """
+        self._load()
+        committed = (len(self._texts) * 4 * self.dims, self._log_end)
+        vector_size, log_size = self._loaded_size
+        if vector_size != committed[0]:
+            os.truncate(self.vectors_path, committed[0])
+        if log_size != committed[1]:
+            os.truncate(self.log_path, committed[1])
+        if (vector_size, log_size) != committed:
+            logger.warning(
+                "Repaired torn memory index in %s (%d rows kept)", self.directory, len(self._texts)
+            )
+            self._loaded_size = committed
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._texts)
+
+    def search(self, query: np.ndarray, limit: int) -> list[tuple[float, str]]:
+        self._load()
+        count = len(self._texts)
+        if not count:
+            return []
+        scores = self._vectors @ query
+        k = min(limit, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._texts[i]) for i in top]
+
+    def append(self, vectors: np.ndarray, texts: list[str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self.log_path.open("a") as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            try:
+                self._realign()
+                with self.vectors_path.open("ab") as f:
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                for text in texts:
+                    log.write(json.dumps({
+                        "id": str(uuid.uuid4()),
+                        "memory": text,
+                        "created_at": time.time(),
+                    }) + "\n")
+            finally:
+                fcntl.flock(log, fcntl.LOCK_UN)
+
+
+class LocalVectorMemory:
+    """Mem0-compatible memory store backed by per-user numpy indexes."""
+
+    def __init__(self, path: str, embedder=None, dims: int = EMBEDDING_DIMS):
+        self.path = Path(path)
+        self.dims = dims
+        self.embedding_model = embedder or SentenceTransformerEmbedder()
+        self._indexes: dict[str, _UserIndex] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, user_id: str) -> _UserIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                user_dir = hashlib.sha256(user_id.encode()).hexdigest()[:32]
+                index = _UserIndex(self.path / user_dir, self.dims)
+                self._indexes[user_id] = index
+            return index
+
+    def _embed(self, text: str, action: str) -> np.ndarray:
+        vector = np.asarray(self.embedding_model.embed(text, action), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> dict:
+        hits = self._index(user_id).search(self._embed(query, "search"), limit)
+        return {"results": [{"memory": text, "score": score} for score, text in hits]}
+
+    def add(self, messages, user_id: str) -> dict:
+        """Store each text in `messages` (a string or list of strings) as a memory."""
+        texts = [messages] if isinstance(messages, str) else list(messages)
+        index = self._index(user_id)
+        vectors, added = [], []
+        with self._lock:
+            for text in texts:
+                text = text[:MAX_MEMORY_CHARS]
+                vector = self._embed(text, "add")
+                hits = index.search(vector, 1)
+                if hits and hits[0][0] >= DUPLICATE_SIMILARITY:
+                    continue
+                vectors.append(vector)
+                added.append(text)
+            if added:
+                index.append(np.stack(vectors), added)
+        return {"results": [{"memory": text, "event": "ADD"} for text in added]}
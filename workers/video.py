@@ -0,0 +1,213 @@
+"""
+Video encoding module for replay frames.
+
+Converts captured replay frames (320x180 JPEG thumbnails) into an MP4 or
+WebM timelapse. Video keeps full colour, has no frame cap, and is much
+smaller than the equivalent GIF for long desktop sessions.
+
+Encoding goes through whichever codec backend imageio can load locally
+(imageio-ffmpeg or PyAV, see requirements-video.txt). When neither is
+available the frames are written as a GIF instead.
+"""
+
+import io
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FPS = 5
+DEFAULT_BITRATE = "250k"
+
+# Container extension -> ffmpeg codec name
+VIDEO_CODECS = {
+    ".mp4": "libx264",
+    ".webm": "libvpx-vp9",
+}
+
+
+def _decode_frames(frames: list[dict]) -> list[np.ndarray]:
+    """Decode replay frame JPEGs into RGB arrays with even dimensions (yuv420p)."""
+    images = []
+    for frame in frames:
+        img = Image.open(io.BytesIO(frame["jpeg_bytes"])).convert("RGB")
+        if img.width % 2 or img.height % 2:
+            img = img.crop((0, 0, img.width - img.width % 2, img.height - img.height % 2))
+        images.append(np.array(img))
+    return images
+
+
+def _write_ffmpeg(images, output_path: str, codec: str, fps: int, bitrate: str) -> None:
+    """Encode with the imageio-ffmpeg backend (honours bitrate)."""
+    import imageio.v2 as iio2
+    import imageio_ffmpeg  # noqa: F401 — fail fast if the backend is missing
+
+    writer = iio2.get_writer(
+        output_path,
+        format="FFMPEG",
+        mode="I",
+        fps=fps,
+        codec=codec,
+        bitrate=bitrate,
+        pixelformat="yuv420p",
+        macro_block_size=2,
+    )
+    try:
+        for image in images:
+            writer.append_data(image)
+    finally:
+        writer.close()
+
+
+def _parse_bitrate(bitrate: str) -> int:
+    """Bits per second for a bitrate in ffmpeg notation ("250k", "1.5M", "800000")."""
+    text = bitrate.strip()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def _write_pyav(images, output_path: str, codec: str, fps: int, bitrate: str) -> None:
+    """Encode with the PyAV backend (honours bitrate)."""
+    import av
+
+    height, width = images[0].shape[:2]
+    with av.open(output_path, "w") as container:
+        stream = container.add_stream(codec, rate=fps)
+        stream.width, stream.height = width, height
+        stream.pix_fmt = "yuv420p"
+        stream.bit_rate = _parse_bitrate(bitrate)
+        for image in images:
+            container.mux(stream.encode(av.VideoFrame.from_ndarray(image, format="rgb24")))
+        container.mux(stream.encode())  # flush buffered packets
+
+
+_BACKENDS = [
+    ("ffmpeg", _write_ffmpeg),
+    ("pyav", _write_pyav),
+]
+
+
+def available_backend() -> str | None:
+    """Return the name of the first importable video backend, or None."""
+    for name, module in (("ffmpeg", "imageio_ffmpeg"), ("pyav", "av")):
+        try:
+            __import__(module)
+            return name
+        except ImportError:
+            continue
+    return None
+
+
+def generate_video(
+    frames: list[dict],
+    output_path: str,
+    fps: int = DEFAULT_FPS,
+    bitrate: str = DEFAULT_BITRATE,
+) -> str | None:
+    """
+    Generate an MP4/WebM timelapse from a list of replay frames.
+
+    The container is chosen from the output_path extension (.mp4 or .webm).
+    If no video backend can encode it, a GIF is written next to it instead
+    (same name, .gif extension).
+
+    Args:
+        frames: List of frames from ReplayBuffer._frames (or equivalent dicts).
+        output_path: File path for the output video.
+        fps: Playback frame rate.
+        bitrate: Target bitrate in ffmpeg notation (e.g. "250k").
+
+    Returns:
+        The path actually written (video or fallback GIF), None on failure.
+    """
+    if not frames:
+        logger.warning("No frames provided for video generation")
+        return None
+
+    ext = Path(output_path).suffix.lower()
+    codec = VIDEO_CODECS.get(ext)
+    if codec is None:
+        logger.error("Unsupported video extension %r (expected .mp4 or .webm)", ext)
+        return None
+
+    try:
+        images = _decode_frames(frames)
+    except Exception as e:
+        logger.error("Video generation failed: %s", e)
+        return None
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    for name, write in _BACKENDS:
+        try:
+            write(images, output_path, codec, fps, bitrate)
+        except ImportError:
+            continue
+        except Exception as e:
+            logger.warning("Video backend %s failed: %s", name, e)
+            continue
+
+        file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+        logger.info(
+            "Video written to %s via %s (%d frames, %.2f MB)",
+            output_path, name, len(images), file_size_mb,
+        )
+        return output_path
+
+    from gif import generate_gif
+
+    gif_path = str(Path(output_path).with_suffix(".gif"))
+    logger.warning("No video encoder available; falling back to GIF at %s", gif_path)
+    return generate_gif(frames, gif_path)
+
+
+def generate_video_from_directory(
+    replay_dir: str,
+    session_id: str,
+    agent_id: str,
+    output_path: str | None = None,
+    fps: int = DEFAULT_FPS,
+    bitrate: str = DEFAULT_BITRATE,
+) -> str | None:
+    """
+    Read saved replay frames from disk and generate a timelapse video.
+
+    Frames are expected at: {replay_dir}/{session_id}/{agent_id}/frame-NNNN.jpg
+
+    Args:
+        replay_dir: Root replay directory.
+        session_id: Session identifier.
+        agent_id: Agent identifier.
+        output_path: Where to save the video. Defaults to
+                     {replay_dir}/{session_id}/{agent_id}/timelapse.mp4
+        fps: Playback frame rate.
+        bitrate: Target bitrate in ffmpeg notation.
+
+    Returns:
+        The path actually written (video or fallback GIF), None on failure.
+    """
+    frame_dir = Path(replay_dir) / session_id / agent_id
+
+    if not frame_dir.is_dir():
+        logger.error("Frame directory does not exist: %s", frame_dir)
+        return None
+
+    frame_files = sorted(frame_dir.glob("frame-*.jpg"))
+
+    if not frame_files:
+        logger.warning("No frame files found in %s", frame_dir)
+        return None
+
+    frames = [
+        {"jpeg_bytes": f.read_bytes(), "timestamp": "", "action": ""}
+        for f in frame_files
+    ]
+
+    if output_path is None:
+        output_path = str(frame_dir / "timelapse.mp4")
+
+    return generate_video(frames, output_path, fps=fps, bitrate=bitrate)
@@ -0,0 +1,118 @@
+"""
+Event-driven waits for the worker's idle points.
+
+The worker used to poll: the task loop woke every 2 s to check for
+termination, and checkpoints slept in 1 s steps until the user resumed.
+wait_first() instead waits on several awaitables at once and returns as
+soon as any of them completes, so task pickup, stop and resume are
+handled immediately and an idle worker does not wake up at all.
+
+run_phase() applies the same idea inside an agent step: a model call,
+retry backoff or tool execution is abandoned as soon as the session is
+stopped, and a per-phase timeout keeps a hung call from freezing the agent.
+An abandoned thread cannot be interrupted, though: ThreadCall remembers it
+so the next step (or the sandbox teardown) can wait for it to finish
+instead of acting on the desktop while it is still typing or clicking.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+
+class StepCancelled(Exception):
+    """The session was stopped while a step phase was in flight."""
+
+
+class ThreadCall:
+    """Runs blocking calls on daemon threads and tracks the latest one.
+
+    A call abandoned by run_phase keeps running; `busy` says so and
+    settle() waits for it. Daemon threads also mean a hung call does not
+    hold up interpreter exit.
+    """
+
+    def __init__(self, name: str = "call"):
+        self.name = name
+        self._future: concurrent.futures.Future | None = None
+
+    def start(self, fn, *args) -> asyncio.Future:
+        """Start `fn(*args)` on a new thread; await the result to wait for it."""
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+
+        def run():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=self.name, daemon=True).start()
+        self._future = future
+        return asyncio.wrap_future(future)
+
+    @property
+    def busy(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    async def settle(self, timeout: float | None = None) -> bool:
+        """Wait up to `timeout` seconds for the latest call; True once it has finished."""
+        if not self.busy:
+            return True
+        await asyncio.wait({asyncio.wrap_future(self._future)}, timeout=timeout)
+        return not self.busy
+
+
+async def wait_first(**waiters) -> tuple[str, object]:
+    """
+    Wait for whichever named awaitable completes first and cancel the rest.
+
+    Returns (name, result). If several complete in the same loop iteration,
+    the one passed first wins.
+    """
+    tasks = {name: asyncio.ensure_future(aw) for name, aw in waiters.items()}
+    try:
+        done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pending = [t for t in tasks.values() if not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    for name, task in tasks.items():
+        if task in done:
+            return name, task.result()
+    raise RuntimeError("wait_first() finished without a completed waiter")
+
+
+async def next_task(task_queue: asyncio.Queue, terminated: asyncio.Event) -> dict | None:
+    """Return the next queued task, or None once `terminated` is set."""
+    if terminated.is_set():
+        return None
+    name, value = await wait_first(terminated=terminated.wait(), task=task_queue.get())
+    return value if name == "task" else None
+
+
+async def wait_for_resume(resume: asyncio.Event, terminated: asyncio.Event) -> str:
+    """Block until the user resumes ("continue") or the session ends ("terminated")."""
+    name, _ = await wait_first(terminated=terminated.wait(), resume=resume.wait())
+    return "continue" if name == "resume" else "terminated"
+
+
+async def run_phase(aw, terminated: asyncio.Event | None = None, timeout: float | None = None):
+    """
+    Await `aw`, giving up as soon as `terminated` is set (StepCancelled) or
+    `timeout` seconds pass (asyncio.TimeoutError). The abandoned awaitable is
+    cancelled; work already handed to a thread keeps running in the background.
+    """
+    if terminated is not None and terminated.is_set():
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise StepCancelled()
+    work = asyncio.wait_for(aw, timeout)
+    if terminated is None:
+        return await work
+    name, result = await wait_first(work=work, terminated=terminated.wait())
+    if name == "terminated":
+        raise StepCancelled()
+    return result
@@ -1,21 +1,36 @@
 import asyncio
 import base64
+import importlib
 import json
 import logging
 import os
 import sys
+import threading
 import time
 from io import BytesIO
 
-import socketio
-from e2b_desktop import Sandbox
-from dedalus_labs import AsyncDedalus
-from PIL import Image
-
 sys.path.insert(0, os.path.dirname(__file__))
 import e2b_tools
-from memory import MemoryManager
-from replay import ReplayBuffer
+from health import LoopMonitor, StepProgress, rss_bytes
+from history import DataUrlCache, ImageRef, image_bytes, image_part, to_wire
+from http_clients import get_clients
+from idle_pause import IdlePauser
+from journal import StepJournal
+from memory import (
+    DEFAULT_SERVICE_SOCKET,
+    MemoryManager,
+    MemoryPrefetcher,
+    MemoryWriter,
+    RemoteMemoryManager,
+)
+from model_router import ModelRouter
+from outbox import EventOutbox
+from replay import CapturePolicy, ReplayBuffer
+from sandbox_helper import HelperCapture, SandboxHelper
+from screen_feed import ScreenFeed
+from shutdown import ShutdownCoordinator, in_daemon_thread
+from usage import BUDGET_CHECKPOINT, SESSION_SCOPE, TASK_SCOPE, UsageMeter
+from waiting import StepCancelled, ThreadCall, run_phase, wait_for_resume
 
 logger = logging.getLogger(__name__)
 
@@ -42,51 +57,94 @@ MAX_RETRIES = 3
 RETRY_BASE_DELAY = 2  # seconds
 HISTORY_KEEP_RECENT = 10  # number of recent screenshot/action exchanges to keep verbatim
 THUMBNAIL_INTERVAL_SECONDS = 10
+PANOPTICON_THUMBNAIL_SIZE = (300, 200)  # max size, aspect ratio kept
+PANOPTICON_THUMBNAIL_QUALITY = 60
 MIN_STEPS_BEFORE_DONE = 3  # agent must take at least this many actions before calling done
 CHECKPOINT_INTERVAL = 100  # Pause every N steps for user check-in (Slack only)
+# Per-phase step timeouts (seconds), so a hung sandbox or model call cannot freeze the agent
+CAPTURE_TIMEOUT = 30
+MODEL_TIMEOUT = 120  # per attempt; a timed-out attempt is retried
+TOOL_TIMEOUT = 60
+TOOL_SETTLE_TIMEOUT = 15  # seconds to let an abandoned tool call finish before the next step or teardown
+SHUTDOWN_FLUSH_TIMEOUT = 5.0  # seconds for the final events after the teardown steps
+
+# Heavy SDKs are not imported at module load. main() preloads them in a
+# background thread while socket.io connects, and each use site imports
+# lazily (a no-op once the preload has finished). See startup_profile.py.
+PRELOAD_MODULES = ("e2b_desktop", "dedalus_labs", "PIL.Image")
+
+
+def preload_modules(modules=PRELOAD_MODULES) -> threading.Thread:
+    """Import `modules` in a daemon thread and return it."""
+    def _load():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                logger.warning("Background import of %s failed: %s", name, e)
 
+    thread = threading.Thread(target=_load, name="preload-imports", daemon=True)
+    thread.start()
+    return thread
 
-def make_screenshot_message():
-    """Capture the desktop and return (message_dict, raw_png_bytes)."""
-    raw_bytes = e2b_tools.screenshot_raw_bytes()
 
-    # Compress PNG to JPEG for smaller API payloads (~500KB-1MB vs 2-8MB)
-    img = Image.open(BytesIO(raw_bytes))
-    jpeg_buf = BytesIO()
-    img.save(jpeg_buf, format="JPEG", quality=75)
-    jpeg_b64 = base64.b64encode(jpeg_buf.getvalue()).decode("utf-8")
+def make_screenshot_message(raw_bytes):
+    """Build the model's screenshot message from a screenshot capture."""
+    if raw_bytes[:2] == b"\xff\xd8":
+        # Already compressed inside the sandbox (e2b_tools.screenshot_compressed)
+        jpeg_bytes = raw_bytes
+    else:
+        from PIL import Image
 
+        # Compress PNG to JPEG for smaller API payloads (~500KB-1MB vs 2-8MB)
+        img = Image.open(BytesIO(raw_bytes))
+        jpeg_buf = BytesIO()
+        img.save(jpeg_buf, format="JPEG", quality=75)
+        jpeg_bytes = jpeg_buf.getvalue()
+
+    # The JPEG stays as bytes in the history; history.to_wire() builds the
+    # data URL when a request is sent
     msg = {
         "role": "user",
         "content": [
             {"type": "text", "text": "Here is the current screenshot of the desktop:"},
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{jpeg_b64}",
-                    "detail": "high",
-                },
-            },
+            image_part(ImageRef(jpeg_bytes, detail="high")),
             {"type": "text", "text": "What action should you take next?"},
         ],
     }
-    return msg, raw_bytes  # Still return raw PNG for replay buffer
+    return msg
+
 
+async def call_with_retry(client, terminated=None, attempt_timeout=None, attempts=None, **kwargs):
+    """Call client.chat.completions.create() with exponential backoff on failure.
 
-async def call_with_retry(client, **kwargs):
-    """Call client.chat.completions.create() with exponential backoff on failure."""
-    for attempt in range(MAX_RETRIES):
+    Makes up to `attempts` attempts (default MAX_RETRIES), each given
+    `attempt_timeout` seconds (default MODEL_TIMEOUT). Raises StepCancelled
+    as soon as `terminated` is set, whether during a call or a backoff sleep.
+    """
+    if attempt_timeout is None:
+        attempt_timeout = MODEL_TIMEOUT
+    if attempts is None:
+        attempts = MAX_RETRIES
+    for attempt in range(attempts):
         try:
-            return await client.chat.completions.create(**kwargs)
-        except Exception as e:
-            if attempt == MAX_RETRIES - 1:
-                raise
-            delay = RETRY_BASE_DELAY * (2 ** attempt)
-            logger.warning(
-                "API error (attempt %d/%d): %s — retrying in %ds",
-                attempt + 1, MAX_RETRIES, e, delay,
+            return await run_phase(
+                client.chat.completions.create(**kwargs), terminated, attempt_timeout
             )
-            await asyncio.sleep(delay)
+        except StepCancelled:
+            raise
+        except asyncio.TimeoutError:
+            error = RuntimeError(f"model call timed out after {attempt_timeout}s")
+        except Exception as e:
+            error = e
+        if attempt == attempts - 1:
+            raise error
+        delay = RETRY_BASE_DELAY * (2 ** attempt)
+        logger.warning(
+            "API error (attempt %d/%d): %s — retrying in %ds",
+            attempt + 1, attempts, error, delay,
+        )
+        await run_phase(asyncio.sleep(delay), terminated)
 
 
 def trim_message_history(messages):
@@ -113,7 +171,7 @@ def trim_message_history(messages):
     recent_part = body[len(body) - keep_count:]
 
     # Build a compact summary of old exchanges
-    summaries = []
+    summaries = []  # one "- tool(args)" / "  -> result" line each
     for msg in old_part:
         role = msg.get("role", "")
         if role == "assistant":
@@ -126,29 +184,64 @@ def trim_message_history(messages):
             if content:
                 summaries.append(f"  -> {content[:120]}")
 
-    summary_text = (
-        f"[History summary: you already performed {len(old_part) // exchange_size} "
+    messages[prefix_len:] = [
+        {"role": "user", "content": history_summary(len(old_part) // exchange_size, summaries)},
+    ] + recent_part
+
+
+def history_summary(action_count, summary_lines):
+    """The compact text that stands in for older exchanges in the history."""
+    return (
+        f"[History summary: you already performed {action_count} "
         f"actions on this task. Recent actions:\n"
-        + "\n".join(summaries[-20:])  # keep last 20 summary lines to stay compact
+        + "\n".join(summary_lines[-20:])  # keep last 20 summary lines to stay compact
         + "\n]"
     )
 
-    messages[prefix_len:] = [
-        {"role": "user", "content": summary_text},
-    ] + recent_part
+
+def summarize_steps(steps):
+    """Rebuild the history summary from step journal records (mid-task resume)."""
+    lines = []
+    for record in steps:
+        lines.append(f"- {record['tool']}({json.dumps(record['args'])})")
+        if record.get("result"):
+            lines.append(f"  -> {record['result'][:120]}")
+    return history_summary(len(steps), lines)
 
 
-async def run_agent_loop(client, task_description, whiteboard_content="", user_memories="", on_step=None, replay_buffer=None, terminated=None, on_screenshot=None, on_checkpoint=None):
+async def run_agent_loop(client, task_description, screen_feed, whiteboard_content="", user_memories="", on_step=None, terminated=None, on_checkpoint=None, journal=None, resume_steps=(), router=None, usage=None, progress=None, tool_thread=None):
     """
     Observe-think-act loop using Dedalus chat.completions.create().
 
     Each turn:
-      1. Take a screenshot -> inject as a user message (image_url)
+      1. Capture a screenshot through `screen_feed` (which also hands it to
+         the replay buffer and thumbnail emitter) -> inject as a user
+         message (image_url)
       2. Model sees the desktop and returns a tool call
       3. Execute the tool, loop back to 1
 
     Returns the final summary when the model calls 'done'.
-    If `terminated` (asyncio.Event) is set, exits early.
+    If `terminated` (asyncio.Event) is set, exits early: an in-flight
+    screenshot, model call (including retry backoff) or tool execution is
+    abandoned immediately and a step cut short mid-action is journaled as
+    cancelled. Each phase also has a timeout (CAPTURE_TIMEOUT, MODEL_TIMEOUT,
+    TOOL_TIMEOUT); a hung tool is reported to the model as an error.
+
+    Tools run through `tool_thread` (a ThreadCall, shared across tasks). A
+    tool call abandoned by a stop or a timeout keeps running in its thread,
+    so each step first waits up to TOOL_SETTLE_TIMEOUT for it before taking
+    its screenshot, and the worker does the same before pausing the sandbox.
+
+    Completed steps are written to `journal` (a StepJournal). `resume_steps`
+    are the journal records of a task interrupted by a worker crash: the
+    loop continues after the last of them, with the earlier steps folded
+    into a history summary.
+
+    `router` (a ModelRouter) picks the model per step; without one every
+    step goes to MODEL. `usage` (a UsageMeter) accounts tokens and cost per
+    call; when a budget runs out the loop checkpoints (if `on_checkpoint`
+    is set and the meter's action is "checkpoint") or stops. `progress` (a
+    StepProgress) is kept up to date with the current phase and step count.
     """
     system_content = SYSTEM_PROMPT
     if whiteboard_content:
@@ -165,119 +258,229 @@ async def run_agent_loop(client, task_description, whiteboard_content="", user_m
 
     last_action_label = "Starting task"
     no_tool_retries = 0
-    raw_png = None  # Track latest screenshot for checkpoint thumbnails
-
-    for step in range(MAX_STEPS):
-        # Check for termination between steps
-        if terminated is not None and terminated.is_set():
-            logger.info("Terminated during task at step %d", step)
-            return "(terminated by user)"
-
-        # Checkpoint: pause every CHECKPOINT_INTERVAL steps for Slack check-in
-        if on_checkpoint and step > 0 and step % CHECKPOINT_INTERVAL == 0:
-            result = await on_checkpoint(step, raw_png)
-            if result == "terminated":
-                return "(terminated by user at checkpoint)"
-
-        # Trim old exchanges to keep context window lean
-        trim_message_history(messages)
-
-        # Observe: take screenshot and show it to the model
-        screenshot_msg, raw_png = make_screenshot_message()
-        messages.append(screenshot_msg)
-
-        # Capture frame for replay
-        if replay_buffer is not None:
-            replay_buffer.capture_frame(raw_png, last_action_label)
-
-        # Emit thumbnail if callback provided
-        if on_screenshot is not None:
-            await on_screenshot(raw_png)
-
-        # Exclude the 'done' tool for the first few steps to prevent premature completion
-        if step < MIN_STEPS_BEFORE_DONE:
-            tools = [t for t in e2b_tools.TOOL_SCHEMAS if t["function"]["name"] != "done"]
-        else:
-            tools = e2b_tools.TOOL_SCHEMAS
-
-        response = await call_with_retry(
-            client,
-            model=MODEL,
-            messages=messages,
-            tools=tools,
-            tool_choice={"type": "any"},
-            max_tokens=2048,
-        )
+    url_cache = DataUrlCache()
+    start_step = 0
+    if router is not None:
+        router.start_task()
+    if usage is not None:
+        usage.start_task()
+
+    if resume_steps:
+        messages.append({"role": "user", "content": summarize_steps(resume_steps)})
+        start_step = resume_steps[-1]["step"]
+        last_action_label = f"Tool: {resume_steps[-1]['tool']}"
+        logger.info("Resuming task after step %d from the step journal", start_step)
+
+    if tool_thread is None:
+        tool_thread = ThreadCall("tool")
+    step = start_step
+    phase = "screenshot"
+    in_flight_call = None  # (name, args, reasoning) of the tool being executed
+
+    def enter_phase(name):
+        nonlocal phase
+        phase = name
+        if progress is not None:
+            progress.set_phase(name)
 
-        choice = response.choices[0]
-        msg = choice.message
-
-        # Append assistant response to history
-        messages.append(msg.to_dict() if hasattr(msg, "to_dict") else {
-            "role": "assistant",
-            "content": msg.content,
-            "tool_calls": [
-                {
-                    "id": tc.id,
-                    "type": "function",
-                    "function": {"name": tc.function.name, "arguments": tc.function.arguments},
-                }
-                for tc in (msg.tool_calls or [])
-            ],
-        })
+    try:
+        for step in range(start_step, MAX_STEPS):
+            # Check for termination between steps
+            if terminated is not None and terminated.is_set():
+                logger.info("Terminated during task at step %d", step)
+                return "(terminated by user)"
+
+            # Checkpoint: pause every CHECKPOINT_INTERVAL steps for Slack check-in
+            if on_checkpoint and step > 0 and step % CHECKPOINT_INTERVAL == 0:
+                enter_phase("checkpoint")
+                result = await on_checkpoint(step, screen_feed.latest)
+                if result == "terminated":
+                    return "(terminated by user at checkpoint)"
+
+            # Budget: checkpoint (Slack) or stop once the task/session budget is spent
+            scope = usage.exceeded() if usage is not None else None
+            if scope:
+                budget = usage.budget(scope)
+                logger.warning("%s budget of $%.2f exceeded at step %d", scope.capitalize(), budget, step)
+                if on_checkpoint and usage.budget_action == BUDGET_CHECKPOINT:
+                    enter_phase("checkpoint")
+                    result = await on_checkpoint(step, screen_feed.latest, reason="budget", scope=scope)
+                    if result == "terminated":
+                        return "(terminated by user at budget checkpoint)"
+                    usage.extend(scope)
+                else:
+                    return f"(stopped: {scope} budget of ${budget:.2f} exceeded)"
+
+            # Trim old exchanges to keep context window lean
+            trim_message_history(messages)
+
+            # An abandoned tool call may still be acting on the desktop
+            if tool_thread.busy:
+                enter_phase("settle")
+                if not await run_phase(tool_thread.settle(TOOL_SETTLE_TIMEOUT), terminated):
+                    logger.warning("Earlier tool call still running after %ds, continuing", TOOL_SETTLE_TIMEOUT)
+
+            # Observe: take screenshot (published to replay/thumbnails) and show it to the model
+            # A capture timeout propagates: the sandbox is treated as lost
+            enter_phase("screenshot")
+            raw_png = await run_phase(
+                screen_feed.capture(last_action_label), terminated, CAPTURE_TIMEOUT
+            )
+            screenshot_msg = make_screenshot_message(raw_png)
+            messages.append(screenshot_msg)
+            # Every screenshot still in the window is sent (and billed) again
+            request_image_bytes = sum(image_bytes(m) for m in messages)
+            if router is not None:
+                router.observe_screen(raw_png)
+
+            # Exclude the 'done' tool for the first few steps to prevent premature completion
+            if step < MIN_STEPS_BEFORE_DONE:
+                tools = [t for t in e2b_tools.TOOL_SCHEMAS if t["function"]["name"] != "done"]
+            else:
+                tools = e2b_tools.TOOL_SCHEMAS
+
+            request = {
+                "messages": to_wire(messages, url_cache),
+                "tools": tools,
+                "tool_choice": {"type": "any"},
+                "max_tokens": 2048,
+            }
+            model = router.choose(step) if router is not None else MODEL
+            enter_phase("model call")
+            started = time.monotonic()
+            step_cost = 0.0
+            reason = None
+            if router is not None and model != router.strong_model:
+                # One fast attempt: a failure falls back to the strong model
+                # instead of spending the retry backoff on the cheap one
+                try:
+                    response = await call_with_retry(
+                        client, terminated, attempts=1, model=model, **request
+                    )
+                except StepCancelled:
+                    raise
+                except Exception as e:
+                    logger.warning("Fast model call failed: %s", e)
+                    response, reason = None, "fast_error"
+            else:
+                response = await call_with_retry(client, terminated, model=model, **request)
+            if response is not None:
+                if usage is not None:
+                    step_cost += usage.record(model, getattr(response, "usage", None), request_image_bytes)["costUsd"]
+                if router is not None:
+                    router.record_call(model, time.monotonic() - started)
+                    tool_calls = response.choices[0].message.tool_calls
+                    fn = tool_calls[0].function if tool_calls else None
+                    reason = router.should_escalate(
+                        model, fn.name if fn else None, fn.arguments if fn else None
+                    )
+            if reason:
+                # Redo the step with the strong model
+                router.record_escalation(reason)
+                started = time.monotonic()
+                response = await call_with_retry(
+                    client, terminated, model=router.strong_model, **request
+                )
+                router.record_call(router.strong_model, time.monotonic() - started)
+                if usage is not None:
+                    step_cost += usage.record(
+                        router.strong_model, getattr(response, "usage", None), request_image_bytes
+                    )["costUsd"]
+            if usage is not None:
+                logger.info(
+                    "  Step %d cost ~$%.4f (task $%.4f)", step + 1, step_cost, usage.task["costUsd"]
+                )
 
-        # Extract reasoning from assistant message content (Claude's thinking)
-        reasoning = None
-        if msg.content:
-            if isinstance(msg.content, str):
-                reasoning = msg.content.strip() or None
-            elif isinstance(msg.content, list):
-                text_parts = [
-                    block.get("text", "") if isinstance(block, dict) else str(block)
-                    for block in msg.content
-                    if (isinstance(block, dict) and block.get("type") == "text") or isinstance(block, str)
-                ]
-                combined = " ".join(text_parts).strip()
-                reasoning = combined or None
-
-        if not msg.tool_calls:
-            no_tool_retries += 1
-            if no_tool_retries >= 3:
-                logger.error("Model returned no tool calls %d times, giving up", no_tool_retries)
-                return msg.content or "(model failed to call tools)"
-            # Model returned no tool calls despite tool_choice — retry
-            # This can happen if the streaming response is incomplete
-            logger.warning("No tool calls in response at step %d (retry %d/3)", step, no_tool_retries)
-            # Remove the assistant response and screenshot message (will re-add on next iteration)
-            messages.pop()  # assistant response
-            messages.pop()  # screenshot message
-            continue
-
-        # Got a valid tool call — reset retry counter
-        no_tool_retries = 0
-
-        # Execute the first tool call (one action per turn)
-        tc = msg.tool_calls[0]
-        name = tc.function.name
-        try:
-            args = json.loads(tc.function.arguments)
-        except json.JSONDecodeError:
-            args = {}
+            choice = response.choices[0]
+            msg = choice.message
+
+            # Append assistant response to history
+            messages.append(msg.to_dict() if hasattr(msg, "to_dict") else {
+                "role": "assistant",
+                "content": msg.content,
+                "tool_calls": [
+                    {
+                        "id": tc.id,
+                        "type": "function",
+                        "function": {"name": tc.function.name, "arguments": tc.function.arguments},
+                    }
+                    for tc in (msg.tool_calls or [])
+                ],
+            })
+
+            # Extract reasoning from assistant message content (Claude's thinking)
+            reasoning = None
+            if msg.content:
+                if isinstance(msg.content, str):
+                    reasoning = msg.content.strip() or None
+                elif isinstance(msg.content, list):
+                    text_parts = [
+                        block.get("text", "") if isinstance(block, dict) else str(block)
+                        for block in msg.content
+                        if (isinstance(block, dict) and block.get("type") == "text") or isinstance(block, str)
+                    ]
+                    combined = " ".join(text_parts).strip()
+                    reasoning = combined or None
+
+            if not msg.tool_calls:
+                no_tool_retries += 1
+                if no_tool_retries >= 3:
+                    logger.error("Model returned no tool calls %d times, giving up", no_tool_retries)
+                    return msg.content or "(model failed to call tools)"
+                # Model returned no tool calls despite tool_choice — retry
+                # This can happen if the streaming response is incomplete
+                logger.warning("No tool calls in response at step %d (retry %d/3)", step, no_tool_retries)
+                # Remove the assistant response and screenshot message (will re-add on next iteration)
+                messages.pop()  # assistant response
+                messages.pop()  # screenshot message
+                continue
 
-        if on_step:
-            await on_step(step + 1, name, args, reasoning)
+            # Got a valid tool call — reset retry counter
+            no_tool_retries = 0
 
-        last_action_label = f"Tool: {name}"
+            # Execute the first tool call (one action per turn)
+            tc = msg.tool_calls[0]
+            name = tc.function.name
+            try:
+                args = json.loads(tc.function.arguments)
+            except json.JSONDecodeError:
+                args = {}
 
-        result = e2b_tools.execute_tool(name, args)
+            if on_step:
+                await on_step(step + 1, name, args, reasoning)
 
-        # If done, return the summary
-        if name == "done":
-            messages.append({"role": "tool", "tool_call_id": tc.id, "content": result})
-            return result
+            last_action_label = f"Tool: {name}"
 
-        # Append tool result and continue
-        messages.append({"role": "tool", "tool_call_id": tc.id, "content": result})
+            enter_phase(f"tool {name}")
+            in_flight_call = (name, args, reasoning)
+            try:
+                result = await run_phase(
+                    tool_thread.start(e2b_tools.execute_tool, name, args), terminated, TOOL_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Tool %s timed out after %ds at step %d", name, TOOL_TIMEOUT, step + 1)
+                result = f"ERROR: {name} did not finish within {TOOL_TIMEOUT}s. Check the screen before retrying."
+            in_flight_call = None
+            if progress is not None:
+                progress.step_done()
+            if router is not None:
+                router.observe_action(name, args, result)
+            if journal is not None:
+                journal.record_step(step + 1, name, args, result, reasoning)
+
+            # If done, return the summary
+            if name == "done":
+                messages.append({"role": "tool", "tool_call_id": tc.id, "content": result})
+                return result
+
+            # Append tool result and continue
+            messages.append({"role": "tool", "tool_call_id": tc.id, "content": result})
+    except StepCancelled:
+        logger.info("Terminated during %s at step %d", phase, step + 1)
+        if in_flight_call is not None and journal is not None:
+            name, args, reasoning = in_flight_call
+            journal.record_step(step + 1, name, args, "(cancelled: session stopped)", reasoning)
+        return f"(terminated by user during {phase})"
 
     return "(max steps reached)"
 
@@ -293,24 +496,86 @@ async def main():
         format=f"[%(levelname)s] agent-{agent_id}: %(message)s",
     )
 
+    preload_modules()
+
     # --- Socket.io connection ---
+    import socketio
+
     sio = socketio.AsyncClient()
     await sio.connect(socket_url)
 
-    async def emit(event, data):
-        await sio.emit(event, {"sessionId": session_id, "agentId": agent_id, **data})
+    # All outbound events go through a queue drained by one sender task, so
+    # emitting never blocks the agent (see outbox.py)
+    # Offer binary thumbnail attachments and acknowledged delivery; the server
+    # confirms with agent:capabilities, otherwise thumbnails stay base64 and
+    # events are sent without acks
+    join_data = {"capabilities": {"binaryThumbnails": True, "acks": True}}
+    binary_thumbnails = False
+
+    @sio.on("agent:capabilities")
+    async def on_capabilities(data=None):
+        nonlocal binary_thumbnails
+        binary_thumbnails = bool((data or {}).get("binaryThumbnails"))
+        outbox.acks = bool((data or {}).get("acks"))
+        logger.info(
+            "Binary thumbnails %s, event acks %s",
+            "enabled" if binary_thumbnails else "disabled",
+            "enabled" if outbox.acks else "disabled",
+        )
+
+    def thumbnail_payload(jpeg_bytes: bytes) -> bytes | str:
+        """Raw bytes (sent as a socket.io attachment) if negotiated, else base64."""
+        if binary_thumbnails:
+            return jpeg_bytes
+        return base64.b64encode(jpeg_bytes).decode("utf-8")
+
+    outbox = EventOutbox(
+        sio,
+        {"sessionId": session_id, "agentId": agent_id},
+        hello="agent:join",
+        hello_data=join_data,
+    )
+    outbox.start()
+    emit = outbox.emit
 
     # Join session room
-    await emit("agent:join", {})
+    await emit("agent:join", join_data)
+
+    # Event-loop lag sampling; the watchdog logs the stack of code blocking the loop
+    loop_monitor = LoopMonitor.from_env()
+    loop_monitor_task = asyncio.create_task(loop_monitor.run())
+    progress = StepProgress()
+
+    # --- Memory manager (per-user, opt-in via ENABLE_MEMORY env var) ---
+    # Shared per-host memory service by default; MEMORY_SERVICE=false keeps Mem0 in-process
+    memory_mgr = None
+    if user_id and os.environ.get("ENABLE_MEMORY"):
+        if os.environ.get("MEMORY_SERVICE", "true").lower() == "true":
+            memory_mgr = RemoteMemoryManager(
+                os.environ.get("MEMORY_SERVICE_SOCKET", DEFAULT_SERVICE_SOCKET)
+            )
+        else:
+            memory_mgr = MemoryManager()
+    memory_writer = MemoryWriter(memory_mgr) if memory_mgr else None
+    memory_prefetcher = MemoryPrefetcher(memory_mgr, user_id) if memory_mgr else None
+    if memory_writer:
+        memory_writer.start()
 
     # --- Register event handlers BEFORE booting sandbox ---
     task_queue = asyncio.Queue()
     terminated = asyncio.Event()
     force_kill = False
+    idle_pauser = None  # set once the sandbox is up
 
     @sio.on("task:assign")
     async def on_task_assign(data):
         await task_queue.put(data)
+        # Start resuming an idle-paused sandbox now, overlapping memory retrieval
+        if idle_pauser is not None:
+            idle_pauser.prefetch()
+        # Start retrieving this task's memories while earlier tasks run
+        if memory_prefetcher:
+            memory_prefetcher.prefetch(data["description"])
 
     @sio.on("task:none")
     async def on_task_none(data=None):
@@ -333,7 +598,30 @@ async def main():
     async def on_checkpoint_resume(data=None):
         checkpoint_resume.set()
 
+    # Teardown shared by the normal exit and a failed sandbox boot
+    async def close_memory_writer():
+        # Flush queued memory writes
+        if memory_writer:
+            await memory_writer.close()
+
+    async def close_http_clients():
+        http_clients = get_clients()
+        logger.info("HTTP connections: %s", http_clients.summary())
+        await http_clients.close()
+
+    async def disconnect():
+        # Send everything still queued; priority events count as sent once
+        # the server acknowledges them
+        await outbox.close(timeout=SHUTDOWN_FLUSH_TIMEOUT)
+        logger.info("Outbound events: %s", outbox.stats)
+        logger.info("Event loop lag: %s", loop_monitor.lag_summary())
+        loop_monitor_task.cancel()
+        await asyncio.gather(loop_monitor_task, return_exceptions=True)
+        await sio.disconnect()
+
     # --- Boot or reconnect E2B sandbox ---
+    from e2b_desktop import Sandbox
+
     desktop = None
     reconnect_sandbox_id = os.environ.get("SANDBOX_ID")
     try:
@@ -357,97 +645,176 @@ async def main():
             await emit("agent:sandbox_expired", {})
         else:
             await emit("agent:error", {"error": str(e)})
-        await sio.disconnect()
+        shutdown = ShutdownCoordinator()
+        shutdown.add("memory", close_memory_writer)
+        shutdown.add("http", close_http_clients, after=("memory",))
+        logger.info("Shutdown steps: %s", await shutdown.run())
+        await disconnect()
         return
 
     # --- Init tools ---
     e2b_tools.init(desktop)
+    tool_thread = ThreadCall("tool")  # outlives an abandoned step, see run_agent_loop
+
+    # --- Optional in-sandbox screen helper: settle-waiting + changed-region transfer ---
+    capture = e2b_tools.screenshot_raw_bytes
+    if os.environ.get("SANDBOX_HELPER", "false").lower() == "true":
+        helper = SandboxHelper(desktop)
+        if await asyncio.to_thread(helper.start):
+            capture = HelperCapture(
+                helper,
+                e2b_tools.screenshot_raw_bytes,
+                scale=e2b_tools.capture_scale(),
+                quality=e2b_tools.SCREENSHOT_QUALITY,
+            )
 
     # --- Init Daedalus client ---
-    client = AsyncDedalus()
+    from dedalus_labs import AsyncDedalus
+
+    # Pooled keep-alive connections shared with the replay uploader
+    client = AsyncDedalus(http_client=get_clients().httpx_client())
+    router = ModelRouter.from_env(MODEL)
+    usage = UsageMeter.from_env()
 
     # --- Replay buffer ---
-    replay_buffer = ReplayBuffer()
     r2_public_url = os.environ.get("R2_PUBLIC_URL", "")
-    _last_thumbnail_time = 0.0
+    # The timelapse GIF is only written for local replays; R2 uploads skip it
+    replay_buffer = ReplayBuffer(
+        incremental_timelapse=not r2_public_url, capture_policy=CapturePolicy.from_env()
+    )
 
-    # --- Memory manager (per-user, opt-in via ENABLE_MEMORY env var) ---
-    memory_mgr = MemoryManager() if user_id and os.environ.get("ENABLE_MEMORY") else None
+    # --- Step journal: resume an interrupted task after a worker restart ---
+    journal = StepJournal.for_agent(session_id, agent_id)
+    if reconnect_sandbox_id:
+        journal_state = journal.load()
+        for record in journal_state.frames:
+            try:
+                replay_buffer.restore_frame(
+                    journal.read_frame(record), record["action"], record["capturedAt"]
+                )
+            except OSError as e:
+                logger.warning("Could not restore replay frame %s: %s", record["file"], e)
+        if journal_state.resumable:
+            logger.info(
+                "Step journal: task %s interrupted after %d step(s)",
+                journal_state.active_task["taskId"], len(journal_state.steps),
+            )
+    else:
+        # Fresh sandbox: nothing left from an old journal applies to it
+        journal.reset()
+        journal_state = journal.load()
+    resume_task = journal_state.active_task
+    handled_task_ids = set(journal_state.finished_task_ids)
 
     # --- Heartbeat background task ---
     async def heartbeat_loop():
         while not terminated.is_set():
-            try:
-                await emit("agent:heartbeat", {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
-            except Exception:
-                pass
+            await emit("agent:heartbeat", {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "outboxDepth": outbox.depth,
+                "outboxDropped": outbox.stats["dropped"],
+                "usage": usage.session_summary(),
+                "idlePause": idle_pauser.summary() if idle_pauser else None,
+                "health": {
+                    "loopLagMs": loop_monitor.lag_summary(),
+                    "rssBytes": rss_bytes(),
+                    "replayFrames": replay_buffer.frame_count,
+                    "replayBytes": replay_buffer.byte_size,
+                    **progress.snapshot(),
+                },
+            })
             await asyncio.sleep(30)
 
     heartbeat_task = asyncio.create_task(heartbeat_loop())
 
-    # --- Thumbnail generation for Panopticon ---
-    thumbnail_task = None
-
-    async def generate_thumbnails():
-        """Periodically capture and emit thumbnail screenshots for Panopticon."""
-        while not terminated.is_set():
-            try:
-                # Take screenshot for thumbnail
-                raw_bytes = e2b_tools.screenshot_raw_bytes()
-
-                # Create smaller thumbnail (300x200 max)
-                img = Image.open(BytesIO(raw_bytes))
-                img.thumbnail((300, 200), Image.Resampling.LANCZOS)
-
-                # Convert to JPEG and base64
-                thumbnail_buf = BytesIO()
-                img.save(thumbnail_buf, format="JPEG", quality=60)
-                thumbnail_b64 = base64.b64encode(thumbnail_buf.getvalue()).decode("utf-8")
-
-                # Emit thumbnail update
-                await emit("agent:thumbnail", {
-                    "thumbnail": thumbnail_b64,
-                    "timestamp": int(asyncio.get_event_loop().time() * 1000)
-                })
+    # --- Screen feed: one screenshot source for model, replay, thumbnails, checkpoints ---
+    screen_feed = ScreenFeed(capture, idle_interval=THUMBNAIL_INTERVAL_SECONDS)
+    is_panopticon = os.environ.get("PANOPTICON_MODE", "false").lower() == "true"
+    _last_thumbnail_time = 0.0
 
-                # Wait 10 seconds before next thumbnail
-                await asyncio.sleep(10)
+    def make_thumbnail(raw_png: bytes) -> bytes:
+        """Panopticon tiles get a larger aspect-preserving thumbnail than the session view."""
+        if not is_panopticon:
+            return ReplayBuffer.make_thumbnail_bytes(raw_png)
+
+        from PIL import Image
+
+        img = Image.open(BytesIO(raw_png))
+        img.thumbnail(PANOPTICON_THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        img.save(buf, format="JPEG", quality=PANOPTICON_THUMBNAIL_QUALITY)
+        return buf.getvalue()
+
+    @screen_feed.subscribe
+    async def record_replay_frame(raw_png, label):
+        # Idle captures (label None) only feed thumbnails, not the replay
+        if label is not None and replay_buffer.capture_frame(raw_png, label):
+            frame = replay_buffer.last_frame
+            journal.record_frame(frame.jpeg_bytes, frame.action, replay_buffer.frame_wall_time(frame))
+
+    @screen_feed.subscribe
+    async def emit_thumbnail(raw_png, label):
+        nonlocal _last_thumbnail_time
+        now = time.monotonic()
+        if now - _last_thumbnail_time < THUMBNAIL_INTERVAL_SECONDS:
+            return
+        _last_thumbnail_time = now
+        await emit("agent:thumbnail", {
+            "thumbnail": thumbnail_payload(make_thumbnail(raw_png)),
+            "timestamp": int(time.time() * 1000),
+        })
 
-            except Exception as e:
-                logger.warning("Failed to generate thumbnail: %s", e)
-                await asyncio.sleep(5)  # Shorter delay on error
+    # Pause the sandbox between tasks once idle for IDLE_PAUSE_SECONDS
+    idle_pauser = IdlePauser.from_env(desktop, screen_feed)
 
-    # Start thumbnail generation task for Panopticon sessions
-    is_panopticon = os.environ.get("PANOPTICON_MODE", "false").lower() == "true"
+    # Panopticon keeps thumbnails fresh while the agent is idle; during tasks
+    # the agent loop's own screenshots are reused
+    idle_capture_task = None
     if is_panopticon and os.environ.get("ENABLE_THUMBNAILS", "true").lower() == "true":
-        thumbnail_task = asyncio.create_task(generate_thumbnails())
+        idle_capture_task = asyncio.create_task(screen_feed.run_idle_capture(terminated))
 
     try:
-        while not terminated.is_set():
-            # Wait for a task or termination signal
-            try:
-                task_data = await asyncio.wait_for(task_queue.get(), timeout=2.0)
-            except asyncio.TimeoutError:
-                if terminated.is_set():
+        while True:
+            resume_steps = ()
+            if resume_task is not None:
+                # Finish the task the previous worker process was running
+                task_data = {
+                    "taskId": resume_task["taskId"],
+                    "description": resume_task["description"],
+                    "whiteboard": resume_task.get("whiteboard", ""),
+                }
+                resume_steps = journal_state.steps
+                user_memories = resume_task.get("memories", "")
+                resume_task = None
+            else:
+                # Wait for a task or termination signal, whichever comes first
+                # (pausing the sandbox if none arrives for a while)
+                task_data = await idle_pauser.wait_for_task(task_queue, terminated)
+                if task_data is None:
                     break
-                continue
+                if task_data["taskId"] in handled_task_ids:
+                    logger.info("Skipping task %s: already handled", task_data["taskId"])
+                    if memory_prefetcher:
+                        memory_prefetcher.discard(task_data["description"])
+                    continue
 
             task_id = task_data["taskId"]
             task_description = task_data["description"]
             whiteboard_content = task_data.get("whiteboard", "")
+            handled_task_ids.add(task_id)
 
             await emit(
                 "agent:thinking",
-                {"action": "Starting task", "detail": task_description},
+                {"action": "Resuming task" if resume_steps else "Starting task", "detail": task_description},
             )
             logger.info("Starting task %s: %s", task_id, task_description)
 
-            # Retrieve user memories for context
-            user_memories = ""
-            if memory_mgr and user_id:
-                user_memories = await asyncio.to_thread(
-                    memory_mgr.retrieve_memories, user_id, task_description
-                )
+            if not resume_steps:
+                # Retrieve user memories for context (usually prefetched on assign)
+                user_memories = ""
+                if memory_prefetcher:
+                    user_memories = await memory_prefetcher.get(task_description)
+                journal.start_task(task_id, task_description, whiteboard_content, user_memories)
 
             async def on_step(step, name, args, reasoning=None):
                 logger.info("  Step %d: %s(%s)", step, name, args)
@@ -466,46 +833,43 @@ async def main():
                     "toolArgs": args,
                 })
 
-            async def on_screenshot(raw_png):
-                nonlocal _last_thumbnail_time
-                now = time.monotonic()
-                if now - _last_thumbnail_time >= THUMBNAIL_INTERVAL_SECONDS:
-                    _last_thumbnail_time = now
-                    try:
-                        thumb = ReplayBuffer.make_thumbnail(raw_png)
-                        await emit("agent:thumbnail", {"thumbnail": thumb})
-                    except Exception as e:
-                        logger.warning("Failed to emit thumbnail: %s", e)
-
             # Checkpoint callback — only active for Slack sessions
             is_slack_session = os.environ.get("SLACK_SESSION") == "true"
 
-            async def on_checkpoint(step, raw_png):
+            async def on_checkpoint(step, raw_png, reason="interval", scope=TASK_SCOPE):
                 """Emit checkpoint event and block until user responds."""
-                thumb = ReplayBuffer.make_thumbnail(raw_png) if raw_png else None
+                thumb = (
+                    thumbnail_payload(ReplayBuffer.make_thumbnail_bytes(raw_png))
+                    if raw_png else None
+                )
                 await emit("agent:checkpoint", {
                     "step": step,
                     "totalSteps": MAX_STEPS,
                     "thumbnail": thumb,
+                    "reason": reason,
+                    "scope": scope,
+                    "usage": usage.session_summary() if scope == SESSION_SCOPE else usage.task_summary(),
                 })
                 logger.info("Checkpoint at step %d — waiting for user", step)
                 checkpoint_resume.clear()
-                while not checkpoint_resume.is_set() and not terminated.is_set():
-                    await asyncio.sleep(1.0)
-                if terminated.is_set():
-                    return "terminated"
-                return "continue"
+                return await wait_for_resume(checkpoint_resume, terminated)
 
             try:
+                # Resume the sandbox if it was paused while idle (usually already under way)
+                await idle_pauser.ensure_running()
                 result = await run_agent_loop(
-                    client, task_description,
+                    client, task_description, screen_feed,
                     whiteboard_content=whiteboard_content,
                     user_memories=user_memories,
                     on_step=on_step,
-                    replay_buffer=replay_buffer,
                     terminated=terminated,
-                    on_screenshot=on_screenshot,
                     on_checkpoint=on_checkpoint if is_slack_session else None,
+                    journal=journal,
+                    resume_steps=resume_steps,
+                    router=router,
+                    usage=usage,
+                    progress=progress,
+                    tool_thread=tool_thread,
                 )
             except (ConnectionError, TimeoutError, OSError) as e:
                 # E2B sandbox expired or connection lost
@@ -521,17 +885,37 @@ async def main():
                 )
                 logger.error("Task %s failed: %s", task_id, e)
 
+            progress.set_phase("idle")
+
             # Report task completion
             await emit(
-                "task:completed", {"todoId": task_id, "result": result}
+                "task:completed",
+                {"todoId": task_id, "result": result, "usage": usage.task_summary()},
+            )
+            journal.finish_task(task_id, result)
+            logger.info(
+                "Completed task %s (usage: %s, model routing: %s)",
+                task_id, usage.task_summary(), router.summary(),
             )
-            logger.info("Completed task %s", task_id)
+            if usage.exceeded() == SESSION_SCOPE:
+                # Same choice as mid-task: ask the user (Slack) or stop
+                budget = usage.budget(SESSION_SCOPE)
+                if is_slack_session and usage.budget_action == BUDGET_CHECKPOINT:
+                    logger.warning("Session budget of $%.2f exhausted — checkpointing", budget)
+                    progress.set_phase("checkpoint")
+                    decision = await on_checkpoint(0, screen_feed.latest, reason="budget", scope=SESSION_SCOPE)
+                    progress.set_phase("idle")
+                    if decision == "continue":
+                        usage.extend(SESSION_SCOPE)
+                    else:
+                        terminated.set()
+                else:
+                    logger.warning("Session budget of $%.2f exhausted — stopping agent", budget)
+                    terminated.set()
 
-            # Store memories from successful tasks
-            if memory_mgr and user_id and result and not result.startswith("("):
-                await asyncio.to_thread(
-                    memory_mgr.store_memories, user_id, task_description, result
-                )
+            # Store memories from successful tasks (queued, written in the background)
+            if memory_writer and user_id and result and not result.startswith("("):
+                memory_writer.submit(user_id, task_description, result)
 
             # Write result to whiteboard
             await emit(
@@ -540,62 +924,97 @@ async def main():
             )
 
     finally:
-        # Cancel heartbeat
-        heartbeat_task.cancel()
-        try:
-            await heartbeat_task
-        except asyncio.CancelledError:
-            pass
+        # Independent teardown steps run concurrently under one deadline
+        # (see shutdown.py); the final events are flushed by acknowledgement
+        shutdown = ShutdownCoordinator()
+
+        async def stop_background_tasks():
+            for background_task in (heartbeat_task, idle_capture_task):
+                if background_task is None:
+                    continue
+                background_task.cancel()
+                try:
+                    await background_task
+                except asyncio.CancelledError:
+                    pass
+
+        async def save_replay():
+            if replay_buffer.skipped_count:
+                logger.info(
+                    "Replay capture kept %d frames, skipped %d unchanged screenshots",
+                    replay_buffer.frame_count, replay_buffer.skipped_count,
+                )
+            if replay_buffer.frame_count == 0:
+                return
+            if r2_public_url:
+                # R2 mode: upload via presigned URLs
+                upload_result = await replay_buffer.upload_r2(
+                    session_id, agent_id, socket_url, r2_public_url
+                )
+            else:
+                # Local mode: save to disk (GIF encoding included), serve via API route
+                replay_dir = os.environ.get(
+                    "REPLAY_DIR",
+                    os.path.join(os.path.dirname(__file__), "..", "frontend", ".replays"),
+                )
+                serve_base = f"{socket_url}/api/replay/serve"
+                upload_result = await in_daemon_thread(
+                    replay_buffer.save_local, session_id, agent_id, replay_dir, serve_base
+                )
 
-        # Save/upload replay frames before killing sandbox
-        if replay_buffer.frame_count > 0:
-            try:
-                if r2_public_url:
-                    # R2 mode: upload via presigned URLs
-                    upload_result = await replay_buffer.upload_r2(
-                        session_id, agent_id, socket_url, r2_public_url
-                    )
-                else:
-                    # Local mode: save to disk, serve via API route
-                    replay_dir = os.environ.get(
-                        "REPLAY_DIR",
-                        os.path.join(os.path.dirname(__file__), "..", "frontend", ".replays"),
-                    )
-                    serve_base = f"{socket_url}/api/replay/serve"
-                    upload_result = replay_buffer.save_local(
-                        session_id, agent_id, replay_dir, serve_base
-                    )
+            if upload_result:
+                manifest_url, frame_count = upload_result
+                await emit("replay:complete", {
+                    "manifestUrl": manifest_url,
+                    "frameCount": frame_count,
+                })
+                logger.info("Replay saved: %d frames", frame_count)
 
-                if upload_result:
-                    manifest_url, frame_count = upload_result
-                    await emit("replay:complete", {
-                        "manifestUrl": manifest_url,
-                        "frameCount": frame_count,
-                    })
-                    logger.info("Replay saved: %d frames", frame_count)
-            except Exception as e:
-                logger.error("Failed to save replay: %s", e)
+        async def reset_journal():
+            # Clean shutdown: the journal is only needed to recover from a crash
+            journal.reset()
 
-        # Decide whether to pause or kill the sandbox
-        if desktop:
+        async def release_sandbox():
+            # Decide whether to pause or kill the sandbox
+            if not desktop:
+                return
+            await idle_pauser.close()
             if force_kill:
-                desktop.kill()
+                await in_daemon_thread(desktop.kill)
                 logger.info("Sandbox killed (user-initiated stop)")
-            else:
+                return
+            # Let an action cut short by the stop finish rather than freeze it mid-way
+            if not await tool_thread.settle(TOOL_SETTLE_TIMEOUT):
+                logger.warning("Tool call still running after %ds, pausing anyway", TOOL_SETTLE_TIMEOUT)
+            try:
+                await in_daemon_thread(desktop.pause)
+                await emit("agent:paused", {"sandboxId": desktop.sandbox_id})
+                logger.info("Sandbox paused (id=%s)", desktop.sandbox_id)
+            except Exception as e:
+                logger.warning("Failed to pause sandbox, killing instead: %s", e)
                 try:
-                    desktop.pause()
-                    await emit("agent:paused", {"sandboxId": desktop.sandbox_id})
-                    logger.info("Sandbox paused (id=%s)", desktop.sandbox_id)
-                except Exception as e:
-                    logger.warning("Failed to pause sandbox, killing instead: %s", e)
-                    try:
-                        desktop.kill()
-                    except Exception:
-                        pass
-        await emit("agent:terminated", {})
-        # Allow queued socket events (replay:complete, agent:terminated) to flush
-        await asyncio.sleep(0.5)
-        await sio.disconnect()
+                    await in_daemon_thread(desktop.kill)
+                except Exception:
+                    pass
+
+        shutdown.add("background", stop_background_tasks)
+        shutdown.add("replay", save_replay, after=("background",))
+        shutdown.add("journal", reset_journal, after=("replay",))
+        shutdown.add("memory", close_memory_writer)
+        shutdown.add("http", close_http_clients, after=("replay", "memory"))
+        shutdown.add("sandbox", release_sandbox, after=("background",))
+        report = await shutdown.run()
+        logger.info("Shutdown steps: %s", report)
+
+        await emit("agent:terminated", {"shutdown": {
+            "missed": report["missed"],
+            "failed": list(report["failed"]),
+            "elapsedMs": report["elapsedMs"],
+        }})
+        if isinstance(capture, HelperCapture):
+            logger.info("Screen helper: %s", capture.stats)
+        # Flushes replay:complete and agent:terminated, then leaves the socket
+        await disconnect()
         logger.info("Worker shut down")
 
 